@@ -1,6 +1,7 @@
 import atexit
 import cProfile
 import io
+import os
 import pstats
 import sys
 
@@ -9,6 +10,7 @@ from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 
+from mainDir.engine.stageTimer import stageTimer
 from mainDir.mainUI_013 import VideoMixerUI
 from mainDir.ouputs.mainOut_Viewer import CV_MainOutViewer
 
@@ -68,7 +70,7 @@ class VideoApp(QApplication):
     def update(self):
         dirty_frame = self.mixerVideo.getDirtyFrame()
         if dirty_frame is not None:
-            self.mainOut.feedFrame(dirty_frame)
+            self.mainOut.feedFrame(dirty_frame, self.mixerVideo.monitor_program.displayedToken)
 
 
 def main():
@@ -79,18 +81,22 @@ def main():
 
 
 if __name__ == "__main__":
-    pr = cProfile.Profile()
-    pr.enable()
+    # Il cProfile di tutto il processo rallenta molto il mixer: si attiva solo con OPENPYVISION_PROFILE=1.
+    # Per i tempi delle singole fasi c'è lo stageTimer, sempre attivo e interrogabile a runtime.
+    if os.environ.get("OPENPYVISION_PROFILE") == "1":
+        pr = cProfile.Profile()
+        pr.enable()
 
 
-    def exit_handler():
-        pr.disable()
-        s = io.StringIO()
-        sortby = 'cumulative'
-        ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
-        ps.print_stats()
-        print(s.getvalue())
+        def exit_handler():
+            pr.disable()
+            s = io.StringIO()
+            sortby = 'cumulative'
+            ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
+            ps.print_stats()
+            print(s.getvalue())
+            print(stageTimer.report())
 
 
-    atexit.register(exit_handler)
+        atexit.register(exit_handler)
     main()
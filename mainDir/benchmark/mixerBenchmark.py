@@ -0,0 +1,334 @@
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PyQt6.QtCore import *
+from PyQt6.QtGui import QColor
+
+from mainDir.engine.framePool import framePool
+from mainDir.engine.keyer import LumaKeyer
+from mainDir.engine.masterClock import MasterClock, VirtualTimeSource
+from mainDir.engine.stageTimer import stageTimer
+from mainDir.inputs.generator_Gradients import GradientGenerator
+from mainDir.inputs.generator_Noise_Random import RandomNoiseImageGenerator
+from mainDir.inputs.synchObject import SynchObject
+from mainDir.inputs015.generator_Color015 import ColorGenerator015
+from mainDir.mixBus.auxBus import AuxBus
+from mainDir.mixBus.mixBus_014 import MixBus014, MIX_TYPE
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+"""
+Benchmark del mixer senza interfaccia. I vecchi test (SimpleTest_01_*, UMatTest_*, MonteCarloSimulation) aprono una
+finestra, dipendono dallo screen capture o da una camera e stampano solo un fps medio, quindi non sono ripetibili.
+
+Qui il MixBus014 viene costruito con input sintetici e pilotato da un SynchObject senza timer (autoStart=False)
+con un MasterClock:
+- in modalità libera (--rate 0, default) il clock è virtuale e ogni tick viene eseguito appena finito il precedente,
+  per misurare il throughput massimo;
+- con --rate N il clock è reale a N fps e il loop aspetta la scadenza di ogni tick, per misurare ritardi e frame persi
+  nelle condizioni di lavoro.
+
+Per ogni risoluzione (720p, 1080p, 2160p) e ogni tipo di transizione (MIX, wipe, STINGER, STILL) il benchmark
+misura la latenza di ogni frame (cattura degli input live + getMix) e scrive un JSON con fps, percentili, allocazioni
+del framePool, memoria Python (con --tracemalloc) e picco di RSS del processo.
+
+Uso, dalla cartella del progetto:
+    python -m mainDir.benchmark.mixerBenchmark --frames 600 --output benchmark.json
+    python -m mainDir.benchmark.mixerBenchmark --resolutions 1080p --transitions MIX STINGER --rate 60
+    python -m mainDir.benchmark.mixerBenchmark --check
+"""
+
+RESOLUTIONS = {
+    "720p": QSize(1280, 720),
+    "1080p": QSize(1920, 1080),
+    "2160p": QSize(3840, 2160),
+}
+
+TRANSITIONS = [MIX_TYPE.MIX, MIX_TYPE.WIPE_LEFT, MIX_TYPE.WIPE_RIGHT, MIX_TYPE.WIPE_TOP, MIX_TYPE.WIPE_BOTTOM,
+               MIX_TYPE.WIPE, MIX_TYPE.DIP, MIX_TYPE.DVE, MIX_TYPE.STINGER, MIX_TYPE.STILL]
+
+# la QCoreApplication creata da main: deve restare viva per tutto il benchmark
+_application = None
+
+
+def createStingerSequence(folder, resolution, length=30):
+    """
+    Scrive una sequenza di PNG con canale alpha: una barra che attraversa il frame con i bordi sfumati,
+    così il compositing dello stinger lavora su un key vero e non su un frame tutto opaco o tutto trasparente.
+    """
+    width, height = resolution.width(), resolution.height()
+    ramp = np.linspace(0, 255, width // 8).astype(np.uint8)
+    for index in range(length):
+        image = np.zeros((height, width, 4), dtype=np.uint8)
+        image[:, :, 0] = 40
+        image[:, :, 1] = (index * 255) // length
+        image[:, :, 2] = 200
+        center = (index * (width + width // 2)) // length - width // 4
+        left, right = max(0, center - width // 4), min(width, center + width // 4)
+        if right > left:
+            image[:, left:right, 3] = 255
+            edge = min(len(ramp), left)
+            image[:, left - edge:left, 3] = ramp[len(ramp) - edge:]
+        cv2.imwrite(os.path.join(folder, f"stinger_{index:04d}.png"), image)
+    return folder
+
+
+def peakRssMb():
+    """
+    Picco di memoria residente del processo in MB, None se la piattaforma non lo permette.
+    È cumulativo: ogni scenario riporta il picco raggiunto fino a quel momento.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS restituisce byte, Linux kilobyte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(samplesNs):
+    samplesMs = np.asarray(samplesNs, dtype=np.float64) / 1e6
+    p50, p95, p99 = np.percentile(samplesMs, (50, 95, 99))
+    return {"mean": samplesMs.mean(), "p50": p50, "p95": p95, "p99": p99, "max": samplesMs.max()}
+
+
+class MixerBenchmark:
+
+    def __init__(self, frames=600, warmup=30, rate=0, fps=60, inputs="noise", useTracemalloc=False):
+        self.frames = frames
+        self.warmup = warmup
+        self.rate = rate
+        self.fps = fps
+        self.inputs = inputs
+        self.useTracemalloc = useTracemalloc
+
+    def createInputs(self, synchObject, resolution):
+        if self.inputs == "noise":
+            # input che cambiano ad ogni tick, come una camera
+            return (RandomNoiseImageGenerator(synchObject, resolution),
+                    RandomNoiseImageGenerator(synchObject, resolution))
+        return (GradientGenerator(synchObject, resolution, gradient_type='vertical'),
+                GradientGenerator(synchObject, resolution, gradient_type='radial'))
+
+    def startTransition(self, mixBus, transition):
+        mixBus.setEffectType(transition)
+        if transition == MIX_TYPE.STINGER:
+            mixBus.startStinger()
+        else:
+            mixBus.startMix()
+
+    def runScenario(self, resolutionName, transition, stingerFolder, stingerCacheFolder=None):
+        resolution = RESOLUTIONS[resolutionName]
+        if self.rate:
+            clock = MasterClock(self.rate)
+        else:
+            timeSource = VirtualTimeSource()
+            clock = MasterClock(self.fps, timeSource)
+        synchObject = SynchObject(clock.fps, clock=clock, autoStart=False)
+        mixBus = MixBus014(synchObject, resolution=resolution, stingerFolder=stingerFolder,
+                           stingerCacheFolder=stingerCacheFolder)
+        preview, program = self.createInputs(synchObject, resolution)
+        mixBus.setPreviewInput(preview)
+        mixBus.setProgramInput(program)
+        mixBus.setStill(GradientGenerator(synchObject, resolution, gradient_type='radial'))
+        mixBus.stingerObject.setLoop(True)
+
+        latencies = np.zeros(self.frames, dtype=np.int64)
+        clock.start()
+        gc.collect()
+        for index in range(self.warmup + self.frames):
+            if index == self.warmup:
+                stageTimer.reset()
+                poolBefore = framePool.getStatistics()
+                if self.useTracemalloc:
+                    tracemalloc.start()
+                startNs = time.perf_counter_ns()
+            if not mixBus.is_mixing:
+                self.startTransition(mixBus, transition)
+            if self.rate:
+                waitNs = clock.timeToNextTickNs()
+                if waitNs > 0:
+                    time.sleep(waitNs / 1e9)
+            else:
+                timeSource.advanceTo(clock.nextDeadlineNs())
+            frameStartNs = time.perf_counter_ns()
+            synchObject.advance()
+            mixBus.getMix()
+            if index >= self.warmup:
+                latencies[index - self.warmup] = time.perf_counter_ns() - frameStartNs
+        elapsedNs = time.perf_counter_ns() - startNs
+
+        result = {
+            "resolution": resolutionName,
+            "transition": transition.name,
+            "frames": self.frames,
+            "fps": self.frames / (elapsedNs / 1e9),
+            "frameLatencyMs": percentiles(latencies),
+            "deadlineMisses": int(np.count_nonzero(latencies > clock.frameDurationNs)),
+            "stages": stageTimer.getStatistics(),
+            "framePool": {key: value - poolBefore.get(key, 0) for key, value in framePool.getStatistics().items()},
+            "peakRssMb": peakRssMb(),
+        }
+        if self.rate:
+            result["clock"] = clock.getStatistics()
+        if self.useTracemalloc:
+            currentBytes, peakBytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["tracemalloc"] = {"currentMb": currentBytes / 2 ** 20, "peakMb": peakBytes / 2 ** 20}
+
+        synchObject.unregisterConsumer(mixBus)
+        mixBus.stingerObject.stop()
+        return result
+
+    def run(self, resolutionNames, transitions, stingerFolder=None):
+        results = []
+        for resolutionName in resolutionNames:
+            with tempfile.TemporaryDirectory() as temporaryFolder:
+                folder = stingerFolder or createStingerSequence(temporaryFolder, RESOLUTIONS[resolutionName])
+                for transition in transitions:
+                    # la cache dello stinger della sequenza sintetica sparisce con la cartella temporanea
+                    result = self.runScenario(resolutionName, transition, folder,
+                                              os.path.join(temporaryFolder, "stingerCache"))
+                    print(f"{resolutionName:>6} {transition.name:<12} {result['fps']:8.1f} fps  "
+                          f"p50 {result['frameLatencyMs']['p50']:7.3f} ms  "
+                          f"p99 {result['frameLatencyMs']['p99']:7.3f} ms  "
+                          f"miss {result['deadlineMisses']}", file=sys.stderr)
+                    results.append(result)
+        return {
+            "settings": {
+                "frames": self.frames,
+                "warmup": self.warmup,
+                "rate": self.rate,
+                "fps": self.fps,
+                "inputs": self.inputs,
+            },
+            "system": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+                "cpuCount": os.cpu_count(),
+                "opencv": cv2.__version__,
+                "numpy": np.__version__,
+                "opencvThreads": cv2.getNumThreads(),
+            },
+            "results": results,
+        }
+
+
+def checkKeyedInput(resolutionName="720p", frames=4):
+    """
+    Controllo di regressione: un input con il keyer (BaseClass015.setKeyer) va messo in preview, in program, su un
+    aux e su un livello DSK, e ogni taglio e transizione tra l'input con il keyer e uno normale deve dare frame BGR
+    alla risoluzione del mixer.
+    :return: i nomi dei passi controllati
+    :raise RuntimeError: al primo frame con una forma sbagliata
+    """
+    resolution = RESOLUTIONS[resolutionName]
+    expected = (resolution.height(), resolution.width(), 3)
+    timeSource = VirtualTimeSource()
+    clock = MasterClock(60, timeSource)
+    synchObject = SynchObject(clock.fps, clock=clock, autoStart=False)
+    keyed = ColorGenerator015(synchObject, resolution)
+    keyed.setColor(QColor(100, 100, 100))
+    keyed.setKeyer(LumaKeyer(low=50))
+    plain = GradientGenerator(synchObject, resolution, gradient_type='vertical')
+    checked = []
+
+    def check(name, frame):
+        if frame is None or frame.shape != expected:
+            raise RuntimeError(f"{name}: frame {None if frame is None else frame.shape} invece di {expected}")
+        checked.append(name)
+
+    def tick():
+        timeSource.advanceTo(clock.nextDeadlineNs())
+        synchObject.advance()
+
+    with tempfile.TemporaryDirectory() as temporaryFolder:
+        mixBus = MixBus014(synchObject, resolution=resolution,
+                           stingerFolder=createStingerSequence(temporaryFolder, resolution, length=4),
+                           stingerCacheFolder=os.path.join(temporaryFolder, "stingerCache"))
+        mixBus.setPreviewInput(keyed)
+        mixBus.setProgramInput(plain)
+        mixBus.setStill(plain)
+        aux = AuxBus(synchObject, "check", resolution)
+        clock.start()
+        for transition in [transition for transition in TRANSITIONS if transition != MIX_TYPE.STINGER]:
+            mixBus.setEffectType(transition)
+            mixBus.startMix(frames)
+            for _ in range(frames + 1):
+                tick()
+                for index, frame in enumerate(mixBus.getMix()):
+                    check(f"{transition.name}.{('preview', 'program')[index]}", frame)
+            mixBus.cut()
+            tick()
+            check(f"CUT after {transition.name}", mixBus.getMix()[1])
+        for source in (keyed, plain, keyed):
+            aux.setSource(source, duration=frames)
+            for _ in range(frames + 1):
+                tick()
+                check("aux", aux.getFrame())
+        layer = mixBus.addDskLayer(keyed, transitionFrames=1)
+        layer.cut()
+        tick()
+        check("dsk", mixBus.getMix()[1])
+        synchObject.unregisterConsumer(mixBus)
+        synchObject.unregisterConsumer(aux)
+        mixBus.stingerObject.stop()
+    return checked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark of MixBus014")
+    parser.add_argument("--frames", type=int, default=600, help="frame misurati per ogni scenario")
+    parser.add_argument("--warmup", type=int, default=30, help="frame scartati all'inizio di ogni scenario")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="frame rate reale a cui pilotare il mixer, 0 per andare il più veloce possibile")
+    parser.add_argument("--fps", type=float, default=60, help="frame rate del clock virtuale e del budget")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument("--transitions", nargs="+", default=[transition.name for transition in TRANSITIONS],
+                        choices=[transition.name for transition in TRANSITIONS])
+    parser.add_argument("--inputs", default="noise", choices=["noise", "gradient"],
+                        help="noise cambia ad ogni tick, gradient è statico")
+    parser.add_argument("--stinger-folder", default=None,
+                        help="sequenza PNG da usare per lo stinger, di default ne viene generata una sintetica")
+    parser.add_argument("--tracemalloc", action="store_true", help="misura la memoria allocata (rallenta)")
+    parser.add_argument("--output", default=None, help="file JSON di uscita, di default stdout")
+    parser.add_argument("--check", action="store_true",
+                        help="controlla solo tagli e transizioni con un input con il keyer, senza benchmark")
+    args = parser.parse_args(argv)
+
+    global _application
+    _application = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    if args.check:
+        with contextlib.redirect_stdout(sys.stderr):
+            checked = checkKeyedInput(args.resolutions[0])
+        print(f"keyed input: {len(checked)} frame controllati")
+        return checked
+    benchmark = MixerBenchmark(frames=args.frames, warmup=args.warmup, rate=args.rate, fps=args.fps,
+                               inputs=args.inputs, useTracemalloc=args.tracemalloc)
+    # le stampe degli input (es. lo switching dello stinger) non devono finire nel JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = benchmark.run(args.resolutions, [MIX_TYPE[name] for name in args.transitions], args.stinger_folder)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import weakref
+
+from mainDir.engine.latencyTracker import latencyTracker
+from mainDir.engine.stageTimer import stageTimer
+
+"""
+L'EvaluationGraph sostituisce il broadcast di synch_SIGNAL verso tutti gli input.
+Prima ogni input collegava captureFrame a synch_SIGNAL nel costruttore, quindi ad ogni tick tutti gli input della
+matrice (noise, screen capture, camere...) catturavano o generavano un frame anche se nessuno lo guardava.
+
+Adesso gli input si registrano come sorgenti e chi usa i frame (il mixBus, i monitor, il multiviewer...) si registra
+come consumer. Un consumer deve avere un metodo getLiveSources che restituisce le sorgenti che userà in questo tick.
+Ad ogni tick il SynchObject chiama evaluate prima di emettere synch_SIGNAL: vengono catturate solo le sorgenti
+richieste da almeno un consumer (una volta sola anche se richieste da più consumer), mentre le altre restano
+parcheggiate e non costano nulla.
+
+Una sorgente può a sua volta dipendere da altre sorgenti (ad esempio la maschera dello screen): se ha un metodo
+getDependencies, le dipendenze di una sorgente live vengono valutate prima della sorgente stessa.
+
+Se non c'è nessun consumer registrato (ad esempio nei simpleTest, dove la finestra legge direttamente l'input)
+tutte le sorgenti vengono catturate come prima.
+
+Dopo ogni captureFrame la sorgente riceve un FrameStamp dal latencyTracker se ha un frame nuovo.
+
+I consumer leggono i frame con frame(source): il getFrame di ogni sorgente viene chiamato una volta sola per tick e
+il risultato (una view in sola lettura) è condiviso da tutti i bus, aux e monitor che usano quella sorgente. I livelli
+del DownstreamKeyer leggono con frame(source, keyed=True) il frame con il keyer (getKeyedFrame), anche questo una
+volta per tick.
+
+Sorgenti e consumer sono tenuti con riferimenti deboli: un input tolto dalla matrice e non più referenziato
+sparisce anche dal grafo.
+"""
+
+
+class EvaluationGraph:
+
+    def __init__(self):
+        self._sources = weakref.WeakSet()
+        self._consumers = weakref.WeakSet()
+        self.liveCount = 0
+        self.parkedCount = 0
+        # frame letti nel tick corrente, per (id della sorgente, keyed): (sorgente, frame)
+        self._tickFrames = {}
+        self.frameHits = 0
+        self.frameMisses = 0
+        # nome della fase dello stageTimer per tipo di sorgente, costruito una volta sola
+        self._captureStages = {}
+
+    def registerSource(self, source):
+        """
+        Registra una sorgente. La sorgente deve avere un metodo captureFrame.
+        :param source: l'input da registrare
+        """
+        self._sources.add(source)
+
+    def unregisterSource(self, source):
+        self._sources.discard(source)
+
+    def registerConsumer(self, consumer):
+        """
+        Registra un consumer. Il consumer deve avere un metodo getLiveSources.
+        :param consumer: l'oggetto che usa i frame delle sorgenti
+        """
+        self._consumers.add(consumer)
+
+    def unregisterConsumer(self, consumer):
+        self._consumers.discard(consumer)
+
+    def sources(self):
+        return list(self._sources)
+
+    def liveSources(self):
+        """
+        Restituisce la lista delle sorgenti da valutare in questo tick, con le dipendenze prima delle sorgenti
+        che le usano. Le sorgenti che non sono registrate (ad esempio None o oggetti che non sono input) vengono
+        ignorate.
+        :return: lista ordinata delle sorgenti live
+        """
+        if len(self._consumers) == 0:
+            return list(self._sources)
+        ordered = []
+        visited = set()
+        for consumer in list(self._consumers):
+            for source in consumer.getLiveSources():
+                self._visit(source, ordered, visited)
+        return ordered
+
+    def _visit(self, source, ordered, visited):
+        if source is None or id(source) in visited:
+            return
+        visited.add(id(source))
+        getDependencies = getattr(source, "getDependencies", None)
+        if getDependencies is not None:
+            for dependency in getDependencies():
+                self._visit(dependency, ordered, visited)
+        if source in self._sources:
+            ordered.append(source)
+
+    def evaluate(self, tick=None):
+        """
+        Cattura un frame da tutte le sorgenti live. Le sorgenti parcheggiate non vengono toccate.
+        :param tick: il ClockTick corrente (non usato qui, ma passato per le estensioni)
+        :return: lista delle sorgenti valutate
+        """
+        self._tickFrames = {}
+        live = self.liveSources()
+        for source in live:
+            startNs = stageTimer.start()
+            source.captureFrame()
+            if startNs:
+                stageTimer.stop(self._captureStage(source), startNs)
+            latencyTracker.stampCapture(source)
+        self.liveCount = len(live)
+        self.parkedCount = len(self._sources) - self.liveCount
+        return live
+
+    def _captureStage(self, source):
+        stage = self._captureStages.get(type(source))
+        if stage is None:
+            stage = self._captureStages[type(source)] = f"captureFrame.{type(source).__name__}"
+        return stage
+
+    def frame(self, source, keyed=False):
+        """
+        Frame della sorgente nel tick corrente. La prima richiesta del tick chiama getFrame, le successive
+        (da altri bus o monitor) ricevono lo stesso frame. Il frame è una view in sola lettura: chi lo usa non può
+        modificarlo sotto gli altri consumer.
+        :param source: l'input
+        :param keyed: True per il frame BGRA con il keyer (getKeyedFrame), se l'input lo ha
+        :return: il frame, None se l'input non ne ha uno
+        """
+        key = (id(source), keyed)
+        cached = self._tickFrames.get(key)
+        if cached is not None and cached[0] is source:
+            self.frameHits += 1
+            return cached[1]
+        getKeyedFrame = getattr(source, "getKeyedFrame", None) if keyed else None
+        frame = getKeyedFrame() if getKeyedFrame is not None else source.getFrame()
+        if frame is not None and frame.flags.writeable:
+            frame = frame.view()
+            frame.flags.writeable = False
+        self._tickFrames[key] = (source, frame)
+        self.frameMisses += 1
+        return frame
+
+    def getStatistics(self):
+        return {
+            "sources": len(self._sources),
+            "consumers": len(self._consumers),
+            "live": self.liveCount,
+            "parked": self.parkedCount,
+            "frameHits": self.frameHits,
+            "frameMisses": self.frameMisses,
+        }
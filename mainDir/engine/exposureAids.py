@@ -0,0 +1,153 @@
+import functools
+from enum import Enum
+
+import cv2
+import numpy as np
+
+from mainDir.engine.framePool import FrameBuffers, framePool
+from mainDir.engine.stageTimer import timedStage
+
+"""
+Aiuti all'esposizione per i monitor: falso colore, zebra e indicatore di clipping. Come nel PointOpCompiler il calcolo
+per pixel è una lettura da tabella di 256 valori, e le tabelle vengono costruite solo quando cambia una soglia
+(in cache con lru_cache):
+- falso colore: la luminanza (cv2.cvtColor BGR2GRAY) torna in BGR con un cvtColor e passa da un cv2.LUT a tre canali,
+  che colora le fasce di esposizione (viola e blu per i neri, verde sul grigio medio, rosa sull'incarnato, giallo
+  vicino al bianco, rosso sul bianco tagliato) e lascia il resto in scala di grigi;
+- zebra: un cv2.LUT della luminanza dà la maschera dei pixel sopra la soglia, la maschera viene intersecata con le
+  righe diagonali (costruite una volta per dimensione e periodo) e le righe vengono tolte dal frame con cv2.subtract;
+- clipping: un cv2.LUT per canale trova i canali tagliati e un cv2.transform con pesi 1 li somma (con saturazione) in
+  una maschera; i pixel tagliati diventano rossi e quelli schiacciati sul nero blu, con cv2.copyTo da frame costanti
+  del framePool.
+
+Il monitor li applica al frame già ridotto alla risoluzione dello schermo, quindi su un ottavo dei pixel di un 1080p.
+"""
+
+
+class EXPOSURE_AID(Enum):
+    NONE = 0
+    FALSE_COLOR = 1
+    ZEBRA = 2
+    CLIPPING = 3
+
+
+# fasce del falso colore: (da, a) in percentuale del fondo scala e colore BGR, a 100 il 255 è compreso
+FALSE_COLOR_BANDS = (
+    ((0.0, 2.5), (128, 0, 128)),
+    ((2.5, 10.0), (255, 0, 0)),
+    ((38.0, 44.0), (0, 200, 0)),
+    ((52.0, 56.0), (203, 192, 255)),
+    ((93.0, 97.0), (0, 255, 255)),
+    ((97.0, 100.0), (0, 0, 255)),
+)
+
+
+def _level(percent):
+    return int(round(percent * 255 / 100))
+
+
+@functools.lru_cache(maxsize=1)
+def falseColorTable():
+    """
+    :return: tabella BGR (1, 256, 3) per cv2.LUT su un frame in scala di grigi a tre canali, in sola lettura
+    """
+    table = np.repeat(np.arange(256, dtype=np.uint8)[:, np.newaxis], 3, axis=1)
+    for (low, high), color in FALSE_COLOR_BANDS:
+        table[_level(low):256 if high >= 100 else _level(high)] = color
+    table = table.reshape(1, 256, 3)
+    table.flags.writeable = False
+    return table
+
+
+@functools.lru_cache(maxsize=16)
+def thresholdTable(low, high):
+    """
+    :return: tabella uint8 con 255 tra low e high compresi e 0 altrove, in sola lettura
+    """
+    table = np.zeros(256, dtype=np.uint8)
+    table[max(0, low):min(255, high) + 1] = 255
+    table.flags.writeable = False
+    return table
+
+
+@functools.lru_cache(maxsize=8)
+def stripeMask(height, width, period):
+    """
+    Righe diagonali della zebra: 255 sulla metà di ogni periodo.
+    :return: maschera uint8 (height, width) in sola lettura
+    """
+    diagonal = np.add.outer(np.arange(height), np.arange(width))
+    mask = np.where(diagonal % period < period // 2, 255, 0).astype(np.uint8)
+    mask.flags.writeable = False
+    return mask
+
+
+class ExposureAids:
+
+    def __init__(self, zebraThreshold=95.0, zebraPeriod=8, clipHigh=255, clipLow=0):
+        """
+        :param zebraThreshold: percentuale della luminanza oltre la quale compaiono le righe della zebra
+        :param zebraPeriod: periodo in pixel delle righe della zebra
+        :param clipHigh: valore di un canale considerato tagliato sul bianco
+        :param clipLow: luminanza considerata schiacciata sul nero
+        """
+        self.zebraThreshold = zebraThreshold
+        self.zebraPeriod = zebraPeriod
+        self.clipHigh = clipHigh
+        self.clipLow = clipLow
+        self._bgrBuffers = FrameBuffers(count=1)
+        self._lumaBuffers = FrameBuffers(count=1)
+        self._maskBuffers = FrameBuffers(count=1)
+        self._channelBuffers = FrameBuffers(count=1)
+        self._outputBuffers = FrameBuffers()
+
+    def _luma(self, frame):
+        luma = self._lumaBuffers.next(frame.shape[:2])
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=luma)
+
+    def falseColor(self, frame):
+        output = self._outputBuffers.next(frame.shape)
+        cv2.cvtColor(self._luma(frame), cv2.COLOR_GRAY2BGR, dst=output)
+        return cv2.LUT(output, falseColorTable(), dst=output)
+
+    def zebra(self, frame):
+        height, width = frame.shape[:2]
+        mask = self._maskBuffers.next((height, width))
+        cv2.LUT(self._luma(frame), thresholdTable(_level(self.zebraThreshold), 255), dst=mask)
+        cv2.bitwise_and(mask, stripeMask(height, width, max(2, int(self.zebraPeriod))), dst=mask)
+        stripes = self._channelBuffers.next(frame.shape)
+        cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR, dst=stripes)
+        output = self._outputBuffers.next(frame.shape)
+        return cv2.subtract(frame, stripes, dst=output)
+
+    def clipping(self, frame):
+        height, width = frame.shape[:2]
+        mask = self._maskBuffers.next((height, width))
+        clipped = self._channelBuffers.next(frame.shape)
+        cv2.LUT(frame, thresholdTable(int(self.clipHigh), 255), dst=clipped)
+        cv2.transform(clipped, np.ones((1, 3), dtype=np.float32), dst=mask)
+        output = self._outputBuffers.next(frame.shape)
+        np.copyto(output, frame)
+        cv2.copyTo(framePool.constant(frame.shape, (0, 0, 255)), mask, output)
+        cv2.LUT(self._luma(frame), thresholdTable(0, int(self.clipLow)), dst=mask)
+        cv2.copyTo(framePool.constant(frame.shape, (255, 0, 0)), mask, output)
+        return output
+
+    @timedStage("exposureAids")
+    def apply(self, frame, aid):
+        """
+        :param frame: frame BGR o BGRA (l'alpha viene ignorato)
+        :param aid: EXPOSURE_AID
+        :return: il frame con l'aiuto all'esposizione in un buffer a rotazione, o il frame stesso con NONE
+        """
+        if aid is EXPOSURE_AID.NONE:
+            return frame
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR, dst=self._bgrBuffers.next(frame.shape + (3,)))
+        elif frame.shape[2] == 4:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=self._bgrBuffers.next(frame.shape[:2] + (3,)))
+        if aid is EXPOSURE_AID.FALSE_COLOR:
+            return self.falseColor(frame)
+        if aid is EXPOSURE_AID.ZEBRA:
+            return self.zebra(frame)
+        return self.clipping(frame)
@@ -0,0 +1,71 @@
+from mainDir.engine.latencyTracker import latencyTracker
+
+"""
+Memoizzazione dei frame elaborati. Lo stesso input viene letto più volte nello stesso tick (il mixBus, il monitor di
+preview, quello di program, un aux...) e ogni getFrame rifaceva da capo tutto il frameProcessor; per i generatori
+statici (barre, colori, gradienti, immagini) il risultato non cambia mai tra un tick e l'altro.
+
+VersionedFrame è un mixin per le classi base degli input che tiene due contatori:
+- contentVersion: aumenta ogni volta che viene assegnato un nuovo _frame (cattura o generazione), oppure quando
+  l'input chiama invalidateFrame dopo aver modificato _frame sul posto;
+- parameterVersion: aumenta quando cambia uno degli attributi elencati in _processingAttributes (gamma, negativo,
+  flip, blur, ecc.), sia dai setter sia per assegnazione diretta.
+
+processedFrame restituisce il risultato in cache finché la chiave (contentVersion, parameterVersion, versioni delle
+dipendenze) non cambia: un frame viene quindi elaborato al massimo una volta per tick, e una volta sola per i frame
+statici.
+"""
+
+
+class VersionedFrame:
+    _processingAttributes = frozenset()
+    contentVersion = 0
+    parameterVersion = 0
+    _processedKey = None
+    _processedFrame = None
+    processedHits = 0
+    processedMisses = 0
+
+    def __setattr__(self, name, value):
+        if name == "_frame":
+            super().__setattr__("contentVersion", self.contentVersion + 1)
+        elif name in self._processingAttributes and self.__dict__.get(name, getattr(type(self), name, None)) != value:
+            super().__setattr__("parameterVersion", self.parameterVersion + 1)
+        super().__setattr__(name, value)
+
+    def invalidateFrame(self):
+        """
+        Da chiamare quando _frame viene modificato sul posto (es. frame[:, :] = colore), perché l'assegnazione
+        non passa da __setattr__.
+        """
+        self.contentVersion += 1
+
+    def frameVersion(self):
+        """
+        Chiave che identifica il frame elaborato corrente: cambia se cambia il contenuto, un parametro
+        o una delle dipendenze (ad esempio la maschera dello screen).
+        :return: tupla confrontabile
+        """
+        key = (self.contentVersion, self.parameterVersion)
+        getDependencies = getattr(self, "getDependencies", None)
+        if getDependencies is not None:
+            for dependency in getDependencies():
+                dependencyVersion = getattr(dependency, "frameVersion", None)
+                # una dipendenza senza versione non si può mettere in cache
+                key += (dependencyVersion() if dependencyVersion is not None else object(),)
+        return key
+
+    def processedFrame(self):
+        """
+        Restituisce frameProcessor(_frame), ricalcolandolo solo se la versione è cambiata.
+        :return: il frame elaborato
+        """
+        key = self.frameVersion()
+        if key != self._processedKey:
+            self.processedMisses += 1
+            self._processedFrame = self.frameProcessor(self._frame)
+            self._processedKey = key
+            latencyTracker.markProcessed(self)
+        else:
+            self.processedHits += 1
+        return self._processedFrame
@@ -0,0 +1,136 @@
+import threading
+
+import numpy as np
+
+"""
+Pool di buffer per i frame. A 60 fps ogni np.zeros o np.copy di un frame full HD alloca 6 MB (25 MB in 4K) e li
+restituisce all'allocatore 16 ms dopo: oltre al costo dell'allocazione, il sistema operativo deve azzerare e mappare
+pagine nuove ad ogni tick.
+
+Il FramePool tiene delle liste di buffer liberi indicizzate per forma e tipo (quindi per risoluzione):
+- checkout restituisce un buffer libero della forma richiesta, allocandolo solo se non ce ne sono;
+- checkin lo rimette nel pool quando non serve più;
+- black e constant restituiscono frame costanti condivisi e in sola lettura, allocati una volta sola.
+
+Per chi produce un frame ad ogni tick c'è FrameBuffers, un piccolo set di buffer a rotazione preso dal pool:
+le operazioni di OpenCV e NumPy scrivono direttamente lì con dst= / out=, e il frame restituito nel tick precedente
+resta valido finché il consumer non ha finito di usarlo.
+
+framePool è l'istanza condivisa da tutto il mixer.
+"""
+
+
+class FramePool:
+
+    def __init__(self, maxFreePerShape=8):
+        self._lock = threading.Lock()
+        self._free = {}
+        self._constants = {}
+        self.maxFreePerShape = maxFreePerShape
+        self.allocations = 0
+        self.reuses = 0
+
+    @staticmethod
+    def _key(shape, dtype):
+        return tuple(shape), np.dtype(dtype).str
+
+    def checkout(self, shape, dtype=np.uint8):
+        """
+        Restituisce un buffer non inizializzato della forma richiesta.
+        :param shape: forma del buffer, es. (1080, 1920, 3)
+        :param dtype: tipo dei dati
+        :return: np.ndarray scrivibile
+        """
+        key = self._key(shape, dtype)
+        with self._lock:
+            freeList = self._free.get(key)
+            if freeList:
+                self.reuses += 1
+                return freeList.pop()
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def checkin(self, frame):
+        """
+        Rimette un buffer nel pool. Il chiamante non deve più usarlo.
+        :param frame: il buffer restituito da checkout
+        """
+        if frame is None or not frame.flags.writeable or not frame.flags.c_contiguous or frame.base is not None:
+            return
+        key = self._key(frame.shape, frame.dtype)
+        with self._lock:
+            freeList = self._free.setdefault(key, [])
+            if len(freeList) < self.maxFreePerShape and not any(f is frame for f in freeList):
+                freeList.append(frame)
+
+    def constant(self, shape, value, dtype=np.uint8):
+        """
+        Restituisce un frame costante condiviso e in sola lettura.
+        :param shape: forma del frame
+        :param value: valore (scalare o tupla per canale, es. BGR)
+        :param dtype: tipo dei dati
+        :return: np.ndarray in sola lettura
+        """
+        value = tuple(value) if isinstance(value, (tuple, list)) else value
+        key = (self._key(shape, dtype), value)
+        frame = self._constants.get(key)
+        if frame is None:
+            frame = np.empty(shape, dtype=dtype)
+            frame[...] = value
+            frame.flags.writeable = False
+            self._constants[key] = frame
+        return frame
+
+    def black(self, shape, dtype=np.uint8):
+        """
+        Restituisce un frame nero condiviso e in sola lettura.
+        """
+        return self.constant(shape, 0, dtype)
+
+    def getStatistics(self):
+        with self._lock:
+            free = sum(len(freeList) for freeList in self._free.values())
+        return {
+            "allocations": self.allocations,
+            "reuses": self.reuses,
+            "free": free,
+            "constants": len(self._constants),
+        }
+
+
+class FrameBuffers:
+    """
+    Set di buffer a rotazione per un singolo produttore. next restituisce ogni volta il buffer successivo,
+    così il frame restituito nel tick precedente non viene sovrascritto mentre qualcuno lo sta ancora usando.
+    Se la forma richiesta cambia (ad esempio cambia la risoluzione) il buffer vecchio torna al pool.
+    """
+
+    def __init__(self, count=2, pool=None):
+        self.pool = pool if pool is not None else framePool
+        self._buffers = [None] * count
+        self._index = 0
+
+    def next(self, shape, dtype=np.uint8):
+        """
+        :param shape: forma del buffer richiesto
+        :param dtype: tipo dei dati
+        :return: un buffer scrivibile, non inizializzato
+        """
+        self._index = (self._index + 1) % len(self._buffers)
+        buffer = self._buffers[self._index]
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != np.dtype(dtype):
+            self.pool.checkin(buffer)
+            buffer = self.pool.checkout(shape, dtype)
+            self._buffers[self._index] = buffer
+        return buffer
+
+    def release(self):
+        """
+        Restituisce tutti i buffer al pool.
+        """
+        for buffer in self._buffers:
+            self.pool.checkin(buffer)
+        self._buffers = [None] * len(self._buffers)
+
+
+framePool = FramePool()
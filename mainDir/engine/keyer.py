@@ -0,0 +1,223 @@
+import functools
+import math
+
+import cv2
+import numpy as np
+
+from mainDir.engine.framePool import FrameBuffers
+from mainDir.engine.stageTimer import timedStage
+
+"""
+Chroma key e luma key per gli input (BaseClass015.setKeyer). Il keyer trasforma il frame dell'input in un frame BGRA:
+il fill (con la soppressione dello spill, se attiva) e il matte uint8 nel canale alpha, 255 dove l'input resta
+visibile. Il frame con il key si legge con getKeyedFrame e lo usano i livelli del DownstreamKeyer, che prendono l'alpha
+come key; getFrame dell'input resta BGR per i bus, gli aux e i monitor.
+
+Come nel PointOpCompiler tutto il calcolo per pixel è una lettura da tabella, e le tabelle vengono ricostruite solo
+quando cambia un parametro (in cache con lru_cache):
+- chroma key: il frame passa in YCrCb con un cvtColor e ogni coppia (Cb, Cr) è l'indice di una tabella 256 x 256 con
+  il matte già pronto. La tabella contiene la distanza di tinta dal colore del key (angolo nel piano CbCr) con
+  tolleranza e sfumatura, la protezione dei grigi (i pixel con poca crominanza non vengono mai tolti) e il clip del
+  matte. Per leggerla si prendono Cr e Cb di ogni pixel come un solo uint16 direttamente dal buffer YCrCb, senza copie,
+  e si usa np.take;
+- luma key: il matte è un cv2.LUT della luminanza (cv2.cvtColor BGR2GRAY) con una tabella di clip basso/alto e
+  sfumatura, eventualmente invertita.
+
+Con halfResolution il matte viene calcolato sul frame ridotto a metà (cv2.resize INTER_AREA) e riportato alla
+risoluzione piena con un resize lineare: i pixel da leggere in tabella diventano un quarto, e il bordo del matte
+risulta comunque morbido. È l'opzione da usare per una camera green screen a 1080p60 su una macchina senza GPU.
+"""
+
+
+@functools.lru_cache(maxsize=16)
+def chromaTable(keyCb, keyCr, tolerance, softness, minChroma, clipLow, clipHigh):
+    """
+    Tabella del chroma key.
+    :param keyCb: Cb del colore del key
+    :param keyCr: Cr del colore del key
+    :param tolerance: metà dell'apertura in gradi dell'angolo di tinta tolto del tutto
+    :param softness: gradi di sfumatura oltre la tolleranza
+    :param minChroma: crominanza sotto la quale un pixel non viene tolto (grigi, bianchi, neri)
+    :param clipLow: valore del matte portato a 0
+    :param clipHigh: valore del matte portato a 255
+    :return: np.ndarray uint8 di 65536 valori, indice Cb * 256 + Cr, in sola lettura
+    """
+    cb = np.arange(256, dtype=np.float32)[:, np.newaxis] - 128
+    cr = np.arange(256, dtype=np.float32)[np.newaxis, :] - 128
+    keyAngle = math.atan2(keyCr - 128, keyCb - 128)
+    distance = np.abs(np.angle(np.exp(1j * (np.arctan2(cr, cb) - keyAngle)))) * np.float32(180 / math.pi)
+    hueKey = np.clip((tolerance + softness - distance) / max(softness, 1e-3), 0.0, 1.0)
+    chroma = np.hypot(cb, cr)
+    chromaKey = np.clip((chroma - minChroma) / max(minChroma, 1.0), 0.0, 1.0)
+    matte = 255.0 * (1.0 - hueKey * chromaKey)
+    matte = np.clip((matte - clipLow) * 255.0 / max(clipHigh - clipLow, 1), 0, 255)
+    table = np.rint(matte).astype(np.uint8).reshape(-1)
+    table.flags.writeable = False
+    return table
+
+
+@functools.lru_cache(maxsize=16)
+def lumaTable(low, high, softness, invert):
+    """
+    Tabella del luma key: 0 sotto low, 255 sopra high, con una rampa di softness livelli su ogni soglia.
+    :param invert: True per togliere le parti chiare invece delle scure
+    :return: np.ndarray uint8 di 256 valori in sola lettura
+    """
+    luma = np.arange(256, dtype=np.float32)
+    softness = max(float(softness), 1.0)
+    matte = np.clip((luma - low) / softness, 0.0, 1.0) * np.clip((high - luma) / softness + 1.0, 0.0, 1.0)
+    if invert:
+        matte = 1.0 - matte
+    table = np.rint(matte * 255.0).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+class Keyer:
+    """
+    Base dei keyer. version aumenta ad ogni cambio di parametro, così l'input sa quando rielaborare il frame.
+    """
+    _keyAttributes = frozenset(("halfResolution",))
+    version = 0
+
+    def __init__(self, halfResolution=False):
+        self.halfResolution = halfResolution
+        self._smallBuffers = FrameBuffers(count=1)
+        self._smallMatteBuffers = FrameBuffers(count=1)
+        self._matteBuffers = FrameBuffers()
+        self._outputBuffers = FrameBuffers()
+        self._channelBuffers = FrameBuffers(count=3)
+
+    def __setattr__(self, name, value):
+        if name in self._keyAttributes and self.__dict__.get(name, getattr(type(self), name, None)) != value:
+            super().__setattr__("version", self.version + 1)
+        super().__setattr__(name, value)
+
+    def _computeMatte(self, frame, dst):
+        """
+        Scrive in dst il matte del frame. La base non toglie niente: matte tutto a 255, l'input resta opaco.
+        """
+        dst.fill(255)
+
+    def matte(self, frame):
+        """
+        Matte uint8 del frame, alla risoluzione del frame anche con halfResolution.
+        :param frame: frame BGR
+        :return: matte in un buffer a rotazione, 255 dove il frame resta visibile
+        """
+        height, width = frame.shape[:2]
+        matte = self._matteBuffers.next((height, width))
+        if not self.halfResolution:
+            self._computeMatte(frame, matte)
+            return matte
+        smallSize = (max(1, width // 2), max(1, height // 2))
+        small = self._smallBuffers.next((smallSize[1], smallSize[0], 3))
+        cv2.resize(frame, smallSize, dst=small, interpolation=cv2.INTER_AREA)
+        smallMatte = self._smallMatteBuffers.next((smallSize[1], smallSize[0]))
+        self._computeMatte(small, smallMatte)
+        cv2.resize(smallMatte, (width, height), dst=matte, interpolation=cv2.INTER_LINEAR)
+        return matte
+
+    def _suppressSpill(self, channels):
+        pass
+
+    @timedStage("keyer")
+    def apply(self, frame):
+        """
+        Il frame viene diviso nei tre canali (cv2.split in buffer riusati), il fill viene corretto sui canali e il
+        frame BGRA viene ricomposto con un solo cv2.merge insieme al matte.
+        :param frame: frame BGR dell'input
+        :return: frame BGRA con il fill e il matte nel canale alpha
+        """
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        elif frame.shape[2] == 4:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        matte = self.matte(frame)
+        channels = [self._channelBuffers.next(frame.shape[:2]) for _ in range(3)]
+        cv2.split(frame, channels)
+        self._suppressSpill(channels)
+        output = self._outputBuffers.next(frame.shape[:2] + (4,))
+        cv2.merge(channels + [matte], output)
+        return output
+
+
+class ChromaKeyer(Keyer):
+    """
+    Chroma key su un colore (di default il verde) con soppressione dello spill: il canale dominante del colore del key
+    viene limitato al massimo degli altri due, così i riflessi verdi (o blu) sul soggetto spariscono.
+    """
+    _keyAttributes = Keyer._keyAttributes | frozenset((
+        "keyColor", "tolerance", "softness", "minChroma", "clipLow", "clipHigh", "spillSuppression"))
+
+    def __init__(self, keyColor=(0, 255, 0), tolerance=30.0, softness=20.0, minChroma=20.0, clipLow=0, clipHigh=255,
+                 spillSuppression=True, halfResolution=False):
+        """
+        :param keyColor: colore del fondo in BGR
+        :param tolerance: gradi di tinta attorno al colore del key tolti del tutto
+        :param softness: gradi di sfumatura oltre la tolleranza
+        :param minChroma: crominanza minima (0-128) perché un pixel possa essere tolto
+        :param clipLow: valore del matte portato a 0 (pulisce il fondo)
+        :param clipHigh: valore del matte portato a 255 (chiude i buchi nel soggetto)
+        :param spillSuppression: True per togliere lo spill dal fill
+        :param halfResolution: True per calcolare il matte a metà risoluzione
+        """
+        super().__init__(halfResolution)
+        self.keyColor = tuple(keyColor)
+        self.tolerance = tolerance
+        self.softness = softness
+        self.minChroma = minChroma
+        self.clipLow = clipLow
+        self.clipHigh = clipHigh
+        self.spillSuppression = spillSuppression
+        self._yccBuffers = FrameBuffers(count=1)
+        self._limitBuffers = FrameBuffers(count=1)
+
+    def table(self):
+        keyPixel = np.array([[self.keyColor]], dtype=np.uint8)
+        _, keyCr, keyCb = (int(value) for value in cv2.cvtColor(keyPixel, cv2.COLOR_BGR2YCrCb)[0, 0])
+        return chromaTable(keyCb, keyCr, float(self.tolerance), float(self.softness), float(self.minChroma),
+                           int(self.clipLow), int(self.clipHigh))
+
+    def _computeMatte(self, frame, dst):
+        ycc = self._yccBuffers.next(frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb, dst=ycc)
+        # Cr e Cb di ogni pixel letti come un uint16 little endian (Cr + 256 * Cb), l'indice della tabella
+        index = np.ndarray((ycc.shape[0] * ycc.shape[1],), dtype="<u2", buffer=ycc, offset=1, strides=(3,))
+        np.take(self.table(), index, out=dst.reshape(-1), mode="clip")
+
+    def _suppressSpill(self, channels):
+        if not self.spillSuppression:
+            return
+        dominant = int(np.argmax(self.keyColor))
+        first, second = (channels[channel] for channel in range(3) if channel != dominant)
+        limit = self._limitBuffers.next(first.shape)
+        cv2.max(first, second, dst=limit)
+        cv2.min(channels[dominant], limit, dst=channels[dominant])
+
+
+class LumaKeyer(Keyer):
+    """
+    Luma key: toglie le parti scure (o chiare con invert) del frame, per loghi e grafiche su fondo nero o bianco.
+    """
+    _keyAttributes = Keyer._keyAttributes | frozenset(("low", "high", "softness", "invert"))
+
+    def __init__(self, low=16, high=255, softness=16, invert=False, halfResolution=False):
+        """
+        :param low: luminanza sotto la quale il pixel viene tolto
+        :param high: luminanza sopra la quale il pixel viene tolto (255 per tenere tutti i chiari)
+        :param softness: livelli di sfumatura sulle soglie
+        :param invert: True per togliere le parti chiare
+        :param halfResolution: True per calcolare il matte a metà risoluzione
+        """
+        super().__init__(halfResolution)
+        self.low = low
+        self.high = high
+        self.softness = softness
+        self.invert = invert
+        self._lumaBuffers = FrameBuffers(count=1)
+
+    def _computeMatte(self, frame, dst):
+        luma = self._lumaBuffers.next(frame.shape[:2])
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=luma)
+        cv2.LUT(luma, lumaTable(int(self.low), int(self.high), float(self.softness), bool(self.invert)), dst=dst)
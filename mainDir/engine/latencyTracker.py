@@ -0,0 +1,169 @@
+import time
+
+from mainDir.engine.stageTimer import StageStatistics
+
+"""
+Misura della latenza end-to-end. Nel docstring di MonitorWidget012 c'è la misura fatta a mano filmando un cronometro:
+circa 43 ms (2.6 frame a 60 fps) dal vetro al vetro. Qui ogni frame porta con sé un FrameStamp con numero di sequenza
+della sorgente e i tempi (perf_counter_ns) di cattura, elaborazione, mix e visualizzazione, e il LatencyTracker
+raccoglie le latenze in ring buffer come lo stageTimer:
+- captureToProgram.<input>: dalla cattura al mix che lo manda in program (captureToPreview, captureToAux.<nome>
+  per le altre uscite, una volta per uscita anche se lo stesso frame va su più uscite);
+- programToDisplay.<display>: dal mix alla visualizzazione su un monitor o sull'uscita;
+- captureToDisplay.<display>: dalla cattura dell'input in program alla prima visualizzazione del frame.
+
+Il tempo di cattura è quello della lettura dal dispositivo quando l'input lo conosce (captureTimestampNs, ad esempio
+il momento in cui il CaptureWorker ha pubblicato il frame), altrimenti il momento in cui l'EvaluationGraph ha chiamato
+captureFrame. Se il driver fornisce un timestamp (CAP_PROP_POS_MSEC) viene riportato in driverMs.
+
+Il flusso:
+- l'EvaluationGraph chiama stampCapture dopo ogni captureFrame: se l'input ha un frame nuovo gli assegna un nuovo
+  FrameStamp in input.frameStamp;
+- VersionedFrame.processedFrame segna il tempo di elaborazione;
+- il MixBus014 chiama markMixed per program e preview, che restituisce un token (stamp, istante del mix);
+- monitor e uscite chiamano markDisplayed con il token del frame che stanno mostrando.
+
+latencyTracker è l'istanza condivisa da tutto il mixer.
+"""
+
+
+class FrameStamp:
+    __slots__ = ("sourceName", "sequence", "captureNs", "driverMs", "processNs", "mixNs", "displayNs")
+
+    def __init__(self, sourceName, sequence, captureNs, driverMs=None):
+        self.sourceName = sourceName
+        self.sequence = sequence
+        self.captureNs = captureNs
+        self.driverMs = driverMs
+        self.processNs = None
+        # istante del primo mix per ogni uscita (program, preview, aux...)
+        self.mixNs = {}
+        # istante della prima visualizzazione per ogni monitor/uscita
+        self.displayNs = {}
+
+    def __repr__(self):
+        return f"FrameStamp({self.sourceName}, seq={self.sequence}, captureNs={self.captureNs})"
+
+
+def sourceName(source):
+    """
+    Nome con cui un input compare nelle statistiche: l'attributo name se c'è, altrimenti classe e id.
+    """
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and name:
+        return name
+    return f"{type(source).__name__}@{id(source) & 0xFFFF:04x}"
+
+
+class LatencyTracker:
+
+    def __init__(self, size=600, enabled=True, timeSource=time.perf_counter_ns):
+        self.size = size
+        self.enabled = enabled
+        self.timeSource = timeSource
+        self.frameDurationNs = 0
+        self._latencies = {}
+        self._tokens = {}
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
+    def setFrameDuration(self, frameDurationNs):
+        self.frameDurationNs = int(frameDurationNs)
+
+    def _record(self, key, durationNs):
+        statistics = self._latencies.get(key)
+        if statistics is None:
+            statistics = self._latencies[key] = StageStatistics(self.size)
+        statistics.add(durationNs, 0)
+
+    def stampCapture(self, source, nowNs=None):
+        """
+        Assegna un nuovo FrameStamp all'input se dall'ultima volta ha un frame nuovo.
+        La novità si riconosce dalla contentVersion (VersionedFrame) o dal sourceSequence dell'input.
+        :param source: l'input appena catturato
+        :param nowNs: istante della cattura, di default adesso
+        """
+        if not self.enabled:
+            return
+        sequence = getattr(source, "sourceSequence", None)
+        if sequence is None:
+            sequence = getattr(source, "contentVersion", 0)
+        stamp = getattr(source, "frameStamp", None)
+        if stamp is not None and stamp.sequence == sequence:
+            return
+        captureNs = getattr(source, "captureTimestampNs", None) or nowNs or self.timeSource()
+        driverMs = getattr(source, "driverTimestampMs", None) or None
+        source.frameStamp = FrameStamp(sourceName(source), sequence, captureNs, driverMs)
+
+    def markProcessed(self, source):
+        stamp = getattr(source, "frameStamp", None)
+        if self.enabled and stamp is not None:
+            stamp.processNs = self.timeSource()
+
+    def markMixed(self, output, source):
+        """
+        Registra il mix di un input su un'uscita del mixBus (program o preview).
+        :param output: nome dell'uscita, es. "program"
+        :param source: l'input che va sull'uscita
+        :return: token da passare a markDisplayed, None se l'input non ha un FrameStamp
+        """
+        if not self.enabled:
+            return None
+        stamp = getattr(source, "frameStamp", None)
+        if stamp is None:
+            self._tokens[output] = None
+            return None
+        mixNs = self.timeSource()
+        # lo stesso frame può andare su più uscite (preview e program, un aux): la latenza vale per ognuna
+        if output not in stamp.mixNs:
+            stamp.mixNs[output] = mixNs
+            self._record(f"captureTo{output.capitalize()}.{stamp.sourceName}", mixNs - stamp.captureNs)
+        token = (stamp, mixNs)
+        self._tokens[output] = token
+        return token
+
+    def currentToken(self, output):
+        """
+        :return: il token dell'ultimo frame mixato sull'uscita
+        """
+        return self._tokens.get(output)
+
+    def markDisplayed(self, display, token):
+        """
+        Registra la visualizzazione di un frame.
+        :param display: nome del monitor o dell'uscita, es. "programMonitor", "mainOut"
+        :param token: il token restituito da markMixed per il frame visualizzato
+        """
+        if not self.enabled or token is None:
+            return
+        stamp, mixNs = token
+        displayNs = self.timeSource()
+        self._record(f"programToDisplay.{display}", displayNs - mixNs)
+        # un frame statico viene visualizzato per molti tick: la latenza dalla cattura vale solo la prima volta
+        if display not in stamp.displayNs:
+            stamp.displayNs[display] = displayNs
+            self._record(f"captureToDisplay.{display}", displayNs - stamp.captureNs)
+
+    def getStatistics(self):
+        """
+        Latenze in millisecondi e, se il SynchObject ha impostato la durata del frame, in frame.
+        :return: dizionario per chiave di latenza
+        """
+        result = {}
+        for key, statistics in list(self._latencies.items()):
+            values = statistics.getStatistics()
+            if self.frameDurationNs and values["count"]:
+                frameMs = self.frameDurationNs / 1e6
+                values["p50Frames"] = values["p50"] / frameMs
+                values["p99Frames"] = values["p99"] / frameMs
+            values.pop("deadlineMisses", None)
+            result[key] = values
+        return result
+
+    def reset(self):
+        self._latencies = {}
+        self._tokens = {}
+
+
+latencyTracker = LatencyTracker()
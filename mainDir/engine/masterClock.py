@@ -0,0 +1,283 @@
+import time
+from fractions import Fraction
+
+"""
+Il MasterClock è il riferimento temporale di tutto il mixer. Il vecchio SynchObject faceva partire un QTimer con
+1000 // fps millisecondi: a 60 fps si ottengono 16 ms, quindi 62.5 Hz reali, e ogni ritardo del thread della GUI
+si accumulava come deriva.
+
+Il MasterClock invece non conta gli intervalli ma calcola le scadenze assolute a partire da un'epoca iniziale:
+la scadenza del frame n è epoch + n * durata_frame, calcolata in nanosecondi interi con un frame rate razionale
+(60000/1001 per 59.94, 30000/1001 per 29.97, ecc.), quindi non c'è nessun errore di arrotondamento che si accumula.
+Ogni tick viene marcato con il numero di frame e il PTS di destinazione; se il tick arriva in ritardo viene contato
+come late, se nel frattempo sono passate una o più scadenze i frame saltati vengono contati come skipped e il
+numero di frame salta direttamente a quello corretto.
+
+La sorgente temporale è time.perf_counter_ns (monotona e ad alta risoluzione), ma può essere sostituita,
+ad esempio con un VirtualTimeSource per far girare il mixer senza interfaccia più veloce del tempo reale.
+"""
+
+NANOSECONDS = 1_000_000_000
+
+# frame rate NTSC: il valore nominale è moltiplicato per 1000/1001
+_NTSC_RATES = {
+    23.976: Fraction(24000, 1001),
+    29.97: Fraction(30000, 1001),
+    47.952: Fraction(48000, 1001),
+    59.94: Fraction(60000, 1001),
+    119.88: Fraction(120000, 1001),
+}
+
+
+def rateFromFps(fps):
+    """
+    Converte un frame rate in una frazione esatta.
+    Accetta interi (25, 50, 60), float NTSC (29.97, 59.94), Fraction o tuple (numeratore, denominatore).
+    :param fps: il frame rate
+    :return: Fraction con il frame rate esatto
+    """
+    if isinstance(fps, Fraction):
+        rate = fps
+    elif isinstance(fps, tuple):
+        rate = Fraction(fps[0], fps[1])
+    else:
+        rate = None
+        for nominal, exact in _NTSC_RATES.items():
+            if abs(fps - nominal) < 0.005:
+                rate = exact
+                break
+        if rate is None:
+            rate = Fraction(fps).limit_denominator(1001)
+    if rate <= 0:
+        raise ValueError(f"Invalid frame rate: {fps}")
+    return rate
+
+
+def framesSince(lastFrame, frameNumber):
+    """
+    Frame passati tra due chiamate di chi avanza di un passo per tick (fade to black, livelli DSK, aux),
+    così due chiamate nello stesso tick non avanzano due volte e un tick saltato non rallenta la transizione.
+    :param lastFrame: numero di frame della chiamata precedente, None alla prima chiamata
+    :param frameNumber: numero di frame corrente, None se non c'è un clock
+    :return: 1 alla prima chiamata o senza numero di frame, altrimenti i frame passati (0 nello stesso tick)
+    """
+    if frameNumber is None or lastFrame is None:
+        return 1
+    return max(0, frameNumber - lastFrame)
+
+
+class ClockTick:
+    """
+    Descrive un singolo tick del MasterClock.
+    - frameNumber: numero progressivo del frame (parte da 0)
+    - ptsNs: presentation timestamp di destinazione del frame, in ns dall'inizio del clock
+    - deadlineNs: istante assoluto (nella base tempi del clock) in cui il frame era previsto
+    - nowNs: istante in cui il tick è stato effettivamente processato
+    - isLate: True se il tick è arrivato oltre la tolleranza
+    - skipped: numero di frame saltati prima di questo tick
+    """
+    __slots__ = ("frameNumber", "ptsNs", "deadlineNs", "nowNs", "isLate", "skipped")
+
+    def __init__(self, frameNumber, ptsNs, deadlineNs, nowNs, isLate, skipped):
+        self.frameNumber = frameNumber
+        self.ptsNs = ptsNs
+        self.deadlineNs = deadlineNs
+        self.nowNs = nowNs
+        self.isLate = isLate
+        self.skipped = skipped
+
+    @property
+    def lateNs(self):
+        """
+        Ritardo del tick rispetto alla scadenza, in ns.
+        """
+        return self.nowNs - self.deadlineNs
+
+    def __repr__(self):
+        return (f"ClockTick(frame={self.frameNumber}, pts={self.ptsNs}, late={self.lateNs / 1e6:.3f}ms, "
+                f"skipped={self.skipped})")
+
+
+class VirtualTimeSource:
+    """
+    Sorgente temporale virtuale: il tempo avanza solo quando viene chiamato advance.
+    Serve per i benchmark senza interfaccia e per i test, dove si vuole girare più veloce del tempo reale.
+    """
+
+    def __init__(self, startNs=0):
+        self._nowNs = startNs
+
+    def __call__(self):
+        return self._nowNs
+
+    def advance(self, deltaNs):
+        self._nowNs += int(deltaNs)
+
+    def advanceTo(self, timeNs):
+        self._nowNs = max(self._nowNs, int(timeNs))
+
+
+class MasterClock:
+    """
+    Clock a scadenze assolute con frame rate razionale.
+    Non ha dipendenze da Qt: il SynchObject lo usa per decidere quando emettere il segnale di sincronia,
+    ma può essere usato anche direttamente da un loop senza interfaccia.
+    """
+
+    def __init__(self, fps=60, timeSource=time.perf_counter_ns, lateTolerance=0.5):
+        """
+        :param fps: frame rate (int, float NTSC, Fraction o tupla)
+        :param timeSource: funzione che restituisce il tempo corrente in ns
+        :param lateTolerance: frazione di frame oltre la quale un tick è considerato in ritardo
+        """
+        self.timeSource = timeSource
+        self.lateTolerance = lateTolerance
+        self.rate = rateFromFps(fps)
+        self._epochNs = None
+        self._startNs = 0
+        self._epochFrame = 0
+        self.frameNumber = -1
+        self.lastTick = None
+        self.lateTicks = 0
+        self.skippedTicks = 0
+        self.totalTicks = 0
+        self.maxLateNs = 0
+
+    @property
+    def fps(self):
+        """
+        Frame rate come float, per la compatibilità con il codice che usa synchObject.fps.
+        """
+        return float(self.rate)
+
+    @property
+    def frameDurationNs(self):
+        return NANOSECONDS * self.rate.denominator / self.rate.numerator
+
+    def setFps(self, fps):
+        """
+        Cambia il frame rate. Il clock riparte con una nuova epoca dal frame corrente,
+        quindi la numerazione dei frame continua senza salti.
+        :param fps: nuovo frame rate
+        """
+        self.rate = rateFromFps(fps)
+        if self._epochNs is not None:
+            self._rebase(self.timeSource())
+
+    def isStarted(self):
+        return self._epochNs is not None
+
+    def start(self, nowNs=None):
+        """
+        Fa partire il clock: il frame 0 scade subito.
+        :param nowNs: istante iniziale (di default il tempo corrente)
+        """
+        self._epochNs = self.timeSource() if nowNs is None else nowNs
+        self._startNs = self._epochNs
+        self._epochFrame = 0
+        self.frameNumber = -1
+        self.lastTick = None
+
+    def reset(self):
+        """
+        Azzera le statistiche e ferma il clock.
+        """
+        self._epochNs = None
+        self._epochFrame = 0
+        self.frameNumber = -1
+        self.lastTick = None
+        self.lateTicks = 0
+        self.skippedTicks = 0
+        self.totalTicks = 0
+        self.maxLateNs = 0
+
+    def _rebase(self, nowNs):
+        """
+        Sposta l'epoca in modo che il prossimo frame scada adesso, usato quando cambia il frame rate.
+        """
+        self._epochNs = nowNs
+        self._epochFrame = self.frameNumber + 1
+
+    def _framesToNs(self, frames):
+        """
+        Durata di un numero intero di frame, con aritmetica intera: frames * 1e9 * den // num,
+        quindi senza deriva anche dopo ore.
+        """
+        return frames * NANOSECONDS * self.rate.denominator // self.rate.numerator
+
+    def ptsNs(self, frameNumber):
+        """
+        PTS di destinazione del frame, in ns dall'avvio del clock.
+        """
+        return self.deadlineNs(frameNumber) - self._startNs
+
+    def deadlineNs(self, frameNumber):
+        """
+        Istante assoluto in cui il frame deve essere prodotto.
+        """
+        return self._epochNs + self._framesToNs(frameNumber - self._epochFrame)
+
+    def nextDeadlineNs(self):
+        """
+        Scadenza del prossimo frame.
+        """
+        if self._epochNs is None:
+            return self.timeSource()
+        return self.deadlineNs(self.frameNumber + 1)
+
+    def timeToNextTickNs(self, nowNs=None):
+        """
+        Tempo mancante alla prossima scadenza (negativo se è già passata).
+        """
+        nowNs = self.timeSource() if nowNs is None else nowNs
+        return self.nextDeadlineNs() - nowNs
+
+    def isDue(self, nowNs=None):
+        """
+        True se la scadenza del prossimo frame è già passata.
+        """
+        return self.timeToNextTickNs(nowNs) <= 0
+
+    def tick(self, nowNs=None):
+        """
+        Avanza il clock. Il numero di frame diventa quello dell'ultima scadenza passata: se è passata più di una
+        scadenza i frame intermedi vengono contati come saltati. Se nessuna scadenza è passata (timer arrivato in
+        anticipo) il clock avanza comunque di un frame, in modo che ogni chiamata produca un frame nuovo.
+        :param nowNs: istante corrente (di default il tempo della sorgente)
+        :return: ClockTick
+        """
+        if self._epochNs is None:
+            self.start(nowNs)
+        nowNs = self.timeSource() if nowNs is None else nowNs
+        expected = self.frameNumber + 1
+        elapsed = nowNs - self._epochNs
+        if elapsed >= 0:
+            due = self._epochFrame + elapsed * self.rate.numerator // (NANOSECONDS * self.rate.denominator)
+        else:
+            due = expected
+        frameNumber = max(expected, due)
+        skipped = frameNumber - expected
+        deadline = self.deadlineNs(frameNumber)
+        isLate = (nowNs - deadline) > self.lateTolerance * self.frameDurationNs
+        self.frameNumber = frameNumber
+        self.totalTicks += 1
+        self.skippedTicks += skipped
+        if isLate:
+            self.lateTicks += 1
+        self.maxLateNs = max(self.maxLateNs, nowNs - deadline)
+        self.lastTick = ClockTick(frameNumber, self.ptsNs(frameNumber), deadline, nowNs, isLate, skipped)
+        return self.lastTick
+
+    def getStatistics(self):
+        """
+        Ritorna un dizionario con le statistiche del clock.
+        """
+        return {
+            "fps": self.fps,
+            "rate": f"{self.rate.numerator}/{self.rate.denominator}",
+            "frameNumber": self.frameNumber,
+            "totalTicks": self.totalTicks,
+            "lateTicks": self.lateTicks,
+            "skippedTicks": self.skippedTicks,
+            "maxLateMs": self.maxLateNs / 1e6,
+        }
@@ -0,0 +1,148 @@
+import collections
+import time
+from enum import Enum
+
+"""
+Governatore del budget del frame. Quando un tick sfora il budget rallenta tutto insieme: program, monitor di preview,
+scope e multiviewer. In diretta un program che scatta non è accettabile, mentre un preview a 30 fps va benissimo.
+
+Il SynchObject chiama beginTick ed endTick attorno ad ogni tick: il RenderGovernor misura il tempo usato rispetto al
+budget (1 / fps) e, se il carico resta sopra highLoad per shedAfter tick consecutivi (o il clock ha saltato frame),
+toglie il prossimo livello di lavoro, in ordine di priorità:
+- PREVIEW_RATE: il monitor di preview e il multiviewer (tranne il riquadro del program) a metà frequenza;
+- SCOPE_RATE: RGB parade e waveform a metà frequenza;
+- MONITOR_SCALING: il Downscaler dei monitor non di program e del multiviewer usa INTER_NEAREST in un solo passo;
+- UNROUTED_INPUTS: il multiviewer non aggiorna i riquadri degli input che non sono né in preview né in program, così
+  l'EvaluationGraph non li cattura più.
+Quando il carico resta sotto lowLoad per restoreAfter tick il livello tolto per ultimo viene ripristinato. La soglia
+di ripristino è più lunga di quella di taglio, così il governatore non oscilla tra due livelli.
+
+Il percorso del program (mixBus, aux, DSK, monitor di program, getDirtyFrame e uscite) non chiede mai il
+governatore: non viene mai degradato.
+
+Chi fa lavoro degradabile chiede isShed(livello) o isDue(livello, contatore). Ogni taglio e ogni ripristino viene
+registrato in events e restituito da endTick; il SynchObject lo emette con governor_SIGNAL.
+
+renderGovernor è l'istanza condivisa da tutto il mixer.
+"""
+
+
+class SHED_LEVEL(Enum):
+    PREVIEW_RATE = "previewRate"
+    SCOPE_RATE = "scopeRate"
+    MONITOR_SCALING = "monitorScaling"
+    UNROUTED_INPUTS = "unroutedInputs"
+
+
+class RenderGovernor:
+    # ordine in cui i livelli vengono tolti, il ripristino va al contrario
+    LEVELS = (SHED_LEVEL.PREVIEW_RATE, SHED_LEVEL.SCOPE_RATE, SHED_LEVEL.MONITOR_SCALING, SHED_LEVEL.UNROUTED_INPUTS)
+
+    def __init__(self, highLoad=0.85, lowLoad=0.5, shedAfter=3, restoreAfter=120, rateDivisor=2, enabled=True,
+                 timeSource=time.perf_counter_ns):
+        """
+        :param highLoad: frazione del budget oltre la quale un tick è in sovraccarico
+        :param lowLoad: frazione del budget sotto la quale un tick è scarico
+        :param shedAfter: tick consecutivi in sovraccarico prima di togliere un livello
+        :param restoreAfter: tick consecutivi scarichi prima di ripristinare un livello
+        :param rateDivisor: divisore della frequenza dei livelli di frequenza tolti
+        :param enabled: False per non togliere mai niente
+        """
+        self.highLoad = highLoad
+        self.lowLoad = lowLoad
+        self.shedAfter = shedAfter
+        self.restoreAfter = restoreAfter
+        self.rateDivisor = rateDivisor
+        self.enabled = enabled
+        self.timeSource = timeSource
+        self.frameBudgetNs = 0
+        self.shedCount = 0
+        self.load = 0.0
+        self.events = collections.deque(maxlen=64)
+        self._startNs = 0
+        self._overloadTicks = 0
+        self._idleTicks = 0
+
+    def setFrameBudget(self, budgetNs):
+        self.frameBudgetNs = int(budgetNs)
+
+    def setEnabled(self, enabled):
+        """
+        Disabilitando il governatore tutti i livelli tolti vengono ripristinati.
+        """
+        self.enabled = enabled
+        if not enabled:
+            self.reset()
+
+    def shedLevels(self):
+        return list(self.LEVELS[:self.shedCount])
+
+    def isShed(self, level):
+        return level in self.LEVELS[:self.shedCount]
+
+    def divisor(self, level):
+        return self.rateDivisor if self.isShed(level) else 1
+
+    def isDue(self, level, count):
+        """
+        :param level: livello di frequenza (PREVIEW_RATE, SCOPE_RATE)
+        :param count: numero di frame o contatore degli aggiornamenti di chi chiede
+        :return: True se l'aggiornamento va fatto
+        """
+        return count % self.divisor(level) == 0
+
+    def beginTick(self):
+        self._startNs = self.timeSource()
+
+    def endTick(self, tick=None):
+        """
+        Chiude la misura del tick e toglie o ripristina un livello se serve.
+        :param tick: il ClockTick, se ha saltato dei frame il tick conta come sovraccarico
+        :return: l'evento del taglio o del ripristino, None se non cambia niente
+        """
+        if not self.enabled or not self.frameBudgetNs or not self._startNs:
+            return None
+        self.load = (self.timeSource() - self._startNs) / self.frameBudgetNs
+        self._startNs = 0
+        skipped = tick is not None and tick.skipped > 0
+        if self.load > self.highLoad or skipped:
+            self._overloadTicks += 1
+            self._idleTicks = 0
+        elif self.load < self.lowLoad:
+            self._idleTicks += 1
+            self._overloadTicks = 0
+        else:
+            self._overloadTicks = 0
+            self._idleTicks = 0
+        frameNumber = tick.frameNumber if tick is not None else None
+        if self._overloadTicks >= self.shedAfter and self.shedCount < len(self.LEVELS):
+            self.shedCount += 1
+            self._overloadTicks = 0
+            return self._event("shed", self.LEVELS[self.shedCount - 1], frameNumber)
+        if self._idleTicks >= self.restoreAfter and self.shedCount > 0:
+            self.shedCount -= 1
+            self._idleTicks = 0
+            return self._event("restore", self.LEVELS[self.shedCount], frameNumber)
+        return None
+
+    def _event(self, action, level, frameNumber):
+        event = {"action": action, "level": level.value, "frameNumber": frameNumber, "load": self.load,
+                 "shed": [shed.value for shed in self.shedLevels()]}
+        self.events.append(event)
+        return event
+
+    def reset(self):
+        self.shedCount = 0
+        self._overloadTicks = 0
+        self._idleTicks = 0
+
+    def getStatistics(self):
+        return {
+            "enabled": self.enabled,
+            "load": self.load,
+            "shed": [level.value for level in self.shedLevels()],
+            "events": list(self.events),
+        }
+
+
+renderGovernor = RenderGovernor()
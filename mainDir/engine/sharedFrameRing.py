@@ -0,0 +1,181 @@
+import time
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+
+"""
+Ring di frame in memoria condivisa tra un processo che scrive (il worker di un input) e il processo del mixer che legge.
+Il blocco di memoria condivisa contiene:
+- un header di interi a 64 bit: magic, numero di slot, forma del frame, sequenza e slot dell'ultimo frame pubblicato,
+  slot in uso dal reader, pid e heartbeat del writer;
+- la sequenza di ogni slot;
+- gli slot con i frame.
+
+Il protocollo è un seqlock per slot: il writer marca lo slot con -1 prima di scriverlo e con la nuova sequenza dopo,
+poi pubblica sequenza e slot nell'header. Il reader prende l'ultimo slot pubblicato, lo dichiara in uso (held) e
+controlla che la sequenza dello slot sia ancora quella pubblicata; il writer non scrive mai negli slot held e retired
+(quello consegnato nel tick precedente). Così il reader restituisce una view sullo slot senza copie, e il frame resta
+valido finché il reader non chiede il frame successivo, come nel TripleBuffer della cattura threaded.
+
+Il ring viene creato dal processo del mixer (create=True), che ne è il proprietario e lo distrugge con unlink;
+il worker si collega per nome. Se il worker muore il ring resta valido e un nuovo worker può riprendere a scriverci.
+"""
+
+MAGIC = 0x4F5056524E47  # "OPVRNG"
+
+_MAGIC, _SLOTS, _HEIGHT, _WIDTH, _CHANNELS, _LATEST_SEQUENCE, _LATEST_SLOT, _HELD, _RETIRED, _WRITER_PID, \
+    _HEARTBEAT = range(11)
+_HEADER_LENGTH = 16
+
+
+class SharedFrameRing:
+
+    def __init__(self, shape, slots=4, name=None, create=True):
+        """
+        :param shape: forma dei frame, es. (1080, 1920, 3)
+        :param slots: numero di slot, almeno 4: ultimo pubblicato, held, retired e uno libero per il writer
+        :param name: nome del blocco di memoria condivisa, generato se create=True e name=None
+        :param create: True nel processo proprietario, False nel worker che si collega
+        """
+        if slots < 4:
+            raise ValueError("SharedFrameRing needs at least 4 slots")
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frameBytes = int(np.prod(self.shape))
+        headerBytes = (_HEADER_LENGTH + slots) * 8
+        size = headerBytes + self.frameBytes * slots
+        if create:
+            name = name or f"opv_{uuid.uuid4().hex[:16]}"
+            self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self.name = self._memory.name
+        self.isOwner = create
+        buffer = self._memory.buf
+        self._header = np.ndarray((_HEADER_LENGTH,), dtype=np.int64, buffer=buffer)
+        self._slotSequence = np.ndarray((slots,), dtype=np.int64, buffer=buffer, offset=_HEADER_LENGTH * 8)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buffer, offset=headerBytes)
+        if create:
+            self._header[:] = 0
+            self._header[_MAGIC] = MAGIC
+            self._header[_SLOTS] = slots
+            self._header[_HEIGHT:_CHANNELS + 1] = self.shape
+            self._header[_HELD] = -1
+            self._header[_RETIRED] = -1
+            self._slotSequence[:] = 0
+        elif self._header[_MAGIC] != MAGIC or tuple(self._header[_HEIGHT:_CHANNELS + 1]) != self.shape:
+            self.close()
+            raise ValueError(f"Shared memory {name} is not a frame ring of shape {self.shape}")
+        self._nextSlot = 0
+        self.readSequence = 0
+        self.publishedFrames = 0
+        self.droppedFrames = 0
+
+    # ------------------------------------------------------------------ writer
+
+    def _acquireSlot(self):
+        header = self._header
+        for _ in range(self.slots * 2):
+            slot = self._nextSlot
+            self._nextSlot = (self._nextSlot + 1) % self.slots
+            if (header[_LATEST_SEQUENCE] and slot == header[_LATEST_SLOT]) or slot in (header[_HELD], header[_RETIRED]):
+                continue
+            previous = self._slotSequence[slot]
+            self._slotSequence[slot] = -1
+            # il reader potrebbe aver dichiarato lo slot in uso nel frattempo: in quel caso si rinuncia
+            if slot in (header[_HELD], header[_RETIRED]):
+                self._slotSequence[slot] = previous
+                continue
+            return slot
+        return None
+
+    def write(self, frame):
+        """
+        Copia un frame nel primo slot libero e lo pubblica. Da chiamare solo dal processo del writer.
+        :param frame: np.ndarray uint8 della forma del ring
+        :return: la sequenza del frame pubblicato, o None se non c'era uno slot libero
+        """
+        slot = self._acquireSlot()
+        if slot is None:
+            return None
+        np.copyto(self._frames[slot], frame)
+        sequence = int(self._header[_LATEST_SEQUENCE]) + 1
+        self._slotSequence[slot] = sequence
+        self._header[_LATEST_SLOT] = slot
+        self._header[_LATEST_SEQUENCE] = sequence
+        self._header[_HEARTBEAT] = time.monotonic_ns()
+        self.publishedFrames += 1
+        return sequence
+
+    def setWriterPid(self, pid):
+        self._header[_WRITER_PID] = pid
+
+    # ------------------------------------------------------------------ reader
+
+    def latest(self):
+        """
+        Restituisce l'ultimo frame pubblicato senza copiarlo. Da chiamare solo dal processo del reader.
+        Il frame è una view sulla memoria condivisa, valida fino alla chiamata successiva.
+        :return: (frame, sequence, isNew); frame è None se il writer non ha ancora pubblicato nulla
+        """
+        header = self._header
+        for _ in range(self.slots):
+            sequence = int(header[_LATEST_SEQUENCE])
+            if sequence == 0:
+                return None, 0, False
+            if sequence == self.readSequence:
+                return self._frames[int(header[_HELD])], sequence, False
+            slot = int(header[_LATEST_SLOT])
+            previousHeld = int(header[_HELD])
+            previousRetired = int(header[_RETIRED])
+            # il frame consegnato l'ultima volta diventa retired prima di cambiare held: non c'è nessun momento in cui
+            # il writer lo vede libero
+            if previousHeld != slot:
+                header[_RETIRED] = previousHeld
+            header[_HELD] = slot
+            if self._slotSequence[slot] == sequence:
+                if self.readSequence:
+                    self.droppedFrames += sequence - self.readSequence - 1
+                self.readSequence = sequence
+                return self._frames[slot], sequence, True
+            # il writer ha già riusato lo slot: si rimette com'era e si riprova con il nuovo ultimo frame
+            header[_HELD] = previousHeld
+            header[_RETIRED] = previousRetired
+        return None, 0, False
+
+    def heartbeatAgeNs(self):
+        """
+        Tempo passato dall'ultimo frame scritto dal worker, None se non ha ancora scritto nulla.
+        """
+        heartbeat = int(self._header[_HEARTBEAT])
+        if heartbeat == 0:
+            return None
+        return time.monotonic_ns() - heartbeat
+
+    def getStatistics(self):
+        return {
+            "name": self.name,
+            "slots": self.slots,
+            "latestSequence": int(self._header[_LATEST_SEQUENCE]),
+            "readSequence": self.readSequence,
+            "droppedFrames": self.droppedFrames,
+            "writerPid": int(self._header[_WRITER_PID]),
+        }
+
+    def close(self):
+        """
+        Chiude il collegamento e, se questo processo è il proprietario, distrugge il blocco di memoria condivisa.
+        Dopo close i frame restituiti da latest non sono più validi.
+        """
+        self._header = self._slotSequence = self._frames = None
+        if self.isOwner:
+            try:
+                self._memory.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            self._memory.close()
+        except BufferError:
+            # qualche consumer ha ancora in mano un frame: la memoria viene liberata quando lo rilascia
+            pass
@@ -0,0 +1,162 @@
+import functools
+import time
+
+import numpy as np
+
+"""
+Misura dei tempi delle fasi del tick. L'unico strumento era il cProfile su tutto il processo in main.py, che rallenta
+tutto e stampa i risultati solo all'uscita. Lo StageTimer invece è sempre attivo e costa due letture di
+perf_counter_ns per misura; si interroga a runtime con getStatistics.
+
+Ogni fase (captureFrame, frameProcessor, getMix.MIX, monitor.updateFrame, ...) ha un StageStatistics con un ring buffer
+delle ultime N durate in nanosecondi. Dal ring buffer si calcolano p50, p95, p99 e massimo; in più viene contato
+quante volte una fase ha superato da sola il budget del frame (1 / fps, impostato dal SynchObject).
+
+Per misurare una fase:
+    startNs = stageTimer.start()
+    ...
+    stageTimer.stop("nomeFase", startNs)
+oppure si decora il metodo con @timedStage("nomeFase").
+Quando il timer è disabilitato start restituisce 0 e stop non fa nulla, il decoratore chiama direttamente il metodo.
+
+stageTimer è l'istanza condivisa da tutto il mixer.
+"""
+
+
+class StageStatistics:
+    """
+    Ring buffer delle ultime durate di una fase.
+    """
+
+    def __init__(self, size):
+        self._samples = np.zeros(size, dtype=np.int64)
+        self._index = 0
+        self.count = 0
+        self.deadlineMisses = 0
+        self.maxNs = 0
+
+    def add(self, durationNs, budgetNs):
+        self._samples[self._index] = durationNs
+        self._index = (self._index + 1) % len(self._samples)
+        self.count += 1
+        if durationNs > self.maxNs:
+            self.maxNs = durationNs
+        if budgetNs and durationNs > budgetNs:
+            self.deadlineMisses += 1
+
+    def samples(self):
+        return self._samples[:min(self.count, len(self._samples))]
+
+    def getStatistics(self):
+        """
+        :return: dizionario con le durate in millisecondi sulle ultime N misure; max e deadlineMisses
+                 sono dall'avvio (o dall'ultimo reset)
+        """
+        samples = self.samples()
+        if len(samples) == 0:
+            return {"count": 0, "deadlineMisses": 0}
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99)) / 1e6
+        return {
+            "count": self.count,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "max": self.maxNs / 1e6,
+            "recentMax": samples.max() / 1e6,
+            "deadlineMisses": self.deadlineMisses,
+        }
+
+
+class StageTimer:
+
+    def __init__(self, size=600, enabled=True, timeSource=time.perf_counter_ns):
+        self.size = size
+        self.enabled = enabled
+        self.timeSource = timeSource
+        self.frameBudgetNs = 0
+        self._stages = {}
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
+    def setFrameBudget(self, budgetNs):
+        """
+        Imposta il budget del frame in nanosecondi: una fase che dura di più conta come deadline miss.
+        :param budgetNs: durata di un frame, es. 16_666_667 a 60 fps
+        """
+        self.frameBudgetNs = int(budgetNs)
+
+    def start(self):
+        """
+        :return: l'istante di inizio della misura, 0 se il timer è disabilitato
+        """
+        if not self.enabled:
+            return 0
+        return self.timeSource()
+
+    def stop(self, stage, startNs):
+        """
+        Chiude la misura iniziata con start e la registra nella fase indicata.
+        :param stage: nome della fase
+        :param startNs: valore restituito da start
+        """
+        if not startNs:
+            return
+        self.record(stage, self.timeSource() - startNs)
+
+    def record(self, stage, durationNs):
+        statistics = self._stages.get(stage)
+        if statistics is None:
+            statistics = self._stages[stage] = StageStatistics(self.size)
+        statistics.add(durationNs, self.frameBudgetNs)
+
+    def stages(self):
+        return list(self._stages)
+
+    def getStatistics(self, stage=None):
+        """
+        Statistiche di una fase o di tutte le fasi.
+        :param stage: nome della fase, None per tutte
+        :return: dizionario delle statistiche
+        """
+        if stage is not None:
+            statistics = self._stages.get(stage)
+            return statistics.getStatistics() if statistics is not None else {"count": 0, "deadlineMisses": 0}
+        return {name: statistics.getStatistics() for name, statistics in list(self._stages.items())}
+
+    def reset(self):
+        self._stages = {}
+
+    def report(self):
+        """
+        :return: una tabella testuale delle statistiche, una fase per riga
+        """
+        lines = [f"{'stage':<40}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'miss':>7}"]
+        for name, statistics in sorted(self.getStatistics().items()):
+            if statistics["count"] == 0:
+                continue
+            lines.append(f"{name:<40}{statistics['count']:>8}{statistics['p50']:>9.3f}{statistics['p95']:>9.3f}"
+                         f"{statistics['p99']:>9.3f}{statistics['max']:>9.3f}{statistics['deadlineMisses']:>7}")
+        return "\n".join(lines)
+
+
+stageTimer = StageTimer()
+
+
+def timedStage(stage):
+    """
+    Decoratore che misura ogni chiamata del metodo nella fase indicata.
+    :param stage: nome della fase
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not stageTimer.enabled:
+                return function(*args, **kwargs)
+            startNs = stageTimer.timeSource()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stageTimer.record(stage, stageTimer.timeSource() - startNs)
+        return wrapper
+    return decorator
@@ -3,13 +3,21 @@ import cv2
 import numpy as np
 from PyQt6.QtCore import *
 
+from mainDir.engine.frameCache import VersionedFrame
+from mainDir.engine.framePool import framePool
+from mainDir.engine.pointOpCompiler import PointOpCompiler, gammaTable
+from mainDir.engine.stageTimer import timedStage
 
-class BaseClass(QObject):
+
+class BaseClass(VersionedFrame, QObject):
     """
     Classe base per la generazione di immagini. È una classe QObject, quindi può essere usata con i segnali e gli slot,
     ma non ha un'interfaccia grafica. Viene usata come template per costruire tutti gli input che generano immagini.
     Ogni input può trasformare la propria immagine in base a delle impostazioni, come la correzione gamma, il negativo,
     la scala di grigi, l'unsharp mask e il selfScreen.
+
+    Gli input che elaborano il frame usano processedFrame (VersionedFrame), che rifà il frameProcessor solo quando
+    cambia il frame, un'impostazione o la maschera dello screen.
     """
     _frame = None
     _gamma_correction = 1.0
@@ -22,16 +30,21 @@ class BaseClass(QObject):
     screenMask = None
     flipType = 0
     _blurAmount = 40
+    _processingAttributes = frozenset((
+        "_gamma_correction", "isGrayScale", "isNegative", "isSelfScreen", "isMaskedScreen", "isFlipped",
+        "isBlurred", "screenMask", "flipType", "_blurAmount"))
 
     def __init__(self, synchObject, resolution=QSize(1920, 1080)):
         """
         Inizializza la classe base con un oggetto di sincronizzazione e una risoluzione.
-        Connette il segnale di sincronizzazione alla funzione capture_frame.
+        Registra l'input nel grafo di valutazione del synchObject: captureFrame viene chiamato
+        ad ogni tick solo se l'input è usato da un consumer (mixBus, monitor, ecc.).
         """
         super().__init__()
         self.synch_Object = synchObject
         self.resolution = resolution
-        self.synch_Object.synch_SIGNAL.connect(self.captureFrame)
+        self._pointOps = PointOpCompiler()
+        self.synch_Object.registerSource(self)
         self.start_time = time.time()
         self.frame_count = 0
         self.total_time = 0
@@ -69,11 +82,11 @@ class BaseClass(QObject):
 
     def captureFrame(self):
         """
-        Cattura un frame, aggiornando l'FPS e creando un'immagine nera della risoluzione specificata.
+        Cattura un frame, aggiornando l'FPS e usando l'immagine nera della risoluzione specificata.
+        Il frame nero è condiviso dal framePool e in sola lettura, quindi non viene allocato ad ogni tick.
         """
         self.updateFps()
-        image = np.zeros((self.resolution.height(), self.resolution.width(), 3), dtype=np.uint8)
-        self._frame = np.ascontiguousarray(image)
+        self._frame = framePool.black((self.resolution.height(), self.resolution.width(), 3))
 
     def updateFps(self):
         """
@@ -109,9 +122,7 @@ class BaseClass(QObject):
         :param gamma: Valore di gamma.
         :return: Tabella di Look-Up per la correzione di gamma.
         """
-        invGamma = 1.0 / gamma
-        table = np.array([(i / 255.0) ** invGamma * 255 for i in range(256)]).astype("uint8")
-        return table
+        return gammaTable(gamma)
 
     @staticmethod
     def negative(frame):
@@ -195,27 +206,45 @@ class BaseClass(QObject):
         """
         self._blurAmount = amount
 
+    @timedStage("frameProcessor")
     def frameProcessor(self, frame):
         """
         Applica le varie trasformazioni al frame in base alle impostazioni correnti.
+        Screen, gamma e negativo sono operazioni puntuali: vengono composte in una sola tabella dal
+        PointOpCompiler e applicate con un solo cv2.LUT. Lo screen con maschera invece dipende da un altro
+        frame, quindi resta un passaggio a parte.
         :param frame: Frame da elaborare.
         :return: Frame elaborato.
         """
         if self.isFlipped:
             frame = self.flipFrame()
+        pointOps = []
         if self.isSelfScreen:
-            frame = self.oldSchoolScreen(frame)
+            if self.isMaskedScreen and self.screenMask is not None:
+                frame = self.oldSchoolScreen(frame)
+            else:
+                pointOps.append(("screen", None))
         if self._gamma_correction != 1.0:
-            lut = self.gammaCorrection(self._gamma_correction)
-            frame = cv2.LUT(frame, lut)
+            pointOps.append(("gamma", self._gamma_correction))
         if self.isNegative:
-            frame = self.negative(frame)
+            pointOps.append(("negative", None))
+        frame = self._pointOps.apply(frame, tuple(pointOps))
         if self.isGrayScale:
             frame = self.grayScale(frame)
         if self.isBlurred:
             frame = self.boxBlur(frame)
         return frame
 
+    def getDependencies(self):
+        """
+        Ritorna gli input da cui dipende questo input, che l'EvaluationGraph deve catturare prima di lui.
+        Al momento l'unica dipendenza è la maschera dello screen.
+        :return: lista di input
+        """
+        if self.isSelfScreen and self.isMaskedScreen and self.screenMask is not None:
+            return [self.screenMask]
+        return []
+
     def getFrame(self):
         """
         Ritorna il frame corrente.
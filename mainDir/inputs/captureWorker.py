@@ -0,0 +1,141 @@
+import threading
+import time
+
+from PyQt6.QtCore import *
+
+"""
+Cattura threaded per gli input che leggono da un dispositivo (VideoCapture013, ScreenCapture).
+Di default camera.read() e get_latest_frame() vengono chiamati nel thread della GUI dentro lo slot di sincronia,
+quindi un dispositivo lento blocca tutto il mixer. In modalità threaded ogni dispositivo ha un CaptureWorker,
+un QThread che legge in continuazione e pubblica i frame in un TripleBuffer; nel tick di sincronia l'input si limita
+a prendere il frame completo più recente, senza copie.
+
+OpenCV rilascia il GIL durante la lettura e la decodifica, quindi più dispositivi in modalità threaded
+lavorano davvero in parallelo su core diversi.
+"""
+
+
+class TripleBuffer:
+    """
+    Slot "ultimo frame" tra un thread che scrive e uno che legge.
+    I buffer ruotano tra quattro ruoli:
+    - back: di proprietà del writer, ci scrive il frame successivo
+    - middle: l'ultimo frame completo pubblicato
+    - front: il frame consegnato al reader nel tick corrente
+    - retired: il frame consegnato nel tick precedente, che qualche consumer (ad esempio un monitor) potrebbe
+      ancora avere in mano; il writer non lo riceve finché non è passato un altro tick.
+    Il lock protegge solo lo scambio dei riferimenti (pochi nanosecondi): la lettura dal dispositivo e le copie
+    avvengono sempre fuori dal lock, quindi reader e writer non si aspettano mai a vicenda.
+
+    overwrittenFrames conta i frame pubblicati e sovrascritti prima di essere letti (il dispositivo è più veloce del
+    mixer), duplicatedFrames i tick in cui il reader non ha trovato un frame nuovo (il dispositivo è più lento).
+
+    Ogni frame pubblicato porta con sé l'istante della pubblicazione (perf_counter_ns): dopo latest, frontTimestampNs
+    è il tempo di cattura del frame consegnato, usato dal latencyTracker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._back = None
+        self._middle = None
+        self._front = None
+        self._retired = None
+        self._middleIsFresh = False
+        self._middleTimestampNs = 0
+        self.frontTimestampNs = 0
+        self.publishedFrames = 0
+        self.overwrittenFrames = 0
+        self.duplicatedFrames = 0
+
+    def writeBuffer(self):
+        """
+        Restituisce il buffer in cui il writer deve scrivere il prossimo frame (None finché non ne esiste uno).
+        Da chiamare solo dal thread del writer.
+        """
+        return self._back
+
+    def publish(self, frame, timestampNs=None):
+        """
+        Pubblica un frame completo. Se il frame non è il buffer restituito da writeBuffer (ad esempio perché il
+        dispositivo ha allocato un nuovo array alla prima lettura) viene adottato così com'è.
+        :param frame: il frame appena scritto
+        :param timestampNs: istante di cattura del frame, di default adesso
+        """
+        if timestampNs is None:
+            timestampNs = time.perf_counter_ns()
+        with self._lock:
+            if self._middleIsFresh:
+                self.overwrittenFrames += 1
+            self._back = self._middle
+            self._middle = frame
+            self._middleTimestampNs = timestampNs
+            self._middleIsFresh = True
+            self.publishedFrames += 1
+
+    def latest(self):
+        """
+        Restituisce il frame completo più recente e un flag che indica se è nuovo rispetto al tick precedente.
+        Da chiamare solo dal thread del reader.
+        :return: (frame, isNew)
+        """
+        with self._lock:
+            if not self._middleIsFresh:
+                self.duplicatedFrames += 1
+                return self._front, False
+            freeBuffer = self._retired
+            self._retired = self._front
+            self._front = self._middle
+            self._middle = freeBuffer
+            self.frontTimestampNs = self._middleTimestampNs
+            self._middleIsFresh = False
+            return self._front, True
+
+    def getStatistics(self):
+        return {
+            "published": self.publishedFrames,
+            "overwritten": self.overwrittenFrames,
+            "duplicated": self.duplicatedFrames,
+        }
+
+
+class CaptureWorker(QThread):
+    """
+    Thread di cattura. grabFunction riceve il buffer in cui scrivere (o None) e restituisce il frame letto,
+    oppure None se il dispositivo non ha un frame pronto. I frame letti vengono pubblicati nel TripleBuffer.
+    """
+
+    def __init__(self, grabFunction, parent=None):
+        super().__init__(parent)
+        self.grabFunction = grabFunction
+        self.slot = TripleBuffer()
+        self._isRunning = False
+
+    def run(self):
+        self._isRunning = True
+        while self._isRunning:
+            try:
+                frame = self.grabFunction(self.slot.writeBuffer())
+            except Exception as e:
+                print(f"Error in capture worker: {e}")
+                frame = None
+            if frame is None:
+                # nessun dispositivo o nessun frame pronto: si evita di girare a vuoto
+                self.msleep(2)
+                continue
+            self.slot.publish(frame)
+
+    def stop(self):
+        self._isRunning = False
+        self.wait(1000)
+
+    def latest(self):
+        return self.slot.latest()
+
+    def latestTimestampNs(self):
+        """
+        Istante di cattura dell'ultimo frame restituito da latest.
+        """
+        return self.slot.frontTimestampNs
+
+    def getStatistics(self):
+        return self.slot.getStatistics()
@@ -20,6 +20,7 @@ class ColorGenerator(BaseClass):
     def setColor(self, color: QColor):
         self._color = color
         self._frame[:, :] = [color.blue(), color.green(), color.red()]
+        self.invalidateFrame()
 
     def stop(self):
         super().stop()
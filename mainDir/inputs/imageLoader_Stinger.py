@@ -1,10 +1,11 @@
 import os
 import cv2
-import numpy as np
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
+from mainDir.engine.framePool import framePool, FrameBuffers
 from mainDir.inputs.baseClass import BaseClass
+from mainDir.inputs.stingerCache import StingerCache
 
 """
 La classe stingerLoader permette di caricare una sequenza di immagini PNG con canale alpha. Tramite getFrame si ottiene
@@ -15,42 +16,60 @@ Il metodo setSwitchingFrameNumber permette di impostare il frame in cui emettere
 durante il mix live di solito si vuole passare da program a preview quando l'immagine di sting è a schermo pieno. Di
 Default viene settata a metà della sequenza di immagini, ma è possibile variarla a piacimento.
 Il metodo setLoop permette di impostare se la sequenza di immagini deve essere in loop o meno.
+
+Le immagini vengono preparate per il compositing (StingerFrame): per ogni frame il fill premoltiplicato
+(bgr * alpha / 255) e il key inverso a 3 canali (255 - alpha). Il compositing di ogni tick diventa quindi
+program * keyInverso / 255 + fill, una moltiplicazione e una somma senza split, merge e conversioni. Ogni frame si porta
+dietro anche il rettangolo in cui l'alpha non è zero (fuori dal rettangolo si vede il program così com'è) e se è
+completamente opaco (il program non serve proprio). getFrame restituisce il fill premoltiplicato, cioè lo stinger sopra
+il nero.
+
+I frame preparati stanno nella StingerCache, un file mappato in memoria: il costruttore elenca solo i PNG, la
+decodifica parte in un pool di thread al primo uso (preload, startAnimation o il primo frame richiesto) e dalla
+seconda volta la sequenza viene ricaricata dal file senza decodificare nulla. In RAM resta solo la finestra dei frame
+vicini a quello corrente.
 """
 
 
 class StingerLoader(BaseClass):
     switching_SIGNAL = pyqtSignal()  # Segnale per indicare il frame di switching
 
-    def __init__(self, synchObject, stinger_folder, resolution=QSize(1920, 1080)):
+    def __init__(self, synchObject, stinger_folder, resolution=QSize(1920, 1080), cacheFolder=None, prefetch=8):
         super().__init__(synchObject, resolution)
         self.isStarted = False
+        self._keyBuffers = FrameBuffers()
         self.stinger_folder = stinger_folder
-        self.stingerLength = 0
         self._isLooped = False
         self._switching_signal_sent = False  # Variabile per tenere traccia del segnale di switching
-        self.images = self.load_images()
+        if not os.path.isdir(self.stinger_folder):
+            print(f"Stinger folder not found: {self.stinger_folder}")
+        self.cache = StingerCache(stinger_folder, resolution.width(), resolution.height(), cacheFolder,
+                                  prefetch=prefetch)
+        self.stingerLength = self.cache.length
         self._current_image_index = 0
         self.switchingFrameNumber = self.stingerLength // 2 # Default a metà della sequenza
-        self._frame = self.images[self._current_image_index] if self.images else np.zeros(
-            (resolution.height(), resolution.width(), 4), dtype=np.uint8)  # Include il canale alpha
-        self.synch_Object.synch_SIGNAL.connect(self.captureFrame)
-
-    def load_images(self):
-        images = []
-        for filename in sorted(os.listdir(self.stinger_folder)):
-            if filename.endswith('.png'):
-                image_path = os.path.join(self.stinger_folder, filename)
-                image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)  # Legge anche il canale alpha
-                if image is not None:
-                    image = cv2.resize(image, (self.resolution.width(), self.resolution.height()))
-                    images.append(image)
-        self.stingerLength = len(images)
-        return images
+        self._frame = self._currentFill()
+
+    def preload(self):
+        """
+        Fa partire la decodifica della sequenza (o la apertura della cache) senza aspettarla.
+        Conviene chiamarla appena si sceglie lo stinger, prima di lanciarlo.
+        """
+        self.cache.open()
+
+    def _currentFill(self):
+        if self.cache.isOpen:
+            stingerFrame = self.cache.frame(self._current_image_index)
+            if stingerFrame is not None:
+                return stingerFrame.fill
+        return framePool.black((self.resolution.height(), self.resolution.width(), 3))
 
     def stop(self):
+        self.cache.close()
         super().stop()
 
     def startAnimation(self):
+        self.cache.open()
         self.isStarted = True
 
     def captureFrame(self):
@@ -70,11 +89,7 @@ class StingerLoader(BaseClass):
                       f"{self.stingerLength} and switching frame is {self.switchingFrameNumber}")
                 self.switching_SIGNAL.emit()
                 self._switching_signal_sent = True  # Imposta come inviato
-            if self.images:
-                self._frame = self.images[self._current_image_index]
-        else:
-            self._frame = self.images[self._current_image_index] if self.images else np.zeros(
-                (self.resolution.height(), self.resolution.width(), 4), dtype=np.uint8)
+        self._frame = self._currentFill()
         self.updateFps()
 
     def setIndex(self, index):
@@ -89,18 +104,28 @@ class StingerLoader(BaseClass):
     def getFrame(self):
         return self._frame
 
+    def getStingerFrame(self):
+        """
+        :return: lo StingerFrame corrente, None se la sequenza è vuota
+        """
+        return self.cache.frame(self._current_image_index)
+
     def getFillAndKey(self):
         """
-        Ritorna il frame di fill e di key.
-        Il key è una matrice singola e può quindi essere usata nelle operazioni di blending.
+        Ritorna il frame di fill (premoltiplicato) e di key.
+        Il key è una matrice singola e può quindi essere usata nelle operazioni di blending; viene ricavato dal key
+        inverso in un buffer riusato a ogni tick. Se non c'è un frame si restituiscono i frame neri condivisi del
+        framePool.
         :return:
         """
-        black = np.zeros((self.resolution.height(), self.resolution.width(), 3), dtype=np.uint8)
-        alpha = np.zeros((self.resolution.height(), self.resolution.width()), dtype=np.uint8)
-        if self._frame is None:
-            return black, alpha
-        b, g, r, a = cv2.split(self._frame)
-        return cv2.merge((b, g, r)), a
+        height, width = self.resolution.height(), self.resolution.width()
+        stingerFrame = self.getStingerFrame()
+        if stingerFrame is None:
+            return framePool.black((height, width, 3)), framePool.black((height, width))
+        alpha = self._keyBuffers.next(stingerFrame.inverseKey.shape[:2])
+        cv2.extractChannel(stingerFrame.inverseKey, 0, dst=alpha)
+        cv2.bitwise_not(alpha, dst=alpha)
+        return stingerFrame.fill, alpha
 
     def setLoop(self, isLooped):
         self._isLooped = isLooped
@@ -0,0 +1,171 @@
+import importlib
+import multiprocessing
+import time
+
+import cv2
+from PyQt6.QtCore import *
+
+from mainDir.engine.framePool import framePool
+from mainDir.engine.sharedFrameRing import SharedFrameRing
+from mainDir.inputs.baseClass import BaseClass
+
+"""
+Input che gira in un processo separato. Tutto il mixer lavora su un solo thread Python sotto il GIL, quindi un input
+pesante (cattura, video, rumore, Perlin...) consuma tempo sullo stesso core del mix e dei monitor mentre gli altri core
+restano liberi.
+
+ProcessInput è il proxy dell'input nel processo del mixer: crea uno SharedFrameRing e lancia un worker
+(multiprocessing.Process) che costruisce il vero input, lo fa girare con il suo clock allo stesso frame rate del mixer
+e scrive ogni frame nel ring. Nel tick di sincronia captureFrame prende l'ultimo frame dal ring senza copie, quindi
+getFrame restituisce direttamente la memoria condivisa al MixBus014 e ai monitor.
+
+Il worker è isolato: se muore (un'eccezione, un driver che va in crash) il mixer continua con l'ultimo frame ricevuto
+e il ProcessInput lo riavvia con un'attesa crescente, fino a maxRestarts volte.
+
+L'input viene indicato con il percorso della classe, in modo che funzioni anche con lo start method "spawn" di Windows:
+    noise = ProcessInput(synchObject, "mainDir.inputs.generator_Noise_Random.RandomNoiseImageGenerator")
+    camera = ProcessInput(synchObject, "mainDir.inputs.videoCapture013.VideoCapture013",
+                          inputKwargs={"cameraIndex": 0, "forceDShow": True})
+"""
+
+
+def _loadClass(classPath):
+    moduleName, className = classPath.rsplit(".", 1)
+    return getattr(importlib.import_module(moduleName), className)
+
+
+def _workerMain(classPath, inputKwargs, width, height, fps, ringName, stopEvent):
+    """
+    Corpo del processo worker: costruisce l'input con un SynchObject senza timer e lo fa avanzare
+    sulle scadenze del suo MasterClock, scrivendo ogni frame nel ring.
+    """
+    from mainDir.inputs.synchObject import SynchObject
+
+    # un core per worker: è il processo a dare il parallelismo
+    cv2.setNumThreads(1)
+    app = QCoreApplication.instance() or QCoreApplication([])
+    ring = SharedFrameRing((height, width, 3), name=ringName, create=False)
+    ring.setWriterPid(multiprocessing.current_process().pid)
+    synchObject = SynchObject(fps, autoStart=False)
+    source = _loadClass(classPath)(synchObject, resolution=QSize(width, height), **inputKwargs)
+    clock = synchObject.clock
+    clock.start()
+    try:
+        while not stopEvent.is_set():
+            waitNs = clock.timeToNextTickNs()
+            if waitNs > 0:
+                time.sleep(waitNs / 1e9)
+            synchObject.advance()
+            app.processEvents()
+            frame = source.getFrame()
+            if frame is None:
+                continue
+            if frame.shape != ring.shape:
+                frame = cv2.resize(frame[:, :, :3], (width, height))
+            ring.write(frame)
+    finally:
+        source.stop()
+        ring.close()
+
+
+class ProcessInput(BaseClass):
+    """
+    Proxy nel processo del mixer di un input che gira in un worker.
+    """
+
+    def __init__(self, synchObject, classPath, resolution=QSize(1920, 1080), inputKwargs=None, slots=4,
+                 maxRestarts=5, autoStart=True):
+        super().__init__(synchObject, resolution)
+        self.classPath = classPath
+        self.inputKwargs = inputKwargs or {}
+        self.maxRestarts = maxRestarts
+        self.restarts = 0
+        self.crashes = 0
+        self.sourceSequence = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._stopEvent = self._context.Event()
+        self._process = None
+        self._restartAt = None
+        self.ring = SharedFrameRing((resolution.height(), resolution.width(), 3), slots=slots)
+        self._frame = framePool.black((resolution.height(), resolution.width(), 3))
+        if autoStart:
+            self.startWorker()
+
+    def startWorker(self):
+        """
+        Lancia il worker. Il ring resta lo stesso, quindi un worker riavviato riprende a scrivere
+        dove si era fermato il precedente.
+        """
+        self._stopEvent.clear()
+        self._process = self._context.Process(
+            target=_workerMain,
+            args=(self.classPath, self.inputKwargs, self.resolution.width(), self.resolution.height(),
+                  self.synch_Object.clock.rate, self.ring.name, self._stopEvent),
+            daemon=True)
+        self._process.start()
+        self._restartAt = None
+
+    def isWorkerAlive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def _checkWorker(self):
+        """
+        Se il worker è morto programma il riavvio con un'attesa che raddoppia ad ogni crash (0.5 s, 1 s, 2 s...).
+        """
+        if self._process is None or self._stopEvent.is_set() or self._process.is_alive():
+            return
+        now = time.monotonic()
+        if self._restartAt is None:
+            self.crashes += 1
+            print(f"Worker of {self.classPath} exited with code {self._process.exitcode}")
+            if self.restarts >= self.maxRestarts:
+                self._process = None
+                return
+            self._restartAt = now + min(0.5 * 2 ** self.restarts, 10.0)
+        elif now >= self._restartAt:
+            self.restarts += 1
+            self.startWorker()
+
+    def captureFrame(self):
+        """
+        Prende l'ultimo frame scritto dal worker, senza copie. Se il worker non ha scritto nulla di nuovo
+        si tiene il frame precedente.
+        """
+        if self.ring is None:
+            return
+        frame, sequence, isNew = self.ring.latest()
+        if isNew:
+            self.sourceSequence = sequence
+            self._frame = frame
+        else:
+            self._checkWorker()
+        self.updateFps()
+
+    def getFrame(self):
+        return self._frame
+
+    def getProcessStatistics(self):
+        statistics = self.ring.getStatistics()
+        statistics.update({
+            "alive": self.isWorkerAlive(),
+            "crashes": self.crashes,
+            "restarts": self.restarts,
+            "heartbeatAgeMs": None if self.ring.heartbeatAgeNs() is None else self.ring.heartbeatAgeNs() / 1e6,
+        })
+        return statistics
+
+    def stop(self):
+        """
+        Ferma il worker e distrugge il ring.
+        """
+        self._stopEvent.set()
+        if self._process is not None:
+            self._process.join(2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self.ring is not None:
+            self._frame = framePool.black((self.resolution.height(), self.resolution.width(), 3))
+            self.ring.close()
+            self.ring = None
+        super().stop()
@@ -4,6 +4,7 @@ import dxcam
 import numpy as np
 from PyQt6.QtCore import *
 from mainDir.inputs.baseClass import BaseClass
+from mainDir.inputs.captureWorker import CaptureWorker
 
 
 # Questa classe gestisce la cattura dello schermo
@@ -15,10 +16,13 @@ dxcam. La classe cattura i frame dello schermo a un FPS target e li ridimensiona
 Nell'inizializzazione della classe, si inizializza la camera per catturare lo schermo. Se la cattura dello schermo
 fallisce, si prova a catturare lo schermo di default. La funzione checkSize controlla se il frame deve essere ridimensionato.
 La funzione capture_frame cattura un frame dallo schermo e la funzione getFrame restituisce il frame processato.
+Con threaded=True get_latest_frame viene chiamata da un CaptureWorker e capture_frame prende solo l'ultimo frame
+completo, senza bloccare il thread della GUI in attesa dello schermo.
 """
 class ScreenCapture(BaseClass):
 
-    def __init__(self, synchObject, screen_index, resolution=QSize(1920, 1080), region=None, targetFps=60):
+    def __init__(self, synchObject, screen_index, resolution=QSize(1920, 1080), region=None, targetFps=60,
+                 threaded=False):
         super(ScreenCapture, self).__init__(synchObject, resolution)
         self.targetFps = targetFps  # FPS target per la cattura dello schermo
         self.screenIndex = screen_index  # Indice dello schermo da catturare
@@ -27,7 +31,11 @@ class ScreenCapture(BaseClass):
         self._frame = np.zeros((resolution.height(), resolution.width(), 3), dtype=np.uint8)  # Frame iniziale vuoto
         self.camera = None  # Oggetto camera
         self.needs_resize = False  # Flag per indicare se è necessario ridimensionare il frame
+        self.captureWorker = None
         self.initCamera(screen_index)  # Inizializza la camera
+        if threaded:
+            self.captureWorker = CaptureWorker(self.grabInto)
+            self.captureWorker.start()
 
     def initCamera(self, screen_index):
         # Inizializza la camera per catturare lo schermo
@@ -38,14 +46,12 @@ class ScreenCapture(BaseClass):
                 raise IndexError(f"Screen index {screen_index} out of range. Available screens: {len(screens)}")
             self.camera = dxcam.create(output_idx=screen_index, output_color="BGR", max_buffer_len=512)
             self.camera.start(target_fps=self.targetFps, video_mode=True)
-            self.synch_Object.synch_SIGNAL.connect(self.captureFrame)
             QTimer.singleShot(1000, self.checkSize)  # Controlla la dimensione del frame dopo 1 secondo
         except Exception as e:
             print(f"Failed to open screen source {screen_index}: {e}")
             try:
                 self.camera = dxcam.create(output_idx=0, output_color="BGR", max_buffer_len=512)
                 self.camera.start(target_fps=self.targetFps, video_mode=True)
-                self.synch_Object.synch_SIGNAL.connect(self.captureFrame)
                 QTimer.singleShot(1000, self.checkSize)
             except Exception as e:
                 print(f"Failed to fallback to screen source 0: {e}")
@@ -69,6 +75,9 @@ class ScreenCapture(BaseClass):
 
     def stop(self):
         # Ferma la cattura dello schermo e rilascia le risorse
+        if getattr(self, "captureWorker", None) is not None:
+            self.captureWorker.stop()
+            self.captureWorker = None
         if self.camera:
             try:
                 self.camera.stop()
@@ -80,7 +89,12 @@ class ScreenCapture(BaseClass):
     def captureFrame(self):
         # Cattura un frame dallo schermo
         self.updateFps()
-        if self.camera:
+        if self.captureWorker is not None:
+            frame, isNew = self.captureWorker.latest()
+            if isNew:
+                self.captureTimestampNs = self.captureWorker.latestTimestampNs()
+                self._frame = frame
+        elif self.camera:
             frame = self.camera.get_latest_frame()
             if frame is not None:
                 if self.needs_resize:
@@ -89,9 +103,32 @@ class ScreenCapture(BaseClass):
         else:
             print("Camera not initialized")
 
+    def grabInto(self, buffer):
+        # Chiamata dal CaptureWorker: aspetta il prossimo frame dello schermo e lo copia nel buffer del TripleBuffer.
+        # La copia è necessaria perché il frame restituito da dxcam vive nel suo buffer circolare.
+        camera = self.camera
+        if camera is None:
+            return None
+        frame = camera.get_latest_frame()
+        if frame is None:
+            return None
+        width, height = self.target_resolution
+        if buffer is None or buffer.shape != (height, width, 3):
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+        if frame.shape[:2] != (height, width):
+            return cv2.resize(frame, self.target_resolution, dst=buffer)
+        np.copyto(buffer, frame)
+        return buffer
+
+    def getCaptureStatistics(self):
+        # Statistiche della cattura threaded: frame pubblicati, sovrascritti e duplicati
+        if self.captureWorker is None:
+            return {}
+        return self.captureWorker.getStatistics()
+
     def getFrame(self):
-        # Restituisce il frame processato
-        return self.frameProcessor(self._frame)
+        # Restituisce il frame processato, rielaborato solo se è arrivato un nuovo frame o è cambiata un'impostazione
+        return self.processedFrame()
 
 
 
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+"""
+Cache su disco delle sequenze di stinger. Decodificare e ridimensionare i PNG di uno stinger richiede secondi e
+tenerli tutti in memoria costa circa 12 MB per frame a 1080p (fill premoltiplicato e key inverso), quindi
+uno stinger di 2 secondi a 60 fps occupa quasi 1.5 GB; in uno show ce ne sono diversi caricati.
+
+La StingerCache tiene i frame già preparati in un file raw mappato in memoria (mmap), uno per sequenza e risoluzione:
+- la chiave del file è un hash di nome, dimensione e data di modifica di ogni PNG della cartella più la risoluzione,
+  quindi se la sequenza cambia viene ricostruita e se non cambia la ricarica è immediata;
+- la prima volta (open) i PNG vengono decodificati da un pool di thread (cv2.imread e cv2.resize rilasciano il GIL)
+  direttamente in un file temporaneo mappato, unico per ogni StingerCache. Solo a decodifica finita il file viene
+  spostato al suo nome definitivo con os.replace e il file dei metadati (rettangolo e opacità di ogni frame) viene
+  scritto per ultimo: se manca la cache è incompleta e viene rifatta. Il file di un'altra StingerCache sulla stessa
+  cartella (ad esempio lo stinger di un altro M/E) non viene mai troncato sotto la sua mappatura: os.replace cambia
+  solo il nome, e chi ha già mappato il file vecchio continua a leggerlo;
+- durante l'animazione solo una finestra di frame è in RAM: quelli che stanno per arrivare vengono letti in anticipo
+  da un thread del pool (prefetch), quelli già passati vengono rilasciati con madvise dove il sistema lo permette.
+  Le pagine rilasciate restano nel file, quindi un frame già restituito rimane comunque valido.
+"""
+
+CACHE_VERSION = 1
+
+
+def defaultCacheFolder():
+    return os.path.join(tempfile.gettempdir(), "openPyVision", "stingerCache")
+
+
+class StingerFrame:
+    __slots__ = ("fill", "inverseKey", "box", "isOpaque")
+
+    def __init__(self, fill, inverseKey, box, isOpaque):
+        """
+        :param fill: fill premoltiplicato BGR
+        :param inverseKey: 255 - alpha su 3 canali
+        :param box: (top, bottom, left, right) del rettangolo con alpha non zero, None se il frame è trasparente
+        :param isOpaque: True se l'alpha è 255 su tutto il frame
+        """
+        self.fill = fill
+        self.inverseKey = inverseKey
+        self.box = box
+        self.isOpaque = isOpaque
+
+
+def prepareStingerFrame(image, fill, inverseKey):
+    """
+    Prepara un'immagine BGRA per il compositing scrivendo fill premoltiplicato e key inverso nei buffer indicati.
+    :param image: immagine BGRA (o BGR, considerata opaca) già alla risoluzione dello stinger
+    :param fill: buffer BGR per il fill premoltiplicato
+    :param inverseKey: buffer a 3 canali per il key inverso
+    :return: StingerFrame
+    """
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] < 4:
+        np.copyto(fill, image[:, :, :3])
+        inverseKey[...] = 0
+        return StingerFrame(fill, inverseKey, (0, image.shape[0], 0, image.shape[1]), True)
+    alpha = np.ascontiguousarray(image[:, :, 3])
+    cv2.cvtColor(alpha, cv2.COLOR_GRAY2BGR, dst=inverseKey)
+    cv2.multiply(cv2.cvtColor(image, cv2.COLOR_BGRA2BGR), inverseKey, dst=fill, scale=1 / 255)
+    cv2.bitwise_not(inverseKey, dst=inverseKey)
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if len(rows) == 0:
+        return StingerFrame(fill, inverseKey, None, False)
+    columns = np.flatnonzero(alpha.any(axis=0))
+    box = (int(rows[0]), int(rows[-1]) + 1, int(columns[0]), int(columns[-1]) + 1)
+    return StingerFrame(fill, inverseKey, box, bool(alpha.min() == 255))
+
+
+class StingerCache:
+
+    def __init__(self, folder, width, height, cacheFolder=None, workers=4, prefetch=8):
+        """
+        Elenca i PNG della cartella e calcola la chiave della cache, senza decodificare nulla.
+        :param folder: cartella della sequenza PNG
+        :param width: larghezza dei frame preparati
+        :param height: altezza dei frame preparati
+        :param cacheFolder: cartella dei file di cache, di default nella cartella temporanea del sistema
+        :param workers: thread del pool di decodifica e prefetch
+        :param prefetch: frame successivi a quello corrente da tenere in RAM
+        """
+        self.folder = folder
+        self.width = width
+        self.height = height
+        self.cacheFolder = cacheFolder or defaultCacheFolder()
+        self.workers = workers
+        self.prefetch = prefetch
+        self.filenames = []
+        if os.path.isdir(folder):
+            self.filenames = [filename for filename in sorted(os.listdir(folder)) if filename.endswith('.png')]
+        self.length = len(self.filenames)
+        self.frameBytes = 2 * height * width * 3
+        self.key = self._contentKey()
+        self.dataPath = os.path.join(self.cacheFolder, f"{self.key}.raw")
+        self.metaPath = os.path.join(self.cacheFolder, f"{self.key}.json")
+        self.isOpen = False
+        self.isComplete = False
+        self.fromCache = False
+        self._lock = threading.Lock()
+        self._executor = None
+        self._file = None
+        self._buildPath = None
+        self._mmap = None
+        self._planes = None
+        self._frames = [None] * self.length
+        self._decoding = [None] * self.length
+        self._pending = 0
+        self._resident = set()
+
+    def _contentKey(self):
+        digest = hashlib.sha1(f"{CACHE_VERSION}:{self.width}x{self.height}".encode())
+        for filename in self.filenames:
+            stat = os.stat(os.path.join(self.folder, filename))
+            digest.update(f"|{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:24]
+
+    def open(self):
+        """
+        Apre la cache: se il file è completo lo mappa in sola lettura, altrimenti lo crea e fa partire la decodifica
+        di tutti i frame nel pool di thread. Non aspetta la decodifica.
+        """
+        if self.isOpen or self.length == 0:
+            return
+        self.isOpen = True
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stingerCache")
+        size = self.frameBytes * self.length
+        metadata = self._readMetadata(size)
+        if metadata is not None:
+            self._map(open(self.dataPath, "rb"), size, mmap.ACCESS_READ)
+            for index, (box, isOpaque) in enumerate(metadata):
+                self._frames[index] = self._frame(index, box, isOpaque)
+            self.isComplete = self.fromCache = True
+            return
+        os.makedirs(self.cacheFolder, exist_ok=True)
+        descriptor, self._buildPath = tempfile.mkstemp(suffix=".tmp", prefix=f"{self.key}.", dir=self.cacheFolder)
+        file = os.fdopen(descriptor, "w+b")
+        file.truncate(size)
+        self._map(file, size, mmap.ACCESS_WRITE)
+        self._pending = self.length
+        for index in range(self.length):
+            self._decoding[index] = self._executor.submit(self._decode, index)
+
+    def _readMetadata(self, size):
+        try:
+            with open(self.metaPath) as file:
+                metadata = json.load(file)
+            if metadata["length"] != self.length or os.path.getsize(self.dataPath) != size:
+                return None
+            return [(tuple(box) if box else None, isOpaque) for box, isOpaque in metadata["frames"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _map(self, file, size, access):
+        self._file = file
+        self._mmap = mmap.mmap(file.fileno(), size, access=access)
+        self._planes = np.frombuffer(self._mmap, dtype=np.uint8).reshape(
+            (self.length, 2, self.height, self.width, 3))
+
+    def _frame(self, index, box, isOpaque):
+        fill, inverseKey = self._planes[index]
+        fill.flags.writeable = False
+        inverseKey.flags.writeable = False
+        return StingerFrame(fill, inverseKey, box, isOpaque)
+
+    def _decode(self, index):
+        """
+        Decodifica, ridimensiona e prepara un PNG direttamente nel file mappato. Gira nel pool di thread.
+        """
+        fill, inverseKey = self._planes[index]
+        image = cv2.imread(os.path.join(self.folder, self.filenames[index]), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            # un file illeggibile diventa un frame trasparente, così la sequenza non cambia durata
+            fill[...] = 0
+            inverseKey[...] = 255
+            box, isOpaque = None, False
+        else:
+            prepared = prepareStingerFrame(cv2.resize(image, (self.width, self.height)), fill, inverseKey)
+            box, isOpaque = prepared.box, prepared.isOpaque
+        self._frames[index] = self._frame(index, box, isOpaque)
+        with self._lock:
+            self._resident.add(index)
+            self._pending -= 1
+            isLast = self._pending == 0
+        if isLast:
+            self._writeMetadata()
+
+    def _writeMetadata(self):
+        self._mmap.flush()
+        try:
+            os.replace(self._buildPath, self.dataPath)
+        except OSError:
+            # su Windows un file mappato da un'altra StingerCache non si può sostituire: questa istanza resta sul
+            # temporaneo (rimosso da close) e la cache su disco resta quella dell'altra
+            self.isComplete = True
+            return
+        self._buildPath = None
+        metadata = {
+            "version": CACHE_VERSION,
+            "folder": self.folder,
+            "length": self.length,
+            "resolution": [self.width, self.height],
+            "frames": [[list(frame.box) if frame.box else None, frame.isOpaque] for frame in self._frames],
+        }
+        temporaryPath = f"{self.metaPath}.{os.getpid()}.tmp"
+        with open(temporaryPath, "w") as file:
+            json.dump(metadata, file)
+        os.replace(temporaryPath, self.metaPath)
+        self.isComplete = True
+
+    def frame(self, index):
+        """
+        Restituisce il frame preparato, aspettando la sua decodifica se non è ancora pronto, e sposta la finestra
+        di prefetch.
+        :param index: indice del frame
+        :return: StingerFrame, None se la sequenza è vuota
+        """
+        if self.length == 0:
+            return None
+        self.open()
+        frame = self._frames[index]
+        if frame is None:
+            self._decoding[index].result()
+            frame = self._frames[index]
+        self._moveWindow(index)
+        return frame
+
+    def _moveWindow(self, index):
+        """
+        Legge in anticipo i prossimi prefetch frame e rilascia dalla RAM gli altri, tenendo anche il frame
+        precedente che può essere ancora sullo schermo.
+        """
+        if not self.isComplete or self.prefetch <= 0:
+            return
+        window = {(index + offset) % self.length for offset in range(-1, self.prefetch + 1)}
+        with self._lock:
+            toLoad = window - self._resident
+            toRelease = self._resident - window
+            self._resident = (self._resident | toLoad) - toRelease
+        for resident in sorted(toLoad):
+            self._executor.submit(self._touch, resident)
+        for resident in toRelease:
+            self._release(resident)
+
+    def _touch(self, index):
+        # una lettura per pagina basta a far caricare dal sistema tutto il frame
+        planes = self._planes
+        if planes is not None:
+            int(planes[index].reshape(-1)[::mmap.PAGESIZE].sum())
+
+    def _release(self, index):
+        if not hasattr(self._mmap, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start = -(-index * self.frameBytes // mmap.PAGESIZE) * mmap.PAGESIZE
+        end = (index + 1) * self.frameBytes // mmap.PAGESIZE * mmap.PAGESIZE
+        if end > start:
+            self._mmap.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def getStatistics(self):
+        return {
+            "length": self.length,
+            "isComplete": self.isComplete,
+            "fromCache": self.fromCache,
+            "decoded": sum(frame is not None for frame in self._frames),
+            "resident": len(self._resident),
+            "cacheMb": self.frameBytes * self.length / 2 ** 20,
+        }
+
+    def close(self):
+        """
+        Ferma il pool e chiude la mappatura. Il file di cache resta su disco per la prossima volta.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._frames = [None] * self.length
+        self._resident = set()
+        self._planes = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # qualche consumer ha ancora in mano un frame: la mappatura viene chiusa quando lo rilascia
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._buildPath is not None:
+            # cache incompleta (o non spostata): il temporaneo non serve più a nessuno
+            try:
+                os.remove(self._buildPath)
+            except OSError:
+                pass
+            self._buildPath = None
+        self.isOpen = False
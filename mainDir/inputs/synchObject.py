@@ -1,18 +1,151 @@
+import math
+
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 
+from mainDir.engine.evaluationGraph import EvaluationGraph
+from mainDir.engine.latencyTracker import latencyTracker
+from mainDir.engine.masterClock import MasterClock
+from mainDir.engine.renderGovernor import renderGovernor
+from mainDir.engine.stageTimer import stageTimer
+
 
 class SynchObject(QObject):
+    """
+    Il SynchObject è il generatore di sincronia del mixer: ad ogni frame emette synch_SIGNAL e tutti gli input,
+    i monitor e le uscite si aggiornano. Prima usava un QTimer a intervallo fisso di 1000 // fps millisecondi
+    (a 60 fps sono 16 ms, quindi 62.5 Hz reali), adesso il tempo viene misurato dal MasterClock su scadenze assolute:
+    il QTimer è solo una sveglia single shot di precisione, riprogrammata ad ogni tick per la scadenza successiva.
+
+    Ad ogni tick, oltre a synch_SIGNAL (senza argomenti, per la compatibilità con tutti gli slot esistenti),
+    viene emesso clockTick_SIGNAL con il ClockTick, che contiene numero di frame, PTS e ritardo.
+    Lo stesso ClockTick è disponibile in currentTick.
+
+    Il SynchObject imposta anche il budget del frame dello stageTimer e misura la durata dell'intero tick
+    (cattura più tutti gli slot collegati a synch_SIGNAL) nella fase "tick".
+
+    Gli input non sono più collegati direttamente a synch_SIGNAL: si registrano con registerSource e ad ogni tick
+    l'EvaluationGraph cattura solo quelli che un consumer (registerConsumer) sta effettivamente usando.
+
+    Ogni tick viene misurato anche dal renderGovernor, che sotto sovraccarico degrada preview, scope e multiviewer;
+    quando toglie o ripristina un livello il SynchObject emette governor_SIGNAL con l'evento.
+    """
     synch_SIGNAL = pyqtSignal()
+    clockTick_SIGNAL = pyqtSignal(object)
+    governor_SIGNAL = pyqtSignal(object)
 
-    def __init__(self, fps=60, parent=None):  # Set FPS to 60
+    def __init__(self, fps=60, parent=None, clock=None, autoStart=True):  # Set FPS to 60
         super().__init__(parent)
-        self.fps = fps
+        self.clock = clock if clock is not None else MasterClock(fps)
+        self.currentTick = None
+        self.evaluationGraph = EvaluationGraph()
+        stageTimer.setFrameBudget(self.clock.frameDurationNs)
+        latencyTracker.setFrameDuration(self.clock.frameDurationNs)
+        renderGovernor.setFrameBudget(self.clock.frameDurationNs)
         self.syncTimer = QTimer(self)
+        self.syncTimer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.syncTimer.setSingleShot(True)
         self.syncTimer.timeout.connect(self.sync)
-        self.syncTimer.start(1000 // fps)
+        if autoStart:
+            self.start()
         self._initialized = True
 
+    @property
+    def fps(self):
+        """
+        Frame rate come float (59.94 resta 59.94, non 60).
+        """
+        return self.clock.fps
+
+    @fps.setter
+    def fps(self, value):
+        self.clock.setFps(value)
+        stageTimer.setFrameBudget(self.clock.frameDurationNs)
+        latencyTracker.setFrameDuration(self.clock.frameDurationNs)
+        renderGovernor.setFrameBudget(self.clock.frameDurationNs)
+
+    @property
+    def frameNumber(self):
+        """
+        Numero dell'ultimo frame emesso.
+        """
+        return self.clock.frameNumber
+
+    def start(self):
+        """
+        Fa partire il clock e programma il primo tick.
+        """
+        self.clock.start()
+        self.syncTimer.start(0)
+
+    def stop(self):
+        self.syncTimer.stop()
+
     def sync(self):
+        """
+        Chiamato dal QTimer. Se il timer è arrivato in anticipo rispetto alla scadenza si riprogramma senza emettere,
+        altrimenti esegue il tick e programma la sveglia per la scadenza successiva.
+        """
+        remainingNs = self.clock.timeToNextTickNs()
+        if remainingNs > 0 and self.clock.lastTick is not None:
+            self._scheduleNext(remainingNs)
+            return
+        self.advance()
+        self._scheduleNext(self.clock.timeToNextTickNs())
+
+    def advance(self, nowNs=None):
+        """
+        Esegue un tick: avanza il clock ed emette i segnali di sincronia. Può essere chiamato direttamente
+        quando il SynchObject è creato con autoStart=False, ad esempio da un loop senza interfaccia.
+        :param nowNs: istante del tick (di default il tempo del clock)
+        :return: ClockTick
+        """
+        self.currentTick = self.clock.tick(nowNs)
+        startNs = stageTimer.start()
+        renderGovernor.beginTick()
+        self.evaluationGraph.evaluate(self.currentTick)
+        self.clockTick_SIGNAL.emit(self.currentTick)
         self.synch_SIGNAL.emit()
+        stageTimer.stop("tick", startNs)
+        event = renderGovernor.endTick(self.currentTick)
+        if event is not None:
+            self.governor_SIGNAL.emit(event)
+        return self.currentTick
+
+    def registerSource(self, source):
+        """
+        Registra un input nel grafo di valutazione: il suo captureFrame verrà chiamato solo nei tick
+        in cui almeno un consumer lo usa.
+        :param source: l'input
+        """
+        self.evaluationGraph.registerSource(source)
+
+    def unregisterSource(self, source):
+        self.evaluationGraph.unregisterSource(source)
+
+    def registerConsumer(self, consumer):
+        """
+        Registra un consumer, cioè un oggetto con un metodo getLiveSources che restituisce gli input
+        che userà nel tick corrente.
+        :param consumer: il consumer
+        """
+        self.evaluationGraph.registerConsumer(consumer)
+
+    def unregisterConsumer(self, consumer):
+        self.evaluationGraph.unregisterConsumer(consumer)
+
+    def _scheduleNext(self, remainingNs):
+        # il QTimer lavora in millisecondi: si arrotonda per difetto e l'eventuale anticipo viene recuperato in sync
+        self.syncTimer.start(max(0, math.floor(remainingNs / 1_000_000)))
+
+    def getStatistics(self):
+        """
+        Statistiche del clock: frame emessi, tick in ritardo e frame saltati.
+        """
+        statistics = self.clock.getStatistics()
+        statistics["evaluation"] = self.evaluationGraph.getStatistics()
+        statistics["stages"] = stageTimer.getStatistics()
+        statistics["latency"] = latencyTracker.getStatistics()
+        statistics["governor"] = renderGovernor.getStatistics()
+        return statistics
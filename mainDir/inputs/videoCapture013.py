@@ -8,6 +8,7 @@ from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 
 from mainDir.inputs.baseClass import BaseClass
+from mainDir.inputs.captureWorker import CaptureWorker
 from mainDir.inputs.synchObject import SynchObject
 from mainDir.inputs.deviceProperties.deviceUpdaterThread import DeviceUpdater
 
@@ -25,20 +26,29 @@ la web cam non li ha. Se la webcam è un pò datata, potrebbe fra l'altro non su
 diversi da DShow (quindi non ha una latenza ottimizzata). In alternativa si può usare forceDShow=True per forzare l'uso 
 di Dshow e saltare la ricerca dei dispositivi.
 
+Con threaded=True la lettura dalla camera avviene in un CaptureWorker su un thread dedicato: nel tick di sincronia
+captureFrame prende solo l'ultimo frame completo dal TripleBuffer, così un dispositivo lento non blocca il mixer.
 
 """
 
 
 class VideoCapture013(BaseClass):
     needResizing = False
+    captureTimestampNs = None
+    driverTimestampMs = None
 
     def __init__(self, synchObject, cameraIndex=0, deviceDictionary=None, forceDShow=False,
-                 resolution=QSize(1920, 1080)):
+                 resolution=QSize(1920, 1080), threaded=False):
         super().__init__(synchObject, resolution)
         self.cameraIndex = cameraIndex
         self.target_resolution = (resolution.height(), resolution.width())
         self._frame = np.zeros((resolution.height(), resolution.width(), 3), dtype=np.uint8)
         self.camera = None
+        self.captureWorker = None
+        if threaded:
+            self._rawFrame = None
+            self.captureWorker = CaptureWorker(self.grabInto)
+            self.captureWorker.start()
         if not forceDShow:
             if deviceDictionary is None:
                 self.devices_dictionary = {}
@@ -89,21 +99,61 @@ class VideoCapture013(BaseClass):
             print("Failed to set one or more camera properties")
 
     def stop(self):
+        if self.captureWorker is not None:
+            self.captureWorker.stop()
         super().stop()
-        # No specific resources to release for ColorGenerator
 
     def captureFrame(self):
-        if self.camera:
+        if self.captureWorker is not None:
+            frame, isNew = self.captureWorker.latest()
+            if isNew:
+                self.captureTimestampNs = self.captureWorker.latestTimestampNs()
+                self._frame = frame
+        elif self.camera:
 
             frame_width = self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)
             frame_height = self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)
+            frame = self.camera.read()[1]
+            # tempo di cattura per il latencyTracker: il timestamp del driver se c'è (0 se non è supportato)
+            self.captureTimestampNs = time.perf_counter_ns()
+            self.driverTimestampMs = self.camera.get(cv2.CAP_PROP_POS_MSEC)
             if frame_width != self.target_resolution[1] or frame_height != self.target_resolution[0]:
-                self._frame = cv2.resize(self.camera.read()[1], self.target_resolution, interpolation=cv2.INTER_AREA)
+                self._frame = cv2.resize(frame, (self.resolution.width(), self.resolution.height()),
+                                         interpolation=cv2.INTER_AREA)
             else:
-                self._frame = self.camera.read()[1]
+                self._frame = frame
 
         self.updateFps()
 
+    def grabInto(self, buffer):
+        """
+        Legge un frame dalla camera scrivendo direttamente nel buffer del TripleBuffer.
+        Viene chiamata dal CaptureWorker, quindi fuori dal thread della GUI.
+        :param buffer: il buffer in cui scrivere, o None se non è ancora stato allocato
+        :return: il frame letto o None
+        """
+        camera = self.camera
+        if camera is None:
+            return None
+        width, height = self.resolution.width(), self.resolution.height()
+        if camera.get(cv2.CAP_PROP_FRAME_WIDTH) != width or camera.get(cv2.CAP_PROP_FRAME_HEIGHT) != height:
+            ret, self._rawFrame = camera.read(self._rawFrame)
+            if not ret:
+                return None
+            if buffer is None or buffer.shape != (height, width, 3):
+                return cv2.resize(self._rawFrame, (width, height), interpolation=cv2.INTER_AREA)
+            return cv2.resize(self._rawFrame, (width, height), dst=buffer, interpolation=cv2.INTER_AREA)
+        ret, frame = camera.read(buffer)
+        return frame if ret else None
+
+    def getCaptureStatistics(self):
+        """
+        Statistiche della cattura threaded: frame pubblicati, sovrascritti e duplicati.
+        """
+        if self.captureWorker is None:
+            return {}
+        return self.captureWorker.getStatistics()
+
     def getFrame(self):
         return self._frame
 
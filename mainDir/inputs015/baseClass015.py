@@ -3,8 +3,12 @@ import cv2
 import numpy as np
 from PyQt6.QtCore import *
 
+from mainDir.engine.frameCache import VersionedFrame
+from mainDir.engine.pointOpCompiler import PointOpCompiler, gammaTable
+from mainDir.engine.stageTimer import timedStage
 
-class BaseClass015(QObject):
+
+class BaseClass015(VersionedFrame, QObject):
     """
     Classe base per la generazione di immagini. È una classe QObject, quindi può essere usata con i segnali e gli slot,
     ma non ha un'interfaccia grafica. Viene usata come template per costruire tutti gli input che generano immagini.
@@ -15,6 +19,13 @@ class BaseClass015(QObject):
     but it does not have a graphical interface. It is used as a template to build all inputs that generate images.
     Each input can transform its image based on settings such as gamma correction, negative,
     grayscale, unsharp mask, and selfScreen.
+
+    getFrame è memoizzato (VersionedFrame): il frame viene rielaborato solo se è stato catturato un nuovo frame
+    o è cambiata un'impostazione, non ad ogni lettura.
+
+    Con un keyer (setKeyer, ChromaKeyer o LumaKeyer) getKeyedFrame restituisce un frame BGRA con il matte nel canale
+    alpha, da usare come livello del DownstreamKeyer. getFrame resta BGR, così l'input si può comunque mettere in
+    preview, in program o su un aux.
     """
 
     clip_limit = 2.0
@@ -32,17 +43,26 @@ class BaseClass015(QObject):
     isGrayScale = False
     flipType = 0
     _blurAmount = 40
+    keyer = None
+    _keyedKey = None
+    _keyedFrame = None
+    _processingAttributes = frozenset((
+        "clip_limit", "tile_grid_size", "gamma", "isFrameInverted", "isFrameAutoScreen", "isFrameCLAHE",
+        "isFrameHistogramEqualization", "isFrameCLAHEYUV", "isFrameHistogramEqualizationYUV", "isFlipped",
+        "isBlurred", "screenMask", "isGrayScale", "flipType", "_blurAmount", "keyer"))
 
     def __init__(self, synchObject, resolution=QSize(1920, 1080)):
         """
         Inizializza la classe base con un oggetto di sincronizzazione e una risoluzione.
-        Connette il segnale di sincronizzazione alla funzione capture_frame.
+        Registra l'input nel grafo di valutazione del synchObject: captureFrame viene chiamato
+        ad ogni tick solo se l'input è usato da un consumer (mixBus, monitor, ecc.).
         """
         super().__init__()
         self.synch_Object = synchObject
         self.resolution = resolution
+        self._pointOps = PointOpCompiler()
         self._frame = self.returnBlackFrame()
-        self.synch_Object.synch_SIGNAL.connect(self.captureFrame)
+        self.synch_Object.registerSource(self)
         self.start_time = time.time()
         self.frame_count = 0
         self.total_time = 0
@@ -71,20 +91,25 @@ class BaseClass015(QObject):
         """
         self.updateFps()
 
+    @timedStage("frameProcessor")
     def frameProcessor(self, frame):
         """
         Applica le varie trasformazioni al frame in base alle impostazioni correnti.
+        Negativo, autoscreen e gamma sono operazioni puntuali e vengono applicate insieme con un solo cv2.LUT:
+        il PointOpCompiler compone le tabelle e le ricostruisce solo quando cambia un parametro.
         :param frame: Frame da elaborare.
         :return: Frame elaborato.
         """
         if self.isFlipped:
             frame = self.flipFrame()
+        pointOps = []
         if self.isFrameInverted:
-            frame = self.invertFrame(frame)
+            pointOps.append(("negative", None))
         if self.isFrameAutoScreen:
-            frame = self.autoScreenFrame(frame)
+            pointOps.append(("screen", None))
         if self.gamma != 1.0:
-            frame = self.applyGammaByLut(frame, self.gamma)
+            pointOps.append(("gamma", self.gamma))
+        frame = self._pointOps.apply(frame, tuple(pointOps))
         if self.isFrameCLAHE:
             frame = self.applyCLAHE(frame)
         if self.isFrameHistogramEqualization:
@@ -99,12 +124,43 @@ class BaseClass015(QObject):
             frame = self.boxBlur(frame)
         return frame
 
+    def frameVersion(self):
+        """
+        Come VersionedFrame.frameVersion, più la versione dei parametri del keyer.
+        """
+        key = super().frameVersion()
+        if self.keyer is not None:
+            key += (self.keyer.version,)
+        return key
+
+    def setKeyer(self, keyer):
+        """
+        Imposta il keyer dell'input (ChromaKeyer o LumaKeyer), None per toglierlo.
+        :param keyer: il keyer
+        """
+        self.keyer = keyer
+
     def getFrame(self):
         """
-        Ritorna il frame corrente.
+        Ritorna il frame corrente elaborato. Il risultato resta in cache finché non cambia il frame o un'impostazione.
         :return: Frame corrente.
         """
-        return self.frameProcessor(self._frame)
+        return self.processedFrame()
+
+    def getKeyedFrame(self):
+        """
+        Frame elaborato con il keyer applicato: BGRA con il matte nel canale alpha. Anche questo resta in cache
+        finché non cambia la versione del frame (che comprende quella del keyer).
+        :return: frame BGRA, o il frame di getFrame se l'input non ha un keyer
+        """
+        frame = self.processedFrame()
+        if self.keyer is None:
+            return frame
+        key = self.frameVersion()
+        if key != self._keyedKey:
+            self._keyedFrame = self.keyer.apply(frame)
+            self._keyedKey = key
+        return self._keyedFrame
 
     def updateFps(self):
         """
@@ -167,10 +223,7 @@ class BaseClass015(QObject):
 
     @staticmethod
     def applyGammaByLut(image, gamma):
-        inv_gamma = 1.0 / gamma
-        table = np.array([(i / 255.0) ** inv_gamma * 255
-                          for i in range(256)]).astype(np.uint8)
-        return cv2.LUT(image, table)
+        return cv2.LUT(image, gammaTable(gamma))
 
     @staticmethod
     def applyCLAHE(image, clip_limit=2.0, tile_grid_size=(8, 8)):
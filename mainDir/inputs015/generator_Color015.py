@@ -14,6 +14,7 @@ class ColorGenerator015(BaseClass015):
     def setColor(self, color: QColor):
         self._color = color
         self._frame[:, :] = [color.blue(), color.green(), color.red()]
+        self.invalidateFrame()
 
     def captureFrame(self):
         super().captureFrame()
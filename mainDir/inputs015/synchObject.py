@@ -1,18 +1,5 @@
-from PyQt6.QtWidgets import *
-from PyQt6.QtCore import *
-from PyQt6.QtGui import *
+# Il SynchObject è unico per tutto il mixer: gli input 015 usano lo stesso MasterClock degli input 013,
+# così un mixer che usa entrambi ha un solo riferimento temporale.
+from mainDir.inputs.synchObject import SynchObject
 
-
-class SynchObject(QObject):
-    synch_SIGNAL = pyqtSignal()
-
-    def __init__(self, fps=60, parent=None):  # Set FPS to 60
-        super().__init__(parent)
-        self.fps = fps
-        self.syncTimer = QTimer(self)
-        self.syncTimer.timeout.connect(self.sync)
-        self.syncTimer.start(1000 // fps)
-        self._initialized = True
-
-    def sync(self):
-        self.synch_SIGNAL.emit()
+__all__ = ["SynchObject"]
@@ -1,8 +1,8 @@
-import numpy as np
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 
+from mainDir.engine.framePool import framePool
 from mainDir.inputs.generator_Checkerboard import CheckerBoardGenerator
 from mainDir.inputs.generator_Color import ColorGenerator
 from mainDir.inputs.generator_Gradients import GradientGenerator
@@ -13,8 +13,10 @@ from mainDir.inputs.imageLoader_Still import ImageLoader
 from mainDir.inputs.screenCapture import ScreenCapture
 from mainDir.inputs.synchObject import SynchObject
 from mainDir.inputs.videoCapture013 import VideoCapture013
+from mainDir.mixBus.busRouter import BusRouter
 from mainDir.mixBus.mixBus_014 import MixBus014, MIX_TYPE
 from mainDir.ouputs.monitorWidget import MonitorWidget012
+from mainDir.ouputs.multiViewer import MultiViewer, MultiViewerWidget
 from mainDir.widgets.mixingKeyboard_012 import MixerPanelWidget_012
 from mainDir.widgets.videoWidgets.matrixWidget import MatrixWidget
 
@@ -56,6 +58,11 @@ class VideoMixerUI(QWidget):
         self.tab_widget = QTabWidget(self)
         self._matrix = {1: self.mixBus.preview_input, 2: self.mixBus.program_input, 3: None, 4: None,
                         5: None, 6: None, 7: None, 8: None}
+        # il mixBus è il primo M/E del router: altri M/E e gli aux usano la stessa matrice e gli stessi frame
+        self.busRouter = BusRouter(self.synchObject, self._matrix)
+        self.busRouter.addMixEffect("ME1", self.mixBus)
+        self.multiViewer = MultiViewer(self.synchObject, self._matrix, self.mixBus)
+        self.multiViewerWidget = MultiViewerWidget(self.multiViewer, self.synchObject)
         self.initUI()
         self.initGeometry()
         self.initConnections()
@@ -93,6 +100,7 @@ class VideoMixerUI(QWidget):
         right_bottom_layout.addLayout(effects_layout)
 
         self.tab_widget.addTab(self.matrixWidget, 'matrix')
+        self.tab_widget.addTab(self.multiViewerWidget, 'multiviewer')
         self.tab_widget.addTab(QWidget(), 'audio Mixer')
         self.tab_widget.addTab(QWidget(), 'system')
 
@@ -133,6 +141,8 @@ class VideoMixerUI(QWidget):
         :param value: The new matrix dictionary.
         """
         self._matrix = value
+        self.busRouter.matrix = value
+        self.multiViewer.matrix = value
 
     def set_matrix_value(self, index, value):
         """
@@ -180,7 +190,7 @@ class VideoMixerUI(QWidget):
         if self._dirtyFrame is not None:
             return self._dirtyFrame
         else:
-            return np.zeros((1080, 1920, 3), dtype=np.uint8)
+            return framePool.black((1080, 1920, 3))
 
     def onMixerPanelSignal(self, data):
         """
@@ -221,7 +231,7 @@ class VideoMixerUI(QWidget):
         if data == 1:  # mix
             self.transitionType = MIX_TYPE.MIX
         elif data == 2:  # dip
-            pass
+            self.transitionType = MIX_TYPE.DIP
         elif data == 3:  # wipe
             self.transitionType = MIX_TYPE.WIPE_LEFT
         elif data == 4:  # sting
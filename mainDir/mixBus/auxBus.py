@@ -0,0 +1,104 @@
+from PyQt6.QtCore import *
+
+from mainDir.engine.framePool import framePool
+from mainDir.engine.latencyTracker import latencyTracker
+from mainDir.engine.stageTimer import stageTimer
+from mainDir.mixBus.dissolveKernel import DissolveKernel, EASING, easingTable
+
+"""
+Bus aux: un'uscita con una sola sorgente (un input della matrice o il program di un M/E), per le uscite pulite di
+registrazione, streaming e monitor di controllo.
+
+L'aux non cattura niente per conto suo: è un consumer dell'EvaluationGraph come il MixBus014 e legge i frame con
+evaluationGraph.frame, quindi un input usato da più bus viene catturato ed elaborato (frameProcessor compreso) una
+volta sola per tick e tutti ricevono lo stesso frame in sola lettura.
+
+Il cambio di sorgente può essere un taglio o un dissolve di qualche frame, con il DissolveKernel. Come nel
+MixBus014 il dissolve avanza con il numero di frame del tick e il frame di uscita viene calcolato una volta per tick.
+"""
+
+
+class AuxBus(QObject):
+
+    def __init__(self, synchObject, name="", resolution=QSize(1920, 1080), parent=None):
+        """
+        :param synchObject: il SynchObject del mixer
+        :param name: nome dell'uscita
+        :param resolution: risoluzione del frame nero restituito senza sorgente
+        """
+        super().__init__(parent)
+        self.synch_object = synchObject
+        self.name = name
+        self._resolution = resolution
+        self.source = None
+        # sorgente uscente durante il dissolve
+        self._previousSource = None
+        self._transitionStartFrame = None
+        self._transitionTable = None
+        self.dissolveKernel = DissolveKernel()
+        self._frameNumber = None
+        self._frame = None
+        self.synch_object.registerConsumer(self)
+
+    def setSource(self, source, duration=0):
+        """
+        Cambia la sorgente dell'aux.
+        :param source: un input o un MixBus014 (il suo program)
+        :param duration: durata del dissolve in frame, 0 per un taglio
+        """
+        if source is self.source:
+            return
+        if duration > 0 and self.source is not None:
+            self._previousSource = self.source
+            self._transitionStartFrame = None
+            self._transitionTable = easingTable(EASING.LINEAR, duration)
+        else:
+            self._previousSource = None
+        self.source = source
+        self._frameNumber = None
+
+    def isMixing(self):
+        return self._previousSource is not None
+
+    def getLiveSources(self):
+        """
+        La sorgente corrente e, durante il dissolve, quella uscente.
+        """
+        return [self.source, self._previousSource] if self._previousSource is not None else [self.source]
+
+    def _getFrame(self, source):
+        try:
+            frame = self.synch_object.evaluationGraph.frame(source)
+        except AttributeError:
+            frame = None
+        if frame is None:
+            return framePool.black((self._resolution.height(), self._resolution.width(), 3))
+        return frame
+
+    def _transitionWeight(self, frameNumber):
+        if self._transitionStartFrame is None:
+            self._transitionStartFrame = frameNumber
+        elapsed = max(0, frameNumber - self._transitionStartFrame)
+        if elapsed >= len(self._transitionTable) - 1:
+            self._previousSource = None
+            return None
+        return int(self._transitionTable[elapsed])
+
+    def getFrame(self):
+        """
+        Il frame dell'aux nel tick corrente, calcolato alla prima richiesta del tick.
+        :return: il frame di uscita, condiviso con tutti quelli che leggono l'aux nel tick: non va modificato
+        """
+        frameNumber = self.synch_object.frameNumber
+        if frameNumber >= 0 and frameNumber == self._frameNumber:
+            return self._frame
+        startNs = stageTimer.start()
+        frame = self._getFrame(self.source)
+        if self._previousSource is not None:
+            weight = self._transitionWeight(frameNumber)
+            if weight is not None:
+                frame = self.dissolveKernel.dissolve(frame, self._getFrame(self._previousSource), weight)
+        stageTimer.stop("aux.getFrame", startNs)
+        latencyTracker.markMixed(f"aux.{self.name}", self.source)
+        self._frameNumber, self._frame = frameNumber, frame
+        return frame
@@ -0,0 +1,79 @@
+from PyQt6.QtCore import *
+
+from mainDir.mixBus.auxBus import AuxBus
+from mainDir.mixBus.mixBus_014 import MixBus014
+
+"""
+Router dei bus del mixer: più banchi M/E (MixBus014, ognuno con preview, program e transizioni proprie) e più aux,
+tutti alimentati dalla stessa matrice di input.
+
+Il router non copia né cattura frame: instrada i numeri della matrice verso i bus. Ogni bus è un consumer
+dell'EvaluationGraph e legge gli input con evaluationGraph.frame, quindi un input selezionato su tre bus viene
+catturato ed elaborato una volta sola per tick. Anche il program di un M/E può andare su un aux o sul preview di un
+altro M/E (il MixBus014 ha un getFrame), e viene calcolato una volta per tick.
+"""
+
+
+class BusRouter(QObject):
+
+    def __init__(self, synchObject, matrix, resolution=QSize(1920, 1080), parent=None):
+        """
+        :param synchObject: il SynchObject del mixer
+        :param matrix: dizionario numero -> input, lo stesso della VideoMixerUI
+        :param resolution: risoluzione dei bus creati dal router
+        """
+        super().__init__(parent)
+        self.synchObject = synchObject
+        self.matrix = matrix
+        self._resolution = resolution
+        self.mixEffects = {}
+        self.auxes = {}
+
+    def addMixEffect(self, name, mixBus=None):
+        """
+        Aggiunge un banco M/E. Si può passare un MixBus014 già esistente, altrimenti ne viene creato uno.
+        :return: il MixBus014
+        """
+        if mixBus is None:
+            mixBus = MixBus014(self.synchObject, resolution=self._resolution)
+        self.mixEffects[name] = mixBus
+        return mixBus
+
+    def addAux(self, name):
+        """
+        Aggiunge un'uscita aux, senza sorgente.
+        :return: l'AuxBus
+        """
+        aux = AuxBus(self.synchObject, name, self._resolution)
+        self.auxes[name] = aux
+        return aux
+
+    def source(self, route):
+        """
+        Risolve una sorgente: un numero della matrice, il nome di un M/E (il suo program) o un input.
+        """
+        if isinstance(route, int):
+            return self.matrix.get(route)
+        if isinstance(route, str):
+            return self.mixEffects[route]
+        return route
+
+    def setPreview(self, mixEffect, route):
+        self.mixEffects[mixEffect].setPreviewInput(self.source(route))
+
+    def setProgram(self, mixEffect, route):
+        self.mixEffects[mixEffect].setProgramInput(self.source(route))
+
+    def setAux(self, aux, route, duration=0):
+        """
+        :param aux: nome dell'aux
+        :param route: numero della matrice, nome di un M/E o input
+        :param duration: durata del dissolve in frame, 0 per un taglio
+        """
+        self.auxes[aux].setSource(self.source(route), duration)
+
+    def getStatistics(self):
+        """
+        Statistiche dell'EvaluationGraph: frameMisses sono i getFrame effettivi, frameHits le letture condivise.
+        """
+        return self.synchObject.evaluationGraph.getStatistics()
@@ -0,0 +1,113 @@
+import math
+from enum import Enum
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from mainDir.engine.framePool import framePool, FrameBuffers
+
+"""
+Kernel del dissolve, usato dal MixBus014 per MIX, STILL e fade to black.
+
+I pesi sono in virgola fissa 8.8: un intero da 0 (tutto il frame uscente) a WEIGHT_ONE = 256 (tutto il frame entrante).
+Per ogni transizione la curva di easing viene calcolata una volta sola come tabella di pesi lunga quanto la transizione
+in frame (easingTable, in cache), quindi ad ogni tick il peso è una lettura dalla tabella e non un calcolo in float.
+Ai due estremi (peso 0 e 256) il kernel restituisce il frame sorgente così com'è, senza miscelare niente.
+
+Il mix vero e proprio resta a cv2.addWeighted con i pesi w/256 e 1 - w/256, che sono esatti in float: misurato
+a 1080p su un thread, addWeighted impiega circa 1.9 ms contro 7.9 ms della stessa formula intera in NumPy
+((a * w + b * (256 - w)) >> 8 su uint16) e 21 ms con le operazioni a 16 bit di OpenCV, perché
+la versione SIMD di addWeighted fa tutto in un passaggio solo. Il fade to black usa cv2.convertScaleAbs (un solo
+ingresso, circa 1.4 ms).
+"""
+
+WEIGHT_ONE = 256
+
+
+class EASING(Enum):
+    LINEAR = 0
+    S_CURVE = 1
+    EASE_IN = 2
+    EASE_OUT = 3
+
+
+@lru_cache(maxsize=64)
+def easingTable(easing, frames):
+    """
+    Tabella dei pesi di una transizione.
+    :param easing: EASING
+    :param frames: durata della transizione in frame
+    :return: np.ndarray uint16 di frames + 1 pesi da 0 a WEIGHT_ONE, in sola lettura
+    """
+    frames = max(1, int(frames))
+    t = np.linspace(0.0, 1.0, frames + 1)
+    if easing == EASING.LINEAR:
+        curve = t
+    elif easing == EASING.S_CURVE:
+        curve = t * t * (3.0 - 2.0 * t)
+    elif easing == EASING.EASE_IN:
+        curve = t * t
+    elif easing == EASING.EASE_OUT:
+        curve = 1.0 - (1.0 - t) * (1.0 - t)
+    else:
+        raise ValueError(f"Unknown easing {easing}")
+    table = np.rint(curve * WEIGHT_ONE).astype(np.uint16)
+    table[0], table[-1] = 0, WEIGHT_ONE
+    table.flags.writeable = False
+    return table
+
+
+def weightAt(table, progress):
+    """
+    Peso della tabella all'avanzamento progress (da 0 a 1).
+    """
+    last = len(table) - 1
+    index = min(max(int(math.floor(progress * last + 0.5)), 0), last)
+    return int(table[index])
+
+
+class DissolveKernel:
+
+    def __init__(self):
+        # buffer di uscita a rotazione, come nel MixBus014
+        self._outputBuffers = FrameBuffers()
+
+    def _output(self, shape, dst):
+        return dst if dst is not None else self._outputBuffers.next(shape)
+
+    def dissolve(self, incoming, outgoing, weight, dst=None):
+        """
+        Dissolve da outgoing a incoming.
+        :param incoming: il frame che entra
+        :param outgoing: il frame che esce
+        :param weight: peso 8.8 di incoming, da 0 a WEIGHT_ONE
+        :param dst: buffer di uscita, di default uno dei buffer a rotazione del kernel
+        :return: il frame miscelato, o direttamente uno dei due frame agli estremi
+        """
+        if weight <= 0:
+            return outgoing
+        if weight >= WEIGHT_ONE:
+            return incoming
+        alpha = weight / WEIGHT_ONE
+        return cv2.addWeighted(incoming, alpha, outgoing, 1.0 - alpha, 0, dst=self._output(outgoing.shape, dst))
+
+    def dip(self, frame, color, weight, dst=None):
+        """
+        Dissolve da frame verso un colore pieno: con color nero è il fade to black.
+        :param frame: il frame di partenza
+        :param color: colore in BGR
+        :param weight: peso 8.8 del colore, da 0 a WEIGHT_ONE
+        :param dst: buffer di uscita
+        :return: il frame miscelato, frame con peso 0 e il frame costante del colore con peso pieno
+        """
+        if weight <= 0:
+            return frame
+        color = tuple(color)
+        if weight >= WEIGHT_ONE:
+            return framePool.constant(frame.shape, color)
+        alpha = weight / WEIGHT_ONE
+        output = self._output(frame.shape, dst)
+        if not any(color):
+            return cv2.convertScaleAbs(frame, output, 1.0 - alpha, 0)
+        return cv2.addWeighted(framePool.constant(frame.shape, color), alpha, frame, 1.0 - alpha, 0, dst=output)
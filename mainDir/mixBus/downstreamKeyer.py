@@ -0,0 +1,247 @@
+import cv2
+import numpy as np
+
+from mainDir.engine.framePool import FrameBuffers
+from mainDir.engine.masterClock import framesSince
+from mainDir.engine.stageTimer import timedStage
+from mainDir.inputs.stingerCache import prepareStingerFrame
+
+"""
+Downstream keyer (DSK): una pila di livelli (logo, sottopancia, orologio, stinger...) messi sopra il program dopo
+il mix e prima del fade to black.
+
+Ogni livello (DskLayer) prende fill e key da un input:
+- un input che restituisce un frame BGRA (il canale alpha è il key) o BGR (opaco); per un input con un keyer viene
+  letto getKeyedFrame, il frame con il matte del keyer nel canale alpha;
+- un input di fill e uno di key separati, come i fill/key dei mixer hardware (il key è la luminanza del secondo);
+- uno StingerLoader, che ha già i frame preparati (getStingerFrame).
+Fill e key vengono preparati come per lo stinger: fill premoltiplicato, key inverso a 3 canali e rettangolo in cui
+l'alpha non è zero. I frame vengono letti dall'EvaluationGraph del synchObject come nei bus, quindi un input usato
+anche da un bus o da un aux viene letto una volta sola per tick. La preparazione viene rifatta solo quando cambia la versione del frame dell'input (frameVersion
+di VersionedFrame, che comprende keyer e dipendenze come la maschera dello screen): per un logo statico si fa una
+volta sola.
+
+Ogni livello ha un'opacità e una transizione di entrata e uscita in onda (auto, in frame, avanza di un frame per tick anche se il compositor viene chiamato più volte).
+Il compositor copia il program una volta in un buffer e ogni livello lavora solo nel suo rettangolo: con 3-4 livelli
+piccoli il costo è quello di una copia più i pixel effettivamente coperti. Senza livelli in onda il program passa
+senza copie.
+"""
+
+
+class DskLayer:
+
+    def __init__(self, fillSource, keySource=None, name="", opacity=1.0, transitionFrames=15, synchObject=None):
+        """
+        :param fillSource: input del fill (BGRA, BGR o StingerLoader)
+        :param keySource: input del key, opzionale: la sua luminanza diventa l'alpha del fill
+        :param name: nome del livello
+        :param opacity: opacità del livello in onda, da 0 a 1
+        :param transitionFrames: durata in frame dell'entrata e dell'uscita automatica
+        :param synchObject: il SynchObject del mixer, di solito impostato dal DownstreamKeyer in addLayer
+        """
+        self.synchObject = synchObject
+        self.fillSource = fillSource
+        self.keySource = keySource
+        self.name = name
+        self.opacity = opacity
+        self.transitionFrames = transitionFrames
+        # _onAirFrame va da 0 (fuori onda) a transitionFrames (in onda), _direction è +1, -1 o 0
+        self._onAirFrame = 0
+        self._direction = 0
+        self._lastFrame = None
+        self._preparedKey = None
+        self._prepared = None
+        self._planes = None
+        self._scaledBuffers = FrameBuffers(count=2)
+        self._scaledKey = None
+        self._scaled = None
+
+    # ------------------------------------------------------------------ messa in onda
+
+    def auto(self, frames=None):
+        """
+        Manda in onda il livello o lo toglie, con una transizione di frames frame (di default transitionFrames).
+        Se la transizione è in corso ne inverte la direzione.
+        """
+        if frames is not None and frames != self.transitionFrames:
+            progress = self._onAirFrame / self.transitionFrames
+            self.transitionFrames = max(1, int(frames))
+            self._onAirFrame = round(progress * self.transitionFrames)
+        towardsAir = self._direction < 0 or (self._direction == 0 and self._onAirFrame == 0)
+        self._direction = 1 if towardsAir else -1
+
+    def cut(self):
+        """
+        Manda in onda il livello o lo toglie subito.
+        """
+        self._direction = 0
+        self._onAirFrame = 0 if self.isOnAir() else self.transitionFrames
+
+    def isOnAir(self):
+        """
+        :return: True se il livello è in onda o ci sta andando
+        """
+        return self._direction > 0 or (self._direction == 0 and self._onAirFrame > 0)
+
+    def isVisible(self):
+        return (self._onAirFrame > 0 or self._direction > 0) and self.opacity > 0
+
+    def setOpacity(self, opacity):
+        self.opacity = min(max(float(opacity), 0.0), 1.0)
+
+    def advance(self, frameNumber=None):
+        """
+        Fa avanzare la transizione in onda dei frame passati dall'ultima chiamata (uno per tick, nessuno se
+        il compositor viene chiamato di nuovo nello stesso tick).
+        :param frameNumber: numero di frame del tick, None per avanzare sempre di un frame
+        :return: il livello da usare nel frame, da 0 a 1
+        """
+        steps = framesSince(self._lastFrame, frameNumber)
+        self._lastFrame = frameNumber
+        if self._direction and steps:
+            self._onAirFrame = min(max(self._onAirFrame + self._direction * steps, 0), self.transitionFrames)
+            if self._onAirFrame in (0, self.transitionFrames):
+                self._direction = 0
+        return self.opacity * self._onAirFrame / self.transitionFrames
+
+    def getSources(self):
+        return [source for source in (self.fillSource, self.keySource) if source is not None]
+
+    # ------------------------------------------------------------------ preparazione
+
+    @staticmethod
+    def _version(source):
+        if source is None:
+            return None
+        # frameVersion comprende anche il keyer e le dipendenze (la maschera dello screen)
+        frameVersion = getattr(source, "frameVersion", None)
+        if frameVersion is not None:
+            return frameVersion()
+        contentVersion = getattr(source, "contentVersion", None)
+        if contentVersion is None:
+            return None
+        return contentVersion, getattr(source, "parameterVersion", 0)
+
+    def _frame(self, source, keyed=False):
+        """
+        Frame dell'input nel tick, dall'EvaluationGraph come per i bus; senza synchObject viene letto dall'input.
+        """
+        evaluationGraph = getattr(self.synchObject, "evaluationGraph", None)
+        if evaluationGraph is not None:
+            return evaluationGraph.frame(source, keyed)
+        getKeyedFrame = getattr(source, "getKeyedFrame", None) if keyed else None
+        return getKeyedFrame() if getKeyedFrame is not None else source.getFrame()
+
+    def prepared(self):
+        """
+        Fill premoltiplicato, key inverso e rettangolo del frame corrente, rifatti solo se l'input è cambiato.
+        :return: StingerFrame, None se l'input non ha un frame
+        """
+        if hasattr(self.fillSource, "getStingerFrame"):
+            return self.fillSource.getStingerFrame()
+        fillVersion, keyVersion = self._version(self.fillSource), self._version(self.keySource)
+        key = None if fillVersion is None or (self.keySource is not None and keyVersion is None) \
+            else (fillVersion, keyVersion)
+        if key is not None and key == self._preparedKey:
+            return self._prepared
+        fill = self._frame(self.fillSource, keyed=True)
+        if fill is None:
+            return None
+        if self.keySource is not None:
+            keyFrame = self._frame(self.keySource)
+            alpha = cv2.cvtColor(keyFrame, cv2.COLOR_BGR2GRAY) if keyFrame.ndim == 3 else keyFrame
+            fill = cv2.merge((*cv2.split(fill)[:3], alpha))
+        shape = fill.shape[:2] + (3,)
+        if self._planes is None or self._planes.shape[1:] != shape:
+            self._planes = np.empty((2,) + shape, dtype=np.uint8)
+        self._prepared = prepareStingerFrame(fill, self._planes[0], self._planes[1])
+        self._preparedKey = key
+        return self._prepared
+
+    def scaled(self, prepared, level, box):
+        """
+        Fill e key inverso del rettangolo box con l'opacità level applicata:
+        fill * level e 255 - (255 - keyInverso) * level.
+        Per un livello statico con opacità fissa il risultato resta in cache come il frame preparato.
+        """
+        key = (self._preparedKey, level) if self._preparedKey is not None and prepared is self._prepared else None
+        if key is not None and key == self._scaledKey:
+            return self._scaled
+        top, bottom, left, right = box
+        shape = (bottom - top, right - left, 3)
+        fill = self._scaledBuffers.next(shape)
+        inverseKey = self._scaledBuffers.next(shape)
+        cv2.convertScaleAbs(prepared.fill[top:bottom, left:right], fill, level, 0)
+        cv2.addWeighted(prepared.inverseKey[top:bottom, left:right], level, prepared.inverseKey[top:bottom, left:right],
+                        0, 255 * (1 - level), dst=inverseKey)
+        self._scaledKey, self._scaled = key, (fill, inverseKey)
+        return fill, inverseKey
+
+
+class DownstreamKeyer:
+
+    def __init__(self, synchObject=None):
+        """
+        :param synchObject: il SynchObject del mixer, i livelli leggono i frame dal suo EvaluationGraph
+        """
+        self.synchObject = synchObject
+        self.layers = []
+        self._outputBuffers = FrameBuffers()
+
+    def addLayer(self, layer):
+        """
+        Aggiunge un livello sopra quelli esistenti.
+        :param layer: DskLayer
+        :return: il livello
+        """
+        if layer.synchObject is None:
+            layer.synchObject = self.synchObject
+        self.layers.append(layer)
+        return layer
+
+    def removeLayer(self, layer):
+        if layer in self.layers:
+            self.layers.remove(layer)
+
+    def getLiveSources(self):
+        """
+        Input dei livelli visibili, da catturare nel tick.
+        """
+        sources = []
+        for layer in self.layers:
+            if layer.isVisible():
+                sources.extend(layer.getSources())
+        return sources
+
+    @timedStage("dsk.composite")
+    def composite(self, programFrame, frameNumber=None):
+        """
+        Mette i livelli in onda sopra il program, dal primo all'ultimo.
+        :param programFrame: il frame di program dopo il mix
+        :param frameNumber: numero di frame del tick, per far avanzare le transizioni dei livelli
+        :return: il frame con i livelli, o programFrame stesso se non c'è niente in onda
+        """
+        output = None
+        for layer in self.layers:
+            level = layer.advance(frameNumber)
+            if level <= 0:
+                continue
+            prepared = layer.prepared()
+            if prepared is None or prepared.box is None or prepared.fill.shape != programFrame.shape:
+                continue
+            if output is None:
+                output = self._outputBuffers.next(programFrame.shape)
+                np.copyto(output, programFrame)
+            top, bottom, left, right = prepared.box
+            region = output[top:bottom, left:right]
+            if level >= 1.0:
+                if prepared.isOpaque:
+                    np.copyto(region, prepared.fill[top:bottom, left:right])
+                    continue
+                fill = prepared.fill[top:bottom, left:right]
+                inverseKey = prepared.inverseKey[top:bottom, left:right]
+            else:
+                fill, inverseKey = layer.scaled(prepared, level, prepared.box)
+            cv2.multiply(region, inverseKey, dst=region, scale=1 / 255)
+            cv2.add(region, fill, dst=region)
+        return programFrame if output is None else output
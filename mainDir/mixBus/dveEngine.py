@@ -0,0 +1,166 @@
+from enum import Enum
+
+import cv2
+import numpy as np
+
+from mainDir.engine.framePool import FrameBuffers
+
+"""
+Motore delle transizioni DVE (digital video effects) del MixBus014:
+- PUSH: il frame entrante arriva da un lato e spinge fuori l'uscente, senza scalare;
+- SQUEEZE: l'entrante si allarga da un lato mentre l'uscente si stringe nello spazio che resta;
+- FLY: l'entrante parte da un rettangolo vuoto (al centro o su un lato) e cresce fino a coprire il frame
+  sopra l'uscente, che resta fermo.
+
+Le trasformazioni sono tutte scala più traslazione, quindi ogni posizionamento è una coppia di rettangoli: la parte
+della sorgente che si vede e il rettangolo di destinazione in cui finisce. Alla partenza della transizione (prepare)
+i rettangoli di ogni frame vengono calcolati una volta sola, già con la curva di easing e già ritagliati sui bordi del
+frame. A ogni tick ogni sorgente viene scritta solo nel suo rettangolo di destinazione: con una copia se non è scalata,
+altrimenti con cv2.resize direttamente nella ROI del buffer di uscita. Un warpAffine del frame intero costa circa
+7.5 ms a 1080p, un resize nella ROI costa in proporzione ai pixel che scrive.
+"""
+
+
+class DVE_TYPE(Enum):
+    PUSH = 0
+    SQUEEZE = 1
+    FLY = 2
+
+
+class DVE_ORIGIN(Enum):
+    RIGHT = 0
+    LEFT = 1
+    TOP = 2
+    BOTTOM = 3
+    CENTER = 4
+
+
+INCOMING, OUTGOING = 0, 1
+
+
+def _placement(source, width, height, x0, y0, x1, y1):
+    """
+    Posizionamento di una sorgente intera (width x height) nel rettangolo (x0, y0, x1, y1), che può uscire dal frame.
+    :return: (sorgente, rettangolo della sorgente, rettangolo di destinazione) già ritagliati, None se non si vede
+    """
+    # il rettangolo viene arrotondato prima del ritaglio: così con scala 1 sorgente e destinazione hanno la stessa
+    # dimensione e il posizionamento è una copia
+    x0, y0, x1, y1 = (int(round(value)) for value in (x0, y0, x1, y1))
+    dx0, dy0, dx1, dy1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+    if dx1 - dx0 < 1 or dy1 - dy0 < 1:
+        return None
+    scaleX, scaleY = width / (x1 - x0), height / (y1 - y0)
+    sourceRect = (int(round((dx0 - x0) * scaleX)), int(round((dy0 - y0) * scaleY)),
+                  int(round((dx1 - x0) * scaleX)), int(round((dy1 - y0) * scaleY)))
+    return source, sourceRect, (dx0, dy0, dx1, dy1)
+
+
+def _layout(dveType, origin, width, height, progress):
+    """
+    Posizionamenti di un frame della transizione.
+    :return: (sorgente di sfondo o None, lista di posizionamenti)
+    """
+    if dveType == DVE_TYPE.FLY:
+        if origin == DVE_ORIGIN.CENTER:
+            anchorX, anchorY = width / 2, height / 2
+        else:
+            anchorX = {DVE_ORIGIN.RIGHT: width, DVE_ORIGIN.LEFT: 0}.get(origin, width / 2)
+            anchorY = {DVE_ORIGIN.TOP: 0, DVE_ORIGIN.BOTTOM: height}.get(origin, height / 2)
+        rect = (anchorX * (1 - progress), anchorY * (1 - progress),
+                anchorX + (width - anchorX) * progress, anchorY + (height - anchorY) * progress)
+        return OUTGOING, [_placement(INCOMING, width, height, *rect)]
+    horizontal = origin in (DVE_ORIGIN.RIGHT, DVE_ORIGIN.LEFT, DVE_ORIGIN.CENTER)
+    size = width if horizontal else height
+    offset = size * progress
+    # l'entrante occupa [start, start + offset) lungo l'asse, dal lato di origine
+    fromEnd = origin in (DVE_ORIGIN.RIGHT, DVE_ORIGIN.BOTTOM, DVE_ORIGIN.CENTER)
+    if dveType == DVE_TYPE.PUSH:
+        incoming = (size - offset, 2 * size - offset) if fromEnd else (offset - size, offset)
+        outgoing = (-offset, size - offset) if fromEnd else (offset, size + offset)
+    else:
+        incoming = (size - offset, size) if fromEnd else (0, offset)
+        outgoing = (0, size - offset) if fromEnd else (offset, size)
+    placements = []
+    for source, (start, end) in ((OUTGOING, outgoing), (INCOMING, incoming)):
+        rect = (start, 0, end, height) if horizontal else (0, start, width, end)
+        placements.append(_placement(source, width, height, *rect))
+    return None, placements
+
+
+class DveEngine:
+
+    def __init__(self, dveType=DVE_TYPE.FLY, origin=DVE_ORIGIN.CENTER, interpolation=cv2.INTER_LINEAR):
+        """
+        :param dveType: DVE_TYPE
+        :param origin: DVE_ORIGIN, da dove arriva il frame entrante
+        :param interpolation: interpolazione di cv2.resize
+        """
+        self.dveType = dveType
+        self.origin = origin
+        self.interpolation = interpolation
+        self._layouts = None
+        self._layoutKey = None
+        self._outputBuffers = FrameBuffers()
+
+    def setEffect(self, dveType, origin=None):
+        self.dveType = dveType
+        if origin is not None:
+            self.origin = origin
+
+    def prepare(self, width, height, easing):
+        """
+        Calcola i posizionamenti di tutti i frame della transizione. Da chiamare alla partenza della transizione.
+        :param width: larghezza del frame
+        :param height: altezza del frame
+        :param easing: tabella dei pesi della transizione (dissolveKernel.easingTable), uno per frame
+        """
+        key = (self.dveType, self.origin, width, height, id(easing), len(easing))
+        if key == self._layoutKey:
+            return
+        self._layouts = [_layout(self.dveType, self.origin, width, height, float(weight) / float(easing[-1]))
+                         for weight in easing]
+        self._layoutKey = key
+
+    @staticmethod
+    def _copyOutside(output, source, rect):
+        x0, y0, x1, y1 = rect
+        output[:y0] = source[:y0]
+        output[y1:] = source[y1:]
+        output[y0:y1, :x0] = source[y0:y1, :x0]
+        output[y0:y1, x1:] = source[y0:y1, x1:]
+
+    def _place(self, output, frame, sourceRect, destinationRect):
+        sx0, sy0, sx1, sy1 = sourceRect
+        dx0, dy0, dx1, dy1 = destinationRect
+        region = output[dy0:dy1, dx0:dx1]
+        crop = frame[sy0:sy1, sx0:sx1]
+        if crop.shape[:2] == region.shape[:2]:
+            np.copyto(region, crop)
+        elif crop.size:
+            cv2.resize(crop, (dx1 - dx0, dy1 - dy0), dst=region, interpolation=self.interpolation)
+
+    def render(self, incoming, outgoing, progress):
+        """
+        Compone il frame della transizione all'avanzamento progress, con i posizionamenti calcolati da prepare.
+        :param incoming: il frame che entra (preview)
+        :param outgoing: il frame che esce (program)
+        :param progress: avanzamento lineare da 0 a 1, l'indice del frame preparato
+        :return: il frame composto in un buffer a rotazione
+        """
+        if progress <= 0.0:
+            return outgoing
+        if progress >= 1.0 or self._layouts is None:
+            return incoming
+        background, placements = self._layouts[int(round(progress * (len(self._layouts) - 1)))]
+        output = self._outputBuffers.next(outgoing.shape)
+        frames = (incoming, outgoing)
+        if background is not None:
+            visible = [placement for placement in placements if placement is not None]
+            if not visible:
+                return frames[background]
+            self._copyOutside(output, frames[background], visible[0][2])
+        for placement in placements:
+            if placement is not None:
+                source, sourceRect, destinationRect = placement
+                self._place(output, frames[source], sourceRect, destinationRect)
+        return output
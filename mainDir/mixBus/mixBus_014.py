@@ -1,15 +1,22 @@
 import time
 from enum import Enum
 
-import numpy as np
 import cv2
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 
+from mainDir.engine.framePool import framePool, FrameBuffers
+from mainDir.engine.latencyTracker import latencyTracker
+from mainDir.engine.masterClock import framesSince
+from mainDir.engine.stageTimer import stageTimer
 from mainDir.inputs.generator_bars_EBU import FullBarsGenerator
 from mainDir.inputs.generator_bars_SMPTE import SMPTEBarsGenerator
 from mainDir.inputs.imageLoader_Stinger import StingerLoader
+from mainDir.mixBus.downstreamKeyer import DownstreamKeyer, DskLayer
+from mainDir.mixBus.dissolveKernel import DissolveKernel, EASING, WEIGHT_ONE, easingTable, weightAt
+from mainDir.mixBus.dveEngine import DveEngine, DVE_TYPE, DVE_ORIGIN
+from mainDir.mixBus.wipeEngine import WipeEngine, WIPE_PATTERN
 
 
 class MIX_TYPE(Enum):
@@ -23,6 +30,10 @@ class MIX_TYPE(Enum):
     STILL = 7
     DIP = 8
     DVE = 9
+    WIPE = 10
+
+
+_MIX_STAGES = {mixType: f"getMix.{mixType.name}" for mixType in MIX_TYPE}
 
 
 class MixBus014(QObject):
@@ -30,21 +41,28 @@ class MixBus014(QObject):
     MixBus014 è il cuore del mixer video e permette di mixare due oggetti input.
     Di default resituisce tramite getMix una tupla: preview, program.
     Se l'effetto è impostato su MIX, restituisce:
-    preview, cv2.addWeighted(_preview_frame, self._fade, _program_frame, 1 - self._fade, 0)
+    preview, dissolve(_preview_frame, _program_frame, peso)
     dove previewFrame è il frame di preview e programFrame è il frame di program.
-    fade è una variabile che viene aumentata di una certa quantità per un certo periodo di tempo tramite
-    un QTimer che viene fatto partire generalmente quando si preme il pulsante auto o quando
-    si usa la slide bar per fare il mix.
+    fade è l'avanzamento della transizione da 0 a 1. Non c'è un timer: la transizione dura transitionDuration frame
+    e fade viene calcolato in getMix dal numero del frame del tick (synchObject.frameNumber), quindi una transizione
+    dura sempre lo stesso numero di frame ed è riproducibile anche in un loop senza interfaccia più veloce del tempo
+    reale. Il peso del dissolve in virgola fissa 8.8 viene letto da fade nella tabella di easing della transizione
+    (vedi dissolveKernel).
     """
     effectDuration = 200
-    fadeWidth = 50
+    # durata delle transizioni in frame (con il vecchio timer erano 1 / 0.06, cioè 17 passi)
+    transitionDuration = 17
+    fadeWidth = 5
+    ftbDuration = 30
     lastProgram = None
     errorSignal = pyqtSignal(dict)
 
-    def __init__(self, syncObject, parent=None):
+    def __init__(self, syncObject, parent=None, resolution=QSize(1920, 1080),
+                 stingerFolder=r"C:\pythonCode\openPyVision_013\testSequence", stingerCacheFolder=None):
         super().__init__(parent)
-        self.preview_input = FullBarsGenerator(syncObject)
-        self.program_input = SMPTEBarsGenerator(syncObject)
+        self._resolution = resolution
+        self.preview_input = FullBarsGenerator(syncObject, resolution)
+        self.program_input = SMPTEBarsGenerator(syncObject, resolution)
         self.still = None
 
         self.synch_object = syncObject
@@ -53,14 +71,36 @@ class MixBus014(QObject):
 
         self._fade = 0.0
         self.stingerIndex = 0
-        self.fade_step = 0.01
         self.blend_width = 50  # Adjust blend width as needed
-        self.effect_TIMER = QTimer(self)
-        self.effect_TIMER.timeout.connect(self.updateEffect)
-        self.stingerObject = StingerLoader(self.synch_object, r"C:\pythonCode\openPyVision_013\testSequence")
+        # la transizione parte dal primo frame renderizzato dopo startMix e dura _transitionLength frame
+        self._transitionStartFrame = None
+        self._transitionLength = self.transitionDuration
+        self.dissolveKernel = DissolveKernel()
+        self._stingerBuffers = FrameBuffers()
+        self.easing = EASING.LINEAR
+        self._easingTable = easingTable(self.easing, self._transitionLength)
+        # fade to black: _ftbFrame va da 0 (program visibile) a ftbDuration (nero), _ftbDirection è +1, -1 o 0
+        self.ftbColor = (0, 0, 0)
+        self._ftbTable = easingTable(EASING.LINEAR, self.ftbDuration)
+        self._ftbFrame = 0
+        self._ftbDirection = 0
+        self.dipColor = (0, 0, 0)
+        self.dveEngine = DveEngine(DVE_TYPE.FLY, DVE_ORIGIN.CENTER)
+        # livelli downstream (logo, sottopancia...) sopra il program, prima del fade to black
+        self.dsk = DownstreamKeyer(self.synch_object)
+        # ultimo mix calcolato e la sua chiave (frame del tick, input, effetto), vedi getMix
+        self._mixKey = None
+        self._mixResult = None
+        self._ftbLastFrame = None
+        # i campi di distanza dei wipe vengono calcolati una volta per risoluzione e restano in cache nei due engine
+        self._linearWipe = WipeEngine(softness=self.fadeWidth)
+        self.wipeEngine = WipeEngine(WIPE_PATTERN.CIRCLE, softness=20)
+        self.stingerObject = StingerLoader(self.synch_object, stingerFolder, resolution, stingerCacheFolder)
 
         # Connect stinger's switching signal to the cut method
         self.stingerObject.switching_SIGNAL.connect(self.cutOnSwitching)
+        # il mixBus dice al synchObject quali input usa ad ogni tick, gli altri restano parcheggiati
+        self.synch_object.registerConsumer(self)
 
     def __del__(self):
         try:
@@ -69,26 +109,46 @@ class MixBus014(QObject):
         except AttributeError:
             pass
 
-    @staticmethod
-    def returnBlack():
+    def returnBlack(self):
         """
-        Ritorna un frame nero in fullHD.
+        Ritorna un frame nero alla risoluzione del mixBus.
         Questa funzione viene utilizzata nel caso in cui non sia presente uno o nessun degli input.
+        Il frame è condiviso dal framePool e in sola lettura.
         :return: an array np
         """
-        return np.zeros((1080, 1920, 3), dtype=np.uint8)
+        return framePool.black((self._resolution.height(), self._resolution.width(), 3))
 
     def _getFrame(self, input_source):
         """
         La funzione _getFrame restituisce il frame dell'input sorgente e nel caso in cui
         l'input sorgente non sia presente restituisce un frame nero.
+        Il frame viene letto dall'EvaluationGraph, quindi è lo stesso (in sola lettura) per tutti i bus che usano
+        l'input nel tick.
         :param input_source: l'input
         :return: il frame corrente dell'input
         """
         try:
-            return input_source.getFrame()
+            frame = self.synch_object.evaluationGraph.frame(input_source)
         except AttributeError:
             return self.returnBlack()
+        return frame if frame is not None else self.returnBlack()
+
+    def getLiveSources(self):
+        """
+        Restituisce gli input che il mixBus userà nel tick corrente: preview e program sempre,
+        lo still solo durante un mix di tipo STILL, lo stinger solo mentre lo stinger è in corso e gli input
+        dei livelli DSK visibili.
+        Viene chiamata dall'EvaluationGraph del synchObject prima di catturare i frame.
+        :return: lista degli input live
+        """
+        sources = [self.preview_input, self.program_input]
+        if self.is_mixing:
+            if self._mixType == MIX_TYPE.STILL:
+                sources.append(self.still)
+            elif self._mixType == MIX_TYPE.STINGER:
+                sources.append(self.stingerObject)
+        sources.extend(self.dsk.getLiveSources())
+        return sources
 
     def setPreviewInput(self, videoObject):
         """
@@ -117,10 +177,13 @@ class MixBus014(QObject):
     def setEffectType(self, mixType):
         """
         Imposta il tipo di effetto.
+        Scegliendo lo stinger parte subito il caricamento della sequenza, così è pronta quando si lancia.
         :param mixType:
         :return:
         """
         self._mixType = mixType
+        if mixType == MIX_TYPE.STINGER:
+            self.stingerObject.preload()
 
     def getEffectType(self):
         """
@@ -140,8 +203,40 @@ class MixBus014(QObject):
         """
         Dati due input preview e program restituisce il mix dei due input.
         Di default restituisce una tupla preview, program.
+        La durata viene registrata nello stageTimer con una fase per tipo di transizione (getMix.CUT quando
+        non c'è un mix in corso, altrimenti getMix.MIX, getMix.WIPE_LEFT, ...), e i frame di preview e program
+        vengono segnati come mixati nel latencyTracker.
+        Il mix viene calcolato una volta per tick: le chiamate successive nello stesso tick (monitor, aux, uscite
+        di registrazione e streaming) ricevono la stessa tupla finché non cambiano input o effetto.
         :return:
         """
+        frameNumber = self.synch_object.frameNumber
+        if frameNumber >= 0 and self._mixKey == self._currentMixKey(frameNumber):
+            return self._mixResult
+        startNs = stageTimer.start()
+        self._updateTransition()
+        preview_frame, program_frame = self._getMix()
+        program_frame = self.dsk.composite(program_frame, frameNumber)
+        result = preview_frame, self._fadeToBlack(program_frame, frameNumber)
+        stageTimer.stop(_MIX_STAGES[self._mixType] if self.is_mixing else "getMix.CUT", startNs)
+        latencyTracker.markMixed("preview", self.preview_input)
+        latencyTracker.markMixed("program", self.program_input)
+        self._mixKey, self._mixResult = self._currentMixKey(frameNumber), result
+        return result
+
+    def _currentMixKey(self, frameNumber):
+        return (frameNumber, id(self.preview_input), id(self.program_input), id(self.still), self._mixType,
+                self.is_mixing)
+
+    def getFrame(self):
+        """
+        Il program pulito del mixBus (dopo DSK e fade to black), per usare il mixBus come input di un aux
+        o di un altro M/E.
+        :return: il frame di program del tick corrente
+        """
+        return self.getMix()[1]
+
+    def _getMix(self):
         preview_frame = self._getFrame(self.preview_input)
         program_frame = self._getFrame(self.program_input)
         if not self.is_mixing:
@@ -159,13 +254,19 @@ class MixBus014(QObject):
                 return preview_frame, self._vWipe_fromTop_To_Bottom(preview_frame, program_frame)
             elif self._mixType == MIX_TYPE.WIPE_BOTTOM:
                 return preview_frame, self._vWipe_fromBottom_To_Top(preview_frame, program_frame)
+            elif self._mixType == MIX_TYPE.WIPE:
+                return preview_frame, self.wipeEngine.render(preview_frame, program_frame, self._fade)
+            elif self._mixType == MIX_TYPE.DIP:
+                return preview_frame, self._dipFrames(preview_frame, program_frame)
+            elif self._mixType == MIX_TYPE.DVE:
+                return preview_frame, self.dveEngine.render(preview_frame, program_frame, self._fade)
             elif self._mixType == MIX_TYPE.STINGER:
                 return preview_frame, self._mixStinger(preview_frame, program_frame, self.stingerObject)
             elif self._mixType == MIX_TYPE.STILL:
                 if self.still is None:
                     self.errorSignal.emit({"error": "No still image loaded."})
                     return preview_frame, program_frame
-                return preview_frame, self.still.getFrame()
+                return preview_frame, self._mixStill(program_frame)
 
     def _mixFrames(self, _preview_frame, _program_frame):
         """
@@ -175,75 +276,183 @@ class MixBus014(QObject):
         :param _program_frame: il frame di program
         :return: il mix dei due frame
         """
-        return cv2.addWeighted(_preview_frame, self._fade, _program_frame, 1 - self._fade, 0)
+        return self.dissolveKernel.dissolve(_preview_frame, _program_frame, self._mixWeight())
 
-    @staticmethod
-    def _mixStinger(_preview_frame, _program_frame, _stingerObject):
+    def _mixStinger(self, _preview_frame, _program_frame, _stingerObject):
         """
         Lo stinger è una sequenza di immagini con alpha channel che di solito viene usata per
         introdurre replay, per terminare lo stream, per introdurre un ospite, per lo stacco pubblicitario, ecc.
-        Facendo un pò di esperimenti, ho scoperto che la soluzione migliore per compositare due immagini di cui una
-        ha un alpha channel è usare la bitwise_and operation perchè operano su singoli bit.
-        in pratica viene estratto il canale alpha, con il bitwise_not si inverte il canale alpha, quindi si moltiplica
-        l'alpha invertito per l'immagine di background e l'alpha per l'immagine di overlay.
-        Si sommano i due risultati e si ottiene il mix. L'oggetto stinger ha una funzione getFillAndKey che restituisce
-        una tupla (bgr, alpha) dove alpha è monocanale.
+        Lo StingerLoader prepara ogni frame al caricamento con il fill premoltiplicato e il key inverso a 3 canali,
+        quindi il compositing è program * keyInverso / 255 + fill: una moltiplicazione e una somma, fatte solo
+        nel rettangolo in cui l'alpha dello stinger non è zero. Fuori dal rettangolo il program viene copiato così
+        com'è; un frame trasparente restituisce il program e un frame opaco restituisce il fill senza leggere
+        il program.
         :param _preview_frame: il frame di preview
         :param _program_frame: il frame di program
         :param _stingerObject: l'oggetto Stinger
         :return:
         """
-        overlay_img, alpha = _stingerObject.getFillAndKey()
-        overlay_alpha = cv2.merge((alpha, alpha, alpha))
-        inva = cv2.bitwise_not(alpha)
-        background_alpha = cv2.merge((inva, inva, inva))
-        # Apply bitwise_and operation for alpha blending
-        overlay = cv2.bitwise_and(overlay_img, overlay_alpha)
-        background = cv2.bitwise_and(_program_frame, background_alpha)
-        # Add the overlay and background
-        result = cv2.add(overlay, background)
-        return result
+        stingerFrame = _stingerObject.getStingerFrame()
+        if stingerFrame is None or stingerFrame.box is None or stingerFrame.fill.shape != _program_frame.shape:
+            return _program_frame
+        if stingerFrame.isOpaque:
+            return stingerFrame.fill
+        output = self._stingerBuffers.next(_program_frame.shape)
+        top, bottom, left, right = stingerFrame.box
+        # il program fuori dal rettangolo dello stinger
+        output[:top] = _program_frame[:top]
+        output[bottom:] = _program_frame[bottom:]
+        output[top:bottom, :left] = _program_frame[top:bottom, :left]
+        output[top:bottom, right:] = _program_frame[top:bottom, right:]
+        region = output[top:bottom, left:right]
+        cv2.multiply(_program_frame[top:bottom, left:right], stingerFrame.inverseKey[top:bottom, left:right],
+                     dst=region, scale=1 / 255)
+        cv2.add(region, stingerFrame.fill[top:bottom, left:right], dst=region)
+        return output
 
     def _mixStill(self, frameToMix):
         """
         Nel mixer si può usare un'immagine di tappo, un logo per mettere che di solito viene usata
         in pausa il mix, per terminare lo stream, nel caso di problemi tecnici, ecc.
         :param frameToMix: il frame da mixare
-        :return: il mix del logo con il frame o solamente lo still frame nel caso in cui l'opacità sia 0
+        :return: il dissolve dal frame allo still, con lo stesso kernel e la stessa curva del MIX
         """
-        still_frame = self._getFrame(self.still)
-        if self._fade != 0.0:
-            return cv2.addWeighted(frameToMix, self._fade, still_frame, 1 - self._fade, 0)
-        else:
-            return frameToMix, still_frame
+        return self.dissolveKernel.dissolve(self._getFrame(self.still), frameToMix, self._mixWeight())
+
+    def _dipFrames(self, _preview_frame, _program_frame):
+        """
+        Dip attraverso un colore: nella prima metà della transizione il program va verso dipColor, nella seconda
+        il colore lascia il posto al preview. Ogni metà usa tutta la curva di easing, con il dissolveKernel.
+        :param _preview_frame: il frame di preview
+        :param _program_frame: il frame di program
+        :return: il frame del dip
+        """
+        if self._fade < 0.5:
+            return self.dissolveKernel.dip(_program_frame, self.dipColor, weightAt(self._easingTable, self._fade * 2))
+        weight = WEIGHT_ONE - weightAt(self._easingTable, self._fade * 2 - 1)
+        return self.dissolveKernel.dip(_preview_frame, self.dipColor, weight)
 
-    def startMix(self):
+    def addDskLayer(self, fillSource, keySource=None, name="", opacity=1.0, transitionFrames=15):
         """
-        Fa partire il timer per fare il mix.
-        fadeStep è la quantità di opacità che viene aumentata per un certo periodo di tempo.
-        :param duration:
+        Aggiunge un livello downstream sopra quelli esistenti (vedi downstreamKeyer).
+        Il livello parte fuori onda: si manda in onda con layer.auto() o layer.cut().
+        :return: il DskLayer
+        """
+        return self.dsk.addLayer(DskLayer(fillSource, keySource, name, opacity, transitionFrames))
+
+    def setDipColor(self, color):
+        """
+        Imposta il colore del dip in BGR.
+        :param color:
         :return:
         """
-        self._fade = 0.0
-        self.is_mixing = True
-        self.fade_step = 0.06
-        self.effect_TIMER.start(1000 // self.synch_object.fps)
+        self.dipColor = tuple(color)
 
-    def updateEffect(self):
+    def setDveEffect(self, dveType, origin=None):
         """
-        Aggiorna l'effetto di mixaggio. Se l'opacità è 1.0 allora si ferma il timer e si resetta l'opacità
-        e chiama il cut per invertire i due input, in questo modo il fade è monodirezionale, va sempre da 0 a 1
-        e non c'è bisogno di invertire la logica.
+        Imposta l'effetto DVE (DVE_TYPE.PUSH, SQUEEZE, FLY) e il lato da cui arriva il preview (DVE_ORIGIN).
+        Vale dalla prossima transizione.
+        :param dveType:
+        :param origin:
         :return:
         """
-        if self.is_mixing:
-            self._fade += self.fade_step
-            if self._fade >= 1.0:
-                self._fade = 1.0
+        self.dveEngine.setEffect(dveType, origin)
+
+    def _mixWeight(self):
+        """
+        Peso 8.8 del frame entrante per il fade corrente, letto dalla tabella di easing della transizione.
+        """
+        return weightAt(self._easingTable, self._fade)
+
+    def setEasing(self, easing):
+        """
+        Imposta la curva del dissolve (EASING.LINEAR, S_CURVE, EASE_IN, EASE_OUT).
+        Vale dalla prossima transizione.
+        :param easing:
+        :return:
+        """
+        self.easing = easing
+
+    def fadeToBlack(self, duration=None):
+        """
+        Fa partire il fade to black del program, o il ritorno dal nero se il program è già al nero o ci sta andando.
+        Il fade avanza di un frame per tick e usa il dissolveKernel verso ftbColor.
+        :param duration: durata in frame, di default ftbDuration
+        :return:
+        """
+        if duration is not None and duration != len(self._ftbTable) - 1:
+            progress = self._ftbFrame / (len(self._ftbTable) - 1)
+            self._ftbTable = easingTable(EASING.LINEAR, duration)
+            self._ftbFrame = round(progress * duration)
+        towardsBlack = self._ftbDirection < 0 or (self._ftbDirection == 0 and self._ftbFrame == 0)
+        self._ftbDirection = 1 if towardsBlack else -1
+
+    def isFadedToBlack(self):
+        """
+        :return: True se il program è al nero o ci sta andando
+        """
+        return self._ftbDirection > 0 or (self._ftbDirection == 0 and self._ftbFrame > 0)
+
+    def _fadeToBlack(self, program_frame, frameNumber=None):
+        steps = framesSince(self._ftbLastFrame, frameNumber)
+        self._ftbLastFrame = frameNumber
+        if self._ftbDirection and steps:
+            self._ftbFrame = min(max(self._ftbFrame + self._ftbDirection * steps, 0), len(self._ftbTable) - 1)
+            if self._ftbFrame in (0, len(self._ftbTable) - 1):
+                self._ftbDirection = 0
+        if self._ftbFrame == 0:
+            return program_frame
+        return self.dissolveKernel.dip(program_frame, self.ftbColor, int(self._ftbTable[self._ftbFrame]))
+
+    def setTransitionDuration(self, frames):
+        """
+        Imposta la durata delle transizioni in frame. Vale dalla prossima transizione.
+        :param frames:
+        :return:
+        """
+        self.transitionDuration = max(1, int(frames))
+
+    def startMix(self, duration=None):
+        """
+        Fa partire la transizione: il primo frame renderizzato dopo la chiamata è il primo della transizione
+        e dopo duration frame il preview è in program.
+        :param duration: durata in frame, di default transitionDuration
+        :return:
+        """
+        self._fade = 0.0
+        self.is_mixing = True
+        self._transitionStartFrame = None
+        self._transitionLength = max(1, int(duration or self.transitionDuration))
+        self._easingTable = easingTable(self.easing, self._transitionLength)
+        if self._mixType == MIX_TYPE.DVE:
+            # i rettangoli di ogni frame del DVE vengono calcolati qui, una volta per transizione
+            self.dveEngine.prepare(self._resolution.width(), self._resolution.height(), self._easingTable)
+
+    def _updateTransition(self):
+        """
+        Calcola fade dal numero del frame del tick. Al frame transitionDuration dalla partenza la transizione
+        finisce con il cut che inverte i due input, in questo modo il fade è monodirezionale, va sempre da 0 a 1
+        e non c'è bisogno di invertire la logica. Se il clock salta dei frame la transizione li salta con lui.
+        Lo stinger avanza da solo a ogni tick e la transizione finisce quando finisce la sua animazione.
+        :return:
+        """
+        if not self.is_mixing:
+            return
+        if self._mixType == MIX_TYPE.STINGER:
+            if not self.stingerObject.isStarted:
                 self.is_mixing = False
-                self.effect_TIMER.stop()
-                self._fade = 0.0
-                self.cut()
+            return
+        frameNumber = self.synch_object.frameNumber
+        if self._transitionStartFrame is None:
+            self._transitionStartFrame = frameNumber
+        elapsed = frameNumber - self._transitionStartFrame + 1
+        if elapsed >= self._transitionLength:
+            self._fade = 0.0
+            self.is_mixing = False
+            self._transitionStartFrame = None
+            self.cut()
+        else:
+            self._fade = elapsed / self._transitionLength
 
     def startStinger(self):
         """
@@ -267,107 +476,65 @@ class MixBus014(QObject):
 
     def _hWipe_fromLeft_To_Right(self, preview, program):
         """
-        Effettua un wipe orizzontale da sinistra a destra.
-        In questa funzione, viene creato un frame combinato composto da due parti:
-        - La prima parte è presa dal frame di preview fino alla posizione del wipe.
-        - La seconda parte è presa dal frame di program dalla posizione del wipe fino alla fine.
-
-        Una striscia verticale di transizione larga 20 pixel viene creata miscelando i pixel di preview e program al 50%.
-
+        Effettua un wipe orizzontale da sinistra a destra: il preview entra da sinistra e copre il program.
+        Il bordo del wipe è una sfumatura di fadeWidth pixel calcolata dal WipeEngine.
         :param preview: Frame di preview.
         :param program: Frame di program.
         :return: Frame combinato con l'effetto di wipe.
         """
-        height, width, _ = preview.shape
-        combined_frame = np.copy(preview)
-        fade_width = 5
-        wipe_position = int(self._fade * width)
-        if wipe_position + fade_width <= width:
-            combined_frame[:, wipe_position:wipe_position + fade_width] = (
-                    preview[:, wipe_position:wipe_position + fade_width] * (1 - 0.5) +
-                    program[:, wipe_position:wipe_position + fade_width] * 0.5
-            )
-            combined_frame[:, wipe_position + fade_width:] = program[:, wipe_position + fade_width:]
-        return combined_frame
+        return self._renderLinearWipe(0, preview, program)
 
     def _hWipe_fromRight_To_Left(self, preview, program):
         """
-        Effettua un wipe orizzontale da destra a sinistra.
-        In questa funzione, viene creato un frame combinato composto da due parti:
-        - La prima parte è presa dal frame di program fino alla posizione del wipe.
-        - La seconda parte è presa dal frame di preview dalla posizione del wipe fino alla fine.
+        Effettua un wipe orizzontale da destra a sinistra: il preview entra da destra e copre il program.
 
                             A: [AAAAAAAAAA|AAAAAAA]
                             B: [BBBBBB|BBBBBBBBBB]
                             C: [AAAAAA|CCC|BBBBBB]
 
-        Una striscia verticale di transizione larga 20 pixel viene creata miscelando i pixel di preview e program al 50%.
-
         :param preview: Frame di preview.
         :param program: Frame di program.
         :return: Frame combinato con l'effetto di wipe.
         """
-        height, width, _ = preview.shape
-        combined_frame = np.copy(program)
-        fade_width = 5
-        wipe_position = int((1 - self._fade) * width)
-        if wipe_position + fade_width <= width:
-            combined_frame[:, wipe_position:wipe_position + fade_width] = (
-                    preview[:, wipe_position:wipe_position + fade_width] * 0.5 +
-                    program[:, wipe_position:wipe_position + fade_width] * (1 - 0.5)
-            )
-            combined_frame[:, wipe_position + fade_width:] = preview[:, wipe_position + fade_width:]
-        return combined_frame
+        return self._renderLinearWipe(180, preview, program)
 
     def _vWipe_fromTop_To_Bottom(self, preview, program):
         """
-        Effettua un wipe verticale dall'alto verso il basso.
-        In questa funzione, viene creato un frame combinato composto da due parti:
-        - La prima parte è presa dal frame di preview fino alla posizione del wipe.
-        - La seconda parte è presa dal frame di program dalla posizione del wipe fino alla fine.
-
-        Una striscia orizzontale di transizione larga 20 pixel viene creata miscelando i pixel di preview e program al 50%.
-
+        Effettua un wipe verticale dall'alto verso il basso: il preview entra dall'alto e copre il program.
         :param preview: Frame di preview.
         :param program: Frame di program.
         :return: Frame combinato con l'effetto di wipe.
         """
-        height, width, _ = preview.shape
-        wipe_position = int(self._fade * height)
-        combined_frame = np.copy(preview)
-        fade_width = 5
-        if wipe_position + fade_width <= height:
-            combined_frame[wipe_position:wipe_position + fade_width, :] = (
-                    preview[wipe_position:wipe_position + fade_width, :] * (1 - 0.5) +
-                    program[wipe_position:wipe_position + fade_width, :] * 0.5
-            )
-            combined_frame[wipe_position + fade_width:, :] = program[wipe_position + fade_width:, :]
-        return combined_frame
+        return self._renderLinearWipe(90, preview, program)
 
     def _vWipe_fromBottom_To_Top(self, preview, program):
         """
-        Effettua un wipe verticale dal basso verso l'alto.
-        In questa funzione, viene creato un frame combinato composto da due parti:
-        - La prima parte è presa dal frame di program fino alla posizione del wipe.
-        - La seconda parte è presa dal frame di preview dalla posizione del wipe fino alla fine.
-
-        Una striscia orizzontale di transizione larga 20 pixel viene creata miscelando i pixel di preview e program al 50%.
-
+        Effettua un wipe verticale dal basso verso l'alto: il preview entra dal basso e copre il program.
         :param preview: Frame di preview.
         :param program: Frame di program.
         :return: Frame combinato con l'effetto di wipe.
         """
-        height, width, _ = preview.shape
-        wipe_position = int((1 - self._fade) * height)
-        combined_frame = np.copy(program)
-        fade_width = 5
-        if wipe_position - fade_width >= 0:
-            combined_frame[wipe_position - fade_width:wipe_position, :] = (
-                    preview[wipe_position - fade_width:wipe_position, :] * 0.5 +
-                    program[wipe_position - fade_width:wipe_position, :] * (1 - 0.5)
-            )
-            combined_frame[wipe_position:, :] = preview[wipe_position:, :]
-        else:
-            combined_frame[:, :] = preview[:, :]
-        return combined_frame
+        return self._renderLinearWipe(270, preview, program)
+
+    def _renderLinearWipe(self, angle, preview, program):
+        """
+        I quattro wipe classici sono wipe lineari del WipeEngine con angolo fisso e senza bordo.
+        """
+        self._linearWipe.setPattern(WIPE_PATTERN.LINEAR, angle)
+        self._linearWipe.setSoftness(self.fadeWidth)
+        return self._linearWipe.render(preview, program, self._fade)
 
+    def setWipePattern(self, pattern, angle=0.0, softness=None, border=None, borderColor=None):
+        """
+        Imposta il wipe a pattern usato con MIX_TYPE.WIPE.
+        :param pattern: WIPE_PATTERN (LINEAR, CIRCLE, DIAMOND, BOX, CLOCK)
+        :param angle: angolo in gradi per LINEAR e CLOCK
+        :param softness: sfumatura del bordo in pixel
+        :param border: larghezza del bordo colorato in pixel
+        :param borderColor: colore del bordo in BGR
+        """
+        self.wipeEngine.setPattern(pattern, angle)
+        if softness is not None:
+            self.wipeEngine.setSoftness(softness)
+        if border is not None or borderColor is not None:
+            self.wipeEngine.setBorder(self.wipeEngine.border if border is None else border, borderColor)
@@ -0,0 +1,191 @@
+import math
+from enum import Enum
+
+import cv2
+import numpy as np
+
+from mainDir.engine.framePool import framePool, FrameBuffers
+
+"""
+Motore dei wipe. I vecchi wipe del MixBus014 copiavano tutto il frame, miscelavano in float64 una striscia fissa di
+5 pixel e sapevano fare solo bordi orizzontali o verticali.
+
+Ogni pattern è descritto da un campo di distanza: per ogni pixel, quanto manca (in pixel) perché il wipe lo raggiunga.
+Il campo dipende solo da pattern, angolo e risoluzione, quindi viene calcolato una volta sola e tenuto in cache.
+Ad ogni frame, con il wipe al punto progress (da 0 a 1), la soglia T = progress * (massimo del campo + morbidezza
++ ritardo dell'entrante) si sposta sul campo e:
+- il frame viene composto con una maschera netta (cv2.compare sul campo e cv2.copyTo) in un buffer del framePool;
+- se c'è una sfumatura, solo il rettangolo che la contiene (trovato dai minimi e massimi per riga e colonna del campo)
+  viene rifatto con l'alpha morbida, calcolata con un solo cv2.addWeighted(dtype=CV_8U) che fa rampa e saturazione
+  a 0-255 in un passaggio (alpha = 255 * (T - campo) / morbidezza), e miscelato in virgola fissa su uint8.
+
+Pattern disponibili: LINEAR (con angolo in gradi, 0 = da sinistra a destra, 90 = dall'alto in basso), CIRCLE,
+DIAMOND, BOX, CLOCK. Il bordo (border, in pixel) è una banda del colore borderColor tra le due sorgenti: il bordo avanza con la
+soglia T e l'entrante con T - (bordo + morbidezza), così tra la sfumatura del bordo e quella dell'entrante resta sempre
+una banda piena di border pixel, qualunque sia la morbidezza.
+"""
+
+
+class WIPE_PATTERN(Enum):
+    LINEAR = 0
+    CIRCLE = 1
+    DIAMOND = 2
+    BOX = 3
+    CLOCK = 4
+
+
+def distanceField(pattern, width, height, angle=0.0):
+    """
+    Calcola il campo di distanza di un pattern, normalizzato in modo che parta da 0.
+    :param pattern: WIPE_PATTERN
+    :param width: larghezza del frame
+    :param height: altezza del frame
+    :param angle: angolo in gradi per LINEAR (e punto di partenza per CLOCK)
+    :return: np.ndarray float32 (height, width) in sola lettura
+    """
+    x = np.arange(width, dtype=np.float32) + 0.5
+    y = (np.arange(height, dtype=np.float32) + 0.5)[:, np.newaxis]
+    dx = x - width / 2
+    dy = y - height / 2
+    if pattern == WIPE_PATTERN.LINEAR:
+        radians = math.radians(angle)
+        field = x * np.float32(math.cos(radians)) + y * np.float32(math.sin(radians))
+    elif pattern == WIPE_PATTERN.CIRCLE:
+        field = np.sqrt(dx * dx + dy * dy)
+    elif pattern == WIPE_PATTERN.DIAMOND:
+        # a parità di distanza dal centro il rombo ha le proporzioni del frame
+        field = np.abs(dx) + np.abs(dy) * np.float32(width / height)
+    elif pattern == WIPE_PATTERN.BOX:
+        field = np.maximum(np.abs(dx), np.abs(dy) * np.float32(width / height))
+    elif pattern == WIPE_PATTERN.CLOCK:
+        # angolo in senso orario dalle ore 12, scalato sul perimetro perché la morbidezza resti in "pixel"
+        theta = np.arctan2(dx, -dy) - np.float32(math.radians(angle))
+        field = np.mod(theta, np.float32(2 * math.pi)) * np.float32((width + height) / math.pi)
+    else:
+        raise ValueError(f"Unknown wipe pattern {pattern}")
+    field = np.array(np.broadcast_to(field, (height, width)), dtype=np.float32)
+    field -= field.min()
+    field.flags.writeable = False
+    return field
+
+
+class WipeEngine:
+
+    def __init__(self, pattern=WIPE_PATTERN.LINEAR, angle=0.0, softness=5.0, border=0.0, borderColor=(255, 255, 255)):
+        """
+        :param pattern: WIPE_PATTERN
+        :param angle: angolo in gradi (LINEAR, CLOCK)
+        :param softness: larghezza in pixel della sfumatura dei bordi
+        :param border: larghezza in pixel del bordo colorato
+        :param borderColor: colore del bordo in BGR
+        """
+        self.pattern = pattern
+        self.angle = angle
+        self.softness = softness
+        self.border = border
+        self.borderColor = tuple(borderColor)
+        self._fields = {}
+        self._outputBuffers = FrameBuffers()
+        self._borderBuffers = FrameBuffers(count=1)
+        self._alphaBuffers = FrameBuffers(count=2)
+        self._alpha3Buffers = FrameBuffers(count=2)
+        self._workBuffers = FrameBuffers(count=3)
+
+    def setPattern(self, pattern, angle=None):
+        self.pattern = pattern
+        if angle is not None:
+            self.angle = angle
+
+    def setSoftness(self, softness):
+        self.softness = max(0.0, float(softness))
+
+    def setBorder(self, border, borderColor=None):
+        self.border = max(0.0, float(border))
+        if borderColor is not None:
+            self.borderColor = tuple(borderColor)
+
+    def field(self, width, height):
+        """
+        Campo di distanza del pattern corrente, calcolato la prima volta e poi preso dalla cache.
+        Insieme al campo vengono tenuti il massimo e il minimo/massimo di ogni riga e colonna, che servono a trovare
+        ad ogni frame il rettangolo che contiene la sfumatura.
+        :return: (campo, massimo, minimi per riga, massimi per riga, minimi per colonna, massimi per colonna)
+        """
+        key = (self.pattern, float(self.angle) % 360.0, width, height)
+        cached = self._fields.get(key)
+        if cached is None:
+            field = distanceField(self.pattern, width, height, self.angle)
+            cached = self._fields[key] = (field, float(field.max()), field.min(axis=1), field.max(axis=1),
+                                          field.min(axis=0), field.max(axis=0))
+        return cached
+
+    def clearCache(self):
+        self._fields = {}
+
+    @staticmethod
+    def _span(minimums, maximums, low, high):
+        """
+        Primo e ultimo indice (righe o colonne) in cui il campo attraversa l'intervallo [low, high).
+        """
+        inside = np.flatnonzero((minimums < high) & (maximums >= low))
+        if len(inside) == 0:
+            return None
+        return int(inside[0]), int(inside[-1]) + 1
+
+    def _composite(self, foreground, background, cached, threshold, buffers):
+        """
+        Mette foreground sopra background dove il fronte alla soglia threshold è passato.
+        Tutto il frame viene composto con una maschera netta (cv2.compare e cv2.copyTo), poi solo il rettangolo
+        che contiene la sfumatura viene rifatto con l'alpha morbida, in virgola fissa su uint8.
+        """
+        field, fieldMax, rowMin, rowMax, colMin, colMax = cached
+        output = buffers.next(background.shape)
+        np.copyto(output, background)
+        softness = self.softness
+        mask = cv2.compare(field, threshold - softness / 2, cv2.CMP_LT, dst=self._alphaBuffers.next(field.shape))
+        cv2.copyTo(foreground, mask, output)
+        if softness <= 0:
+            return output
+        rows = self._span(rowMin, rowMax, threshold - softness, threshold)
+        columns = self._span(colMin, colMax, threshold - softness, threshold)
+        if rows is None or columns is None:
+            return output
+        (top, bottom), (left, right) = rows, columns
+        height, width = bottom - top, right - left
+        gain = 255.0 / softness
+        alpha = self._alphaBuffers.next(field.shape)[:height, :width]
+        cv2.addWeighted(field[top:bottom, left:right], -gain, field[top:bottom, left:right], 0, threshold * gain,
+                        dst=alpha, dtype=cv2.CV_8U)
+        alpha3 = self._alpha3Buffers.next(background.shape)[:height, :width]
+        cv2.cvtColor(alpha, cv2.COLOR_GRAY2BGR, dst=alpha3)
+        weighted = self._workBuffers.next(background.shape)[:height, :width]
+        cv2.multiply(foreground[top:bottom, left:right], alpha3, dst=weighted, scale=1 / 255)
+        cv2.bitwise_not(alpha3, dst=alpha3)
+        region = output[top:bottom, left:right]
+        cv2.multiply(background[top:bottom, left:right], alpha3, dst=region, scale=1 / 255)
+        cv2.add(weighted, region, dst=region)
+        return output
+
+    def render(self, incoming, outgoing, progress):
+        """
+        Compone il wipe.
+        :param incoming: il frame che entra (preview)
+        :param outgoing: il frame che esce (program)
+        :param progress: avanzamento del wipe da 0 a 1
+        :return: il frame composto (un buffer riusato, valido fino al render successivo del tick dopo)
+        """
+        if progress <= 0.0:
+            return outgoing
+        if progress >= 1.0:
+            return incoming
+        height, width = outgoing.shape[:2]
+        cached = self.field(width, height)
+        # con il bordo l'entrante è indietro di bordo + morbidezza, così la sua sfumatura non copre il bordo
+        lag = self.border + self.softness if self.border > 0 else 0
+        threshold = progress * (cached[1] + self.softness + lag)
+        if self.border > 0:
+            # prima il bordo sopra l'uscente, poi l'entrante sopra il bordo
+            borderFrame = framePool.constant(outgoing.shape, self.borderColor)
+            outgoing = self._composite(borderFrame, outgoing, cached, threshold, self._borderBuffers)
+            threshold -= lag
+        return self._composite(incoming, outgoing, cached, threshold, self._outputBuffers)
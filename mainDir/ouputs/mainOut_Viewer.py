@@ -1,5 +1,8 @@
 import cv2
 import numpy as np
+from mainDir.engine.framePool import framePool
+from mainDir.engine.latencyTracker import latencyTracker
+from mainDir.engine.stageTimer import timedStage
 from mainDir.inputs.generator_bars_EBU import FullBarsGenerator
 from mainDir.inputs.synchObject import SynchObject
 
@@ -20,6 +23,10 @@ class CV_MainOutViewer:
         self.drag_start = None
         self.laser_position = None
         self.is_laser_active = False
+        # buffer riusati: l'uscita zoomata e il layer del puntatore laser
+        self._zoomed = None
+        self._pointerLayer = None
+        self._lastPointerRect = None
 
         # Nome della finestra deve essere lo stesso per setMouseCallback e namedWindow
         window_name = 'mainOut_Viewer'
@@ -94,8 +101,11 @@ class CV_MainOutViewer:
             [self.zoom_scale, 0, center_x - self.zoom_scale * center_x + self.pan_x],
             [0, self.zoom_scale, center_y - self.zoom_scale * center_y + self.pan_y]
         ])
-        # Applica la trasformazione all'immagine clonata
-        zoomed = cv2.warpAffine(self.clone, M, (w, h))
+        # Applica la trasformazione all'immagine clonata, scrivendo nel buffer riusato
+        if self._zoomed is None or self._zoomed.shape != self.clone.shape:
+            framePool.checkin(self._zoomed)
+            self._zoomed = framePool.checkout(self.clone.shape)
+        zoomed = cv2.warpAffine(self.clone, M, (w, h), dst=self._zoomed)
 
         if self.laser_position:
             # Disegna il puntatore laser
@@ -108,23 +118,39 @@ class CV_MainOutViewer:
     def draw_laser_pointer(self, position, diameter=10):
         """
         Disegna un puntatore laser.
+        Il layer del puntatore è allocato una volta sola: a ogni chiamata si cancella solo la zona
+        del cerchio disegnato in precedenza e si disegna quello nuovo.
         :param position: La posizione del puntatore.
         :param diameter: Il diametro del puntatore.
         :return: L'immagine con il puntatore disegnato.
         """
         x, y = position
-        image = np.zeros((1080, 1920, 3), np.uint8)
-        cv2.circle(image, (x, y), diameter, self.color, -1)
-        return image
-
-    def feedFrame(self, frame):
+        shape = self.image.shape[:2] + (3,)
+        if self._pointerLayer is None or self._pointerLayer.shape != shape:
+            self._pointerLayer = np.zeros(shape, np.uint8)
+            self._lastPointerRect = None
+        if self._lastPointerRect is not None:
+            x0, y0, x1, y1 = self._lastPointerRect
+            self._pointerLayer[y0:y1, x0:x1] = 0
+        cv2.circle(self._pointerLayer, (x, y), diameter, self.color, -1)
+        self._lastPointerRect = (max(0, x - diameter - 1), max(0, y - diameter - 1),
+                                 max(0, x + diameter + 2), max(0, y + diameter + 2))
+        return self._pointerLayer
+
+    @timedStage("mainOut.feedFrame")
+    def feedFrame(self, frame, latencyToken=None):
         """
         Aggiorna l'immagine visualizzata.
         :param frame: Il nuovo frame da visualizzare.
+        :param latencyToken: token del latencyTracker del frame, per misurare la latenza fino all'uscita
         """
         self.image = frame
-        self.clone = frame.copy()
+        if self.clone.shape == frame.shape and self.clone.flags.writeable:
+            np.copyto(self.clone, frame)
+        else:
+            self.clone = frame.copy()
         self.update_display()
+        latencyTracker.markDisplayed("mainOut", latencyToken)
 
     def run(self):
         """
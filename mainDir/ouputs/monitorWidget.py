@@ -1,3 +1,4 @@
+import functools
 import sys
 import cv2
 import numpy as np
@@ -6,6 +7,12 @@ from PyQt6.QtGui import *
 from PyQt6.QtOpenGLWidgets import QOpenGLWidget
 from PyQt6.QtWidgets import *
 
+from mainDir.engine.downscaler import Downscaler
+from mainDir.engine.exposureAids import ExposureAids, EXPOSURE_AID
+from mainDir.engine.framePool import framePool, FrameBuffers
+from mainDir.engine.latencyTracker import latencyTracker
+from mainDir.engine.renderGovernor import renderGovernor, SHED_LEVEL
+from mainDir.engine.stageTimer import timedStage
 from mainDir.inputs.videoCapture013 import VideoCapture013
 from mainDir.ouputs.mainOut_Viewer import CV_MainOutViewer
 from mainDir.widgets.generics.btnStyle import btnMonitorStyle
@@ -13,6 +20,17 @@ from mainDir.widgets.graphicEngine.graphicSceneOverride012 import GraphicSceneOv
 from mainDir.widgets.graphicEngine.graphicViewOverride013 import GraphicViewOverride013
 
 
+@functools.lru_cache(maxsize=8)
+def channelMatrix(channel, channels):
+    """
+    Matrice 3 x channels per cv2.transform che copia il canale indicato nei tre canali di uscita.
+    """
+    matrix = np.zeros((3, channels), dtype=np.float32)
+    matrix[:, channel] = 1.0
+    matrix.flags.writeable = False
+    return matrix
+
+
 class MonitorWidget012(QWidget):
     """
     MonitorWidget012 class is a QWidget che mostra un frame video in un QGraphicsView.
@@ -26,10 +44,24 @@ class MonitorWidget012(QWidget):
     in pratica usando la funzione feedInput si può passare un frame video al monitor e questo verrà visualizzato
     nel monitor stesso. il render della scena è invece accessibile tramite getDirtyFrame. Per ottenere il clean feed
     si prende direttamente dal mixBus con il metodo getMix che ritorna preview, mix.
+
+    Con isDisplayResolution (il default) il monitor carica solo i pixel che mostra davvero: la scala della view
+    (di solito circa 0.36) per il devicePixelRatio dà la dimensione del frame sullo schermo, il frame viene ridotto
+    una volta con il Downscaler (INTER_AREA a passi di 2:1) in un buffer del framePool e solo quel buffer passa da
+    QImage e QPixmap.fromImage. Il QGraphicsPixmapItem viene scalato dell'inverso, quindi nella scena il frame resta
+    a 1920x1080. Con lo zoom oltre 1:1 il monitor torna a caricare il frame a piena risoluzione.
+
+    Il monitor di preview ascolta il renderGovernor: sotto sovraccarico si aggiorna a metà frequenza (PREVIEW_RATE) e
+    riduce il frame con INTER_NEAREST (MONITOR_SCALING). Il monitor di program non viene mai degradato.
+
+    I pulsanti R, G, B mostrano un solo canale in grigio con un cv2.transform (una matrice di selezione per canale)
+    in un buffer riusato; False Color, Zebra e Clip applicano gli ExposureAids al frame già ridotto, solo sul monitor.
     """
     btnAntialiasing = None
     btnSmootPixmapTransformation = None
     btnOpenGL = None
+    btnDisplayResolution = None
+    isDisplayResolution = True
 
     def __init__(self, _syncObject, isPrg, parent=None):
         super(MonitorWidget012, self).__init__(parent)
@@ -44,9 +76,21 @@ class MonitorWidget012(QWidget):
         # Il clean feed preso dal mixBus viene inserito in questo oggetto
         self.graphicObject = QGraphicsPixmapItem()
         self.scene.addItem(self.graphicObject)
+        self.scene.setCleanItem(self.graphicObject)
 
         self.feedFrame = None
         self.rgbParade = None
+        # buffer del frame ridotto alla dimensione dello schermo e fattore di riduzione del frame mostrato
+        self._displayBuffers = FrameBuffers(count=1)
+        self._displayFactor = 1.0
+        self.downscaler = Downscaler()
+        self._channelBuffers = FrameBuffers()
+        self.exposureAids = ExposureAids()
+        # token del latencyTracker del frame ricevuto e di quello visualizzato
+        self._feedToken = None
+        self.displayedToken = None
+        self._latencyOutput = "program" if isPrg else "preview"
+        self._latencyDisplay = "programMonitor" if isPrg else "previewMonitor"
 
         # Inizializzazione dei pulsanti
         self.btnFitInView = QPushButton("Fit in View")
@@ -55,6 +99,9 @@ class MonitorWidget012(QWidget):
         self.btnBlue = self.createButton("B", self.setBlue)
         self.btnRGBParade = self.createButton("RGB Parade", self.setRGBParade)
         self.btnWaveform = self.createButton("Waveform", self.setWaveform)
+        self.btnFalseColor = self.createButton("False Color", self.setFalseColor)
+        self.btnZebra = self.createButton("Zebra", self.setZebra)
+        self.btnClipping = self.createButton("Clip", self.setClipping)
         self.lblSize = QLabel("1.0")
         self.lblCPU = QLabel("CPU Usage")
         self.lblFps = QLabel("FPS: 0")
@@ -65,6 +112,9 @@ class MonitorWidget012(QWidget):
         self._isAlpha = False
         self._isRGBParade = False
         self._isWaveform = False
+        self._isFalseColor = False
+        self._isZebra = False
+        self._isClipping = False
 
         # Lista di pulsanti per i toggle
         self.toggleButtons = [
@@ -72,7 +122,10 @@ class MonitorWidget012(QWidget):
             (self.btnGreen, 'Green'),
             (self.btnBlue, 'Blue'),
             (self.btnRGBParade, 'RGBParade'),
-            (self.btnWaveform, 'Waveform')
+            (self.btnWaveform, 'Waveform'),
+            (self.btnFalseColor, 'FalseColor'),
+            (self.btnZebra, 'Zebra'),
+            (self.btnClipping, 'Clipping')
         ]
 
         self.cmbViewportMode = QComboBox(self)
@@ -123,6 +176,8 @@ class MonitorWidget012(QWidget):
         self.btnSmootPixmapTransformation = self.createButton("Smooth Pixmap Transformation",
                                                               self.setSmoothPixmapTransformation)
         self.btnOpenGL = self.createButton("OpenGL", self.setOpenGL)
+        self.btnDisplayResolution = self.createButton("Display Resolution", self.setDisplayResolution)
+        self.btnDisplayResolution.setChecked(self.isDisplayResolution)
 
         spacer = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
         btnLayout = QHBoxLayout()
@@ -130,6 +185,7 @@ class MonitorWidget012(QWidget):
         btnLayout.addWidget(self.btnAntialiasing)
         btnLayout.addWidget(self.btnSmootPixmapTransformation)
         btnLayout.addWidget(self.btnOpenGL)
+        btnLayout.addWidget(self.btnDisplayResolution)
         btnLayout.addItem(spacer)
         return btnLayout
 
@@ -189,6 +245,9 @@ class MonitorWidget012(QWidget):
         buttonLayout.addWidget(self.btnRed)
         buttonLayout.addWidget(self.btnGreen)
         buttonLayout.addWidget(self.btnBlue)
+        buttonLayout.addWidget(self.btnFalseColor)
+        buttonLayout.addWidget(self.btnZebra)
+        buttonLayout.addWidget(self.btnClipping)
         if not self.isPrg:
             buttonLayout.addWidget(self.btnRGBParade)
             buttonLayout.addWidget(self.btnWaveform)
@@ -223,25 +282,67 @@ class MonitorWidget012(QWidget):
         :return: None
         """
         self.feedFrame = inputNumpyFrame
+        self._feedToken = latencyTracker.currentToken(self._latencyOutput)
 
     def getDirtyFrame(self):
         """
-        Restituisce il frame sporco della scena.
+        Restituisce il frame sporco della scena: il frame ricevuto con sopra gli overlay della scena, o il frame
+        stesso se non ci sono overlay. Il render usa sempre il frame a piena risoluzione, anche quando il monitor
+        mostra il frame ridotto.
         :return: Frame sporco
         """
-        return self.scene.getDirtyFrame()
+        frame = None if self.feedFrame is None else self.processFrame(self.feedFrame)
+        return self.scene.getDirtyFrame(frame)
+
+    def displayScale(self):
+        """
+        Pixel fisici dello schermo per pixel del frame: scala della view per il devicePixelRatio.
+        """
+        return self.view.transform().m11() * self.view.viewport().devicePixelRatioF()
 
+    def toDisplayResolution(self, frame):
+        """
+        Riduce il frame alla dimensione in cui viene mostrato, con il Downscaler in un buffer riusato.
+        :param frame: frame a piena risoluzione
+        :return: (frame ridotto, fattore da applicare al QGraphicsPixmapItem), o il frame stesso con fattore 1
+        """
+        scale = self.displayScale()
+        if not self.isDisplayResolution or scale >= 1.0:
+            return frame, 1.0
+        width = max(1, int(np.ceil(frame.shape[1] * scale)))
+        height = max(1, int(np.ceil(frame.shape[0] * scale)))
+        if width >= frame.shape[1] or height >= frame.shape[0]:
+            return frame, 1.0
+        small = self._displayBuffers.next((height, width) + frame.shape[2:])
+        nearest = not self.isPrg and renderGovernor.isShed(SHED_LEVEL.MONITOR_SCALING)
+        self.downscaler.resize(frame, (width, height), small, nearest)
+        return small, frame.shape[1] / width
+
+    def _setPixmap(self, frame, factor):
+        frame = np.ascontiguousarray(frame)
+        imageFormat = QImage.Format.Format_ARGB32 if frame.shape[2] == 4 else QImage.Format.Format_BGR888
+        qImage = QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], imageFormat)
+        self.graphicObject.setPixmap(QPixmap.fromImage(qImage))
+        self.graphicObject.setScale(factor)
+
+    @timedStage("monitor.updateFrame")
     def updateFrame(self):
         """
-        Aggiorna il frame visualizzato nel monitor.
+        Aggiorna il frame visualizzato nel monitor, ridotto alla risoluzione dello schermo se isDisplayResolution.
+        Canali e key vengono estratti dopo la riduzione, quindi su meno pixel.
         :return: None
         """
+        if not self.isPrg and not renderGovernor.isDue(SHED_LEVEL.PREVIEW_RATE, self.syncObject.frameNumber):
+            return
         if self.feedFrame is None:
-            frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+            frame = framePool.black((1080, 1920, 3))
         else:
-            frame = self.processFrame(self.feedFrame)
-        qImage = QImage(frame.data, frame.shape[1], frame.shape[0], QImage.Format.Format_BGR888)
-        self.graphicObject.setPixmap(QPixmap.fromImage(qImage))
+            frame = self.feedFrame
+        frame, self._displayFactor = self.toDisplayResolution(frame)
+        frame = self.exposureAids.apply(self.processFrame(frame), self.exposureAid())
+        self._setPixmap(frame, self._displayFactor)
+        self.displayedToken = self._feedToken
+        latencyTracker.markDisplayed(self._latencyDisplay, self.displayedToken)
         if self.rgbParade is not None:
             self.rgbParade.source = self.feedFrame
 
@@ -251,28 +352,38 @@ class MonitorWidget012(QWidget):
         :param frame: Frame di input
         :return: Frame elaborato
         """
+        # i frame sono BGR: il rosso è il canale 2 e il blu il canale 0
         if self._isRed:
-            frame = self.extractChannel(frame, 0)
+            frame = self.extractChannel(frame, 2)
         elif self._isGreen:
             frame = self.extractChannel(frame, 1)
         elif self._isBlue:
-            frame = self.extractChannel(frame, 2)
+            frame = self.extractChannel(frame, 0)
         elif self._isAlpha and frame.shape[2] == 4:
             frame = self.extractChannel(frame, 3)
         return frame
 
-    @staticmethod
-    def extractChannel(frame, channel):
+    def extractChannel(self, frame, channel):
         """
-        Estrae un canale specifico dal frame.
-        :param frame: Frame di input
-        :param channel: Canale da estrarre
-        :return: Frame con solo il canale estratto
+        Mostra un solo canale del frame in grigio: un cv2.transform con una matrice che copia il canale nei tre canali
+        di uscita, scritto in un buffer riusato. L'alpha di un frame BGRA viene scartato.
+        :param frame: Frame di input BGR o BGRA
+        :param channel: Canale da estrarre (0 blu, 1 verde, 2 rosso, 3 alpha)
+        :return: Frame BGR con solo il canale estratto
         """
-        channels = cv2.split(frame)
-        if len(channels) == 4:
-            channels = channels[:3] + [channels[channel]]
-        return cv2.merge([channels[channel]] * 3)
+        if frame.ndim == 2:
+            return frame
+        output = self._channelBuffers.next(frame.shape[:2] + (3,))
+        return cv2.transform(frame, channelMatrix(channel, frame.shape[2]), dst=output)
+
+    def exposureAid(self):
+        if self._isFalseColor:
+            return EXPOSURE_AID.FALSE_COLOR
+        if self._isZebra:
+            return EXPOSURE_AID.ZEBRA
+        if self._isClipping:
+            return EXPOSURE_AID.CLIPPING
+        return EXPOSURE_AID.NONE
 
     def fitInView(self):
         """
@@ -316,6 +427,27 @@ class MonitorWidget012(QWidget):
         """
         self.toggleColorChannel('Waveform')
 
+    def setFalseColor(self):
+        """
+        Attiva/disattiva il falso colore.
+        :return: None
+        """
+        self.toggleColorChannel('FalseColor')
+
+    def setZebra(self):
+        """
+        Attiva/disattiva la zebra sulle alte luci.
+        :return: None
+        """
+        self.toggleColorChannel('Zebra')
+
+    def setClipping(self):
+        """
+        Attiva/disattiva l'indicatore di clipping.
+        :return: None
+        """
+        self.toggleColorChannel('Clipping')
+
     def toggleColorChannel(self, color):
         """
         Attiva/disattiva la visualizzazione di un canale colore specifico.
@@ -372,6 +504,13 @@ class MonitorWidget012(QWidget):
         """
         self.view.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, self.btnSmootPixmapTransformation.isChecked())
 
+    def setDisplayResolution(self):
+        """
+        Attiva/disattiva il caricamento del frame alla sola risoluzione dello schermo.
+        :return: None
+        """
+        self.isDisplayResolution = self.btnDisplayResolution.isChecked()
+
     def setOpenGL(self):
         """
         Attiva/disattiva l'uso di OpenGL per il rendering.
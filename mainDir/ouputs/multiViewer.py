@@ -0,0 +1,292 @@
+import functools
+
+import cv2
+import numpy as np
+from PyQt6.QtCore import *
+from PyQt6.QtGui import *
+from PyQt6.QtWidgets import *
+
+from mainDir.engine.downscaler import Downscaler
+from mainDir.engine.renderGovernor import renderGovernor, SHED_LEVEL
+from mainDir.engine.stageTimer import timedStage
+
+"""
+Multiviewer: preview, program e gli otto input della matrice in un solo canvas, mostrato con un solo disegno per tick
+invece di un monitor a piena risoluzione per ogni sorgente.
+
+Il canvas è un array BGR preallocato alla risoluzione del multiviewer (di default 1920x1080): sopra preview e program
+a metà risoluzione, sotto le otto sorgenti a un quarto. Ogni riquadro (MultiViewerTile) viene aggiornato con il
+Downscaler (cv2.resize INTER_AREA a passi di 2:1) scritto direttamente nella sua ROI del canvas.
+
+- Ogni riquadro ha un divisore di aggiornamento: preview e program ogni tick, le sorgenti di default ogni 2 tick.
+  I riquadri con lo stesso divisore sono sfasati (phase), così il costo è distribuito sui tick invece di arrivare
+  tutto insieme. Il multiviewer è un consumer dell'EvaluationGraph e chiede solo le sorgenti da aggiornare nel tick;
+  i frame vengono letti con evaluationGraph.frame, quindi un input usato anche dal mixBus non viene riletto.
+- Le etichette sono immagini pronte (cv2.putText una volta sola, in cache per testo e larghezza) copiate nel riquadro
+  dopo il resize, come i bordi del tally (rosso program, verde preview), che vengono ridisegnati anche quando il
+  tally cambia.
+- Sotto sovraccarico il renderGovernor rallenta tutti i riquadri tranne il program (PREVIEW_RATE), passa il resize a
+  INTER_NEAREST (MONITOR_SCALING) e lascia fermi i riquadri degli input che non sono né in preview né in program
+  (UNROUTED_INPUTS), che così non vengono più catturati.
+"""
+
+TALLY_COLORS = {
+    None: (48, 48, 48),
+    "preview": (0, 190, 0),
+    "program": (0, 0, 220),
+}
+
+
+@functools.lru_cache(maxsize=64)
+def labelImage(text, width, height):
+    """
+    Etichetta di un riquadro: testo bianco centrato su una banda scura.
+    :return: np.ndarray BGR (height, width, 3) in sola lettura
+    """
+    label = np.full((height, width, 3), 24, dtype=np.uint8)
+    scale = height / 40
+    (textWidth, textHeight), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 1)
+    origin = (max(0, (width - textWidth) // 2), (height + textHeight) // 2)
+    cv2.putText(label, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), 1, cv2.LINE_AA)
+    label.flags.writeable = False
+    return label
+
+
+class MultiViewerTile:
+
+    def __init__(self, name, rect, divisor=1, phase=0, matrixIndex=None):
+        """
+        :param name: nome mostrato nell'etichetta
+        :param rect: (x, y, larghezza, altezza) del riquadro nel canvas, bordo compreso
+        :param divisor: il riquadro viene aggiornato un tick ogni divisor
+        :param phase: sfasamento dell'aggiornamento, in tick
+        :param matrixIndex: numero dell'input della matrice, None per preview e program
+        """
+        self.name = name
+        self.rect = rect
+        self.divisor = divisor
+        self.phase = phase
+        self.matrixIndex = matrixIndex
+        self.source = None
+        self.tally = None
+        # stato già disegnato nel canvas: tally del bordo e sorgente dell'immagine
+        self._drawnTally = False
+        self._drawnSource = False
+
+    def isDue(self, frameNumber, rateDivisor=1):
+        return (frameNumber + self.phase) % (self.divisor * rateDivisor) == 0
+
+    def isProgram(self):
+        return self.matrixIndex is None and self.name == "PGM"
+
+    def label(self):
+        if self.matrixIndex is None:
+            return self.name
+        if self.source is None:
+            return f"{self.matrixIndex}"
+        return f"{self.matrixIndex} {type(self.source).__name__}"
+
+
+class MultiViewer:
+
+    def __init__(self, synchObject, matrix, mixBus, resolution=QSize(1920, 1080), sourceDivisor=2, border=3,
+                 labelHeight=24):
+        """
+        :param synchObject: il SynchObject del mixer
+        :param matrix: dizionario numero -> input della VideoMixerUI
+        :param mixBus: il MixBus014 di preview e program
+        :param resolution: risoluzione del canvas
+        :param sourceDivisor: divisore di aggiornamento dei riquadri delle sorgenti
+        :param border: spessore in pixel del bordo del tally
+        :param labelHeight: altezza in pixel delle etichette
+        """
+        self.synchObject = synchObject
+        self.matrix = matrix
+        self.mixBus = mixBus
+        self.border = border
+        self.labelHeight = labelHeight
+        self.canvas = np.zeros((resolution.height(), resolution.width(), 3), dtype=np.uint8)
+        self.tiles = self._layout(resolution.width(), resolution.height(), sourceDivisor)
+        self.active = True
+        self.renderedTiles = 0
+        self._renderedFrame = None
+        self._convertBuffer = None
+        self.downscaler = Downscaler()
+        self.synchObject.registerConsumer(self)
+
+    def _layout(self, width, height, sourceDivisor):
+        """
+        Preview e program nella metà superiore, le otto sorgenti su due righe da quattro nella metà inferiore.
+        """
+        halfWidth, halfHeight = width // 2, height // 2
+        quarterWidth, quarterHeight = width // 4, (height - halfHeight) // 2
+        tiles = [MultiViewerTile("PVW", (0, 0, halfWidth, halfHeight)),
+                 MultiViewerTile("PGM", (halfWidth, 0, width - halfWidth, halfHeight))]
+        for index in range(8):
+            row, column = divmod(index, 4)
+            rect = (column * quarterWidth, halfHeight + row * quarterHeight, quarterWidth, quarterHeight)
+            tiles.append(MultiViewerTile("", rect, sourceDivisor, index % sourceDivisor, matrixIndex=index + 1))
+        return tiles
+
+    def setDivisor(self, matrixIndex, divisor):
+        """
+        Imposta il divisore di aggiornamento di un riquadro.
+        :param matrixIndex: numero dell'input della matrice, "PVW" o "PGM"
+        :param divisor: 1 per ogni tick, 2 per metà dei tick, ecc.
+        """
+        for tile in self.tiles:
+            if tile.matrixIndex == matrixIndex or (tile.matrixIndex is None and tile.name == matrixIndex):
+                tile.divisor = max(1, int(divisor))
+
+    def getLiveSources(self):
+        """
+        Le sorgenti dei riquadri da aggiornare nel tick corrente. Preview e program arrivano dal mixBus.
+        """
+        if not self.active:
+            return []
+        frameNumber = self.synchObject.frameNumber
+        return [self.matrix.get(tile.matrixIndex) for tile in self.tiles
+                if tile.matrixIndex is not None and self._isDue(tile, frameNumber)]
+
+    def _isRouted(self, source):
+        return source is not None and (source is self.mixBus.program_input or source is self.mixBus.preview_input)
+
+    def _isDue(self, tile, frameNumber):
+        """
+        Il divisore del riquadro viene moltiplicato per quello del renderGovernor, tranne che per il program. Con
+        UNROUTED_INPUTS tolto i riquadri degli input fuori da preview e program non sono mai da aggiornare.
+        """
+        if tile.isProgram():
+            return tile.isDue(frameNumber)
+        if (tile.matrixIndex is not None and renderGovernor.isShed(SHED_LEVEL.UNROUTED_INPUTS)
+                and not self._isRouted(self.matrix.get(tile.matrixIndex))):
+            return False
+        return tile.isDue(frameNumber, renderGovernor.divisor(SHED_LEVEL.PREVIEW_RATE))
+
+    def _updateTally(self, tile):
+        """
+        Aggiorna il tally del riquadro e ridisegna il bordo se è cambiato.
+        """
+        if tile.matrixIndex is None:
+            tile.tally = "preview" if tile.name == "PVW" else "program"
+        elif tile.source is not None and tile.source is self.mixBus.program_input:
+            tile.tally = "program"
+        elif tile.source is not None and tile.source is self.mixBus.preview_input:
+            tile.tally = "preview"
+        else:
+            tile.tally = None
+        if tile.tally != tile._drawnTally:
+            self._drawBorder(tile)
+
+    def _drawBorder(self, tile):
+        x, y, width, height = tile.rect
+        border = self.border
+        color = TALLY_COLORS[tile.tally]
+        self.canvas[y:y + border, x:x + width] = color
+        self.canvas[y + height - border:y + height, x:x + width] = color
+        self.canvas[y:y + height, x:x + border] = color
+        self.canvas[y:y + height, x + width - border:x + width] = color
+        tile._drawnTally = tile.tally
+
+    def _drawTile(self, tile, frame):
+        """
+        Scrive l'immagine nel riquadro (il bordo del tally le sta sopra, così il rapporto di scala resta 2:1 o 4:1)
+        e ci copia sopra etichetta e bordo.
+        """
+        x, y, width, height = tile.rect
+        region = self.canvas[y:y + height, x:x + width]
+        if frame is None:
+            region[...] = 0
+        else:
+            if frame.ndim == 2 or frame.shape[2] != 3:
+                code = cv2.COLOR_GRAY2BGR if frame.ndim == 2 else cv2.COLOR_BGRA2BGR
+                if self._convertBuffer is None or self._convertBuffer.shape[:2] != frame.shape[:2]:
+                    self._convertBuffer = np.empty(frame.shape[:2] + (3,), dtype=np.uint8)
+                frame = cv2.cvtColor(frame, code, dst=self._convertBuffer)
+            nearest = not tile.isProgram() and renderGovernor.isShed(SHED_LEVEL.MONITOR_SCALING)
+            self.downscaler.resize(frame, (width, height), region, nearest)
+        border = self.border
+        label = labelImage(tile.label(), width - 2 * border, min(self.labelHeight, height - 2 * border))
+        region[height - border - label.shape[0]:height - border, border:width - border] = label
+        self._drawBorder(tile)
+
+    def _frame(self, source):
+        try:
+            return self.synchObject.evaluationGraph.frame(source)
+        except AttributeError:
+            return None
+
+    @timedStage("multiViewer.render")
+    def render(self):
+        """
+        Aggiorna nel canvas i riquadri previsti per il tick corrente. Chiamato più volte nello stesso tick non fa
+        niente.
+        :return: il canvas
+        """
+        frameNumber = self.synchObject.frameNumber
+        if frameNumber >= 0 and frameNumber == self._renderedFrame:
+            return self.canvas
+        preview, program = self.mixBus.getMix()
+        renderedTiles = 0
+        for tile in self.tiles:
+            if tile.matrixIndex is not None:
+                source = self.matrix.get(tile.matrixIndex)
+                sourceChanged = source is not tile.source
+                tile.source = source
+            else:
+                sourceChanged = False
+            self._updateTally(tile)
+            needsDraw = sourceChanged or tile._drawnSource is False
+            if self._isDue(tile, frameNumber) and (tile.matrixIndex is None or tile.source is not None):
+                needsDraw = True
+            if not needsDraw:
+                continue
+            if tile.matrixIndex is None:
+                frame = preview if tile.name == "PVW" else program
+            else:
+                frame = self._frame(tile.source) if tile.source is not None else None
+            self._drawTile(tile, frame)
+            tile._drawnSource = tile.source
+            renderedTiles += 1
+        self.renderedTiles = renderedTiles
+        self._renderedFrame = frameNumber
+        return self.canvas
+
+
+class MultiViewerWidget(QWidget):
+    """
+    Mostra il canvas del MultiViewer. La QImage punta al canvas (che non viene mai riallocato), quindi ad ogni tick
+    c'è un solo disegno scalato alla dimensione del widget. Quando il widget non è visibile il multiviewer si ferma
+    e non chiede sorgenti all'EvaluationGraph.
+    """
+
+    def __init__(self, multiViewer, synchObject, parent=None):
+        super().__init__(parent)
+        self.multiViewer = multiViewer
+        canvas = multiViewer.canvas
+        self._image = QImage(canvas.data, canvas.shape[1], canvas.shape[0], canvas.strides[0],
+                             QImage.Format.Format_BGR888)
+        self.setMinimumSize(320, 180)
+        synchObject.synch_SIGNAL.connect(self.updateFrame)
+
+    def updateFrame(self):
+        if not self.isVisible():
+            return
+        self.multiViewer.render()
+        self.update()
+
+    def showEvent(self, event):
+        self.multiViewer.active = True
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.multiViewer.active = False
+        super().hideEvent(event)
+
+    def paintEvent(self, event):
+        size = self._image.size().scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        target = QRect(QPoint((self.width() - size.width()) // 2, (self.height() - size.height()) // 2), size)
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.GlobalColor.black)
+        painter.drawImage(target, self._image)
+        painter.end()
@@ -1,10 +1,28 @@
+import cv2
 import numpy as np
+from PyQt6 import sip
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 
+from mainDir.engine.stageTimer import timedStage
+
 
 class GraphicSceneOverride012(QGraphicsScene):
+    """
+    Scena dei monitor e dell'editor. getDirtyFrame restituisce il frame "sporco": il clean feed con sopra gli
+    elementi aggiunti alla scena (testi, loghi, grafiche).
+
+    Il render avviene in una superficie persistente: un array numpy alla risoluzione della scena e una QImage che
+    punta alla stessa memoria, create una volta sola (e di nuovo solo se cambia la risoluzione), quindi non c'è
+    un'allocazione né una copia dei bit ad ogni frame.
+    Il monitor indica con setCleanItem quale elemento contiene il clean feed; tutti gli altri elementi visibili sono
+    overlay. Se passa il clean frame a getDirtyFrame:
+    - senza overlay il dirty frame è il clean frame stesso, senza render;
+    - con degli overlay il clean frame viene copiato nella superficie e vengono disegnati solo gli overlay,
+      con il clip sui loro rettangoli.
+    Con la griglia o la guida della risoluzione accese viene sempre fatto il render di tutta la scena, come prima.
+    """
     _resolution = QSize(1920, 1080)
     _fps = 60
     _index = 0
@@ -32,6 +50,12 @@ class GraphicSceneOverride012(QGraphicsScene):
         self._penDark.setWidth(2)
         self._penResolutionGuide = QPen(QColor(255, 0, 0, 180), 4)
 
+        # superficie di render persistente: array numpy e QImage sulla stessa memoria
+        self._cleanItem = None
+        self._surface = None
+        self._surfaceImage = None
+        self.overlayCount = 0
+
     def setResolution(self, size: QSize):
         self._resolution = size
         self.setSceneRect(0, 0, self._resolution.width(), self._resolution.height())
@@ -53,23 +77,74 @@ class GraphicSceneOverride012(QGraphicsScene):
     def setFps(self, value):
         self._fps = value
 
-    def getDirtyFrame(self):
-        # Creazione dell'immagine con la risoluzione specificata
-        image = QImage(self._resolution, QImage.Format.Format_BGR888)
-
-        # Utilizzo di QPainter per disegnare sulla QImage
-        painter = QPainter(image)
+    def setCleanItem(self, item):
+        """
+        Imposta l'elemento che contiene il clean feed: non è un overlay e nel dirty frame è sostituito dal clean frame.
+        :param item: il QGraphicsPixmapItem del clean feed
+        """
+        self._cleanItem = item
+
+    def overlayItems(self):
+        """
+        Elementi visibili diversi dal clean feed, dal più basso al più alto.
+        """
+        return [item for item in self.items(Qt.SortOrder.AscendingOrder)
+                if item is not self._cleanItem and item.isVisible()]
+
+    def _renderSurface(self):
+        height, width = self._resolution.height(), self._resolution.width()
+        if self._surface is None or self._surface.shape[:2] != (height, width):
+            self._surface = np.zeros((height, width, 3), dtype=np.uint8)
+            # con un puntatore (non un buffer in sola lettura) la QImage disegna nella memoria dell'array
+            # invece di staccarsene con una copia al primo QPainter
+            self._surfaceImage = QImage(sip.voidptr(self._surface.ctypes.data), width, height,
+                                        self._surface.strides[0], QImage.Format.Format_BGR888)
+        return self._surface
+
+    def _acceptsCleanFrame(self, cleanFrame):
+        # griglia e guida della risoluzione sono disegnate da drawBackground e drawForeground: servono il render
+        if self._showGrid or self._showResolutionGuide:
+            return False
+        return cleanFrame is not None and cleanFrame.ndim == 3 and cleanFrame.shape[2] in (3, 4) \
+            and cleanFrame.shape[:2] == (self._resolution.height(), self._resolution.width())
+
+    @timedStage("scene.getDirtyFrame")
+    def getDirtyFrame(self, cleanFrame=None):
+        """
+        Frame della scena con gli overlay sopra il clean feed.
+        :param cleanFrame: il clean frame mostrato dall'elemento di setCleanItem, alla risoluzione della scena.
+            Senza clean frame, o con la griglia o la guida della risoluzione accese, viene fatto il render di tutta
+            la scena, come prima.
+        :return: il clean frame stesso se non ci sono overlay, altrimenti la superficie di render (riusata alla
+            chiamata successiva)
+        """
         self.advance()
-        self.render(painter)
+        overlays = self.overlayItems()
+        self.overlayCount = len(overlays)
+        surface = self._renderSurface()
+        if not self._acceptsCleanFrame(cleanFrame):
+            painter = QPainter(self._surfaceImage)
+            self.render(painter)
+            painter.end()
+            return surface
+        if not overlays:
+            return cleanFrame
+        if cleanFrame.shape[2] == 4:
+            cv2.cvtColor(cleanFrame, cv2.COLOR_BGRA2BGR, dst=surface)
+        else:
+            np.copyto(surface, cleanFrame)
+        region = QRegion()
+        for item in overlays:
+            region += item.sceneBoundingRect().toAlignedRect()
+        painter = QPainter(self._surfaceImage)
+        painter.setClipRegion(region)
+        option = QStyleOptionGraphicsItem()
+        for item in overlays:
+            painter.setTransform(item.sceneTransform())
+            painter.setOpacity(item.effectiveOpacity())
+            item.paint(painter, option, None)
         painter.end()
-
-        # Conversione della QImage in una matrice NumPy
-        ptr = image.bits()
-        ptr.setsize(image.sizeInBytes())
-        frame = np.array(ptr).reshape(image.height(), image.width(), 3)
-
-        # Restituisce il frame corrente come matrice NumPy
-        return frame
+        return surface
 
     def showGrid(self, show=True):
         self._showGrid = show
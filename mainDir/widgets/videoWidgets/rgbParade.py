@@ -4,6 +4,7 @@ from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 
+from mainDir.engine.renderGovernor import renderGovernor, SHED_LEVEL
 from mainDir.widgets.videoWidgets.pixmapBaseClass import PixmapBaseClass
 
 
@@ -16,6 +17,8 @@ class RGBParade(PixmapBaseClass):
         self.name = "utilitySignal"
         self.source = source
         self.setOpacity(0.5)
+        # aggiornamenti del timer, sotto sovraccarico il renderGovernor ne salta uno ogni rateDivisor
+        self._updates = 0
         self.timer = QTimer()
         self.timer.timeout.connect(self.updateFrame)
         self.timer.start(1000 // 10)
@@ -92,6 +95,9 @@ class RGBParade(PixmapBaseClass):
         return QPixmap.fromImage(parade_image)
 
     def updateFrame(self):
+        self._updates += 1
+        if self._pixmap is not None and not renderGovernor.isDue(SHED_LEVEL.SCOPE_RATE, self._updates):
+            return
         self.image_rgb = cv2.cvtColor(self.source, cv2.COLOR_BGR2RGB)
         self.pixmap = self.createParadePixmap()
         self.update()